@@ -14,6 +14,11 @@ class CartAdmin(admin.ModelAdmin):
     search_fields = ['user__username', 'user__email']
     readonly_fields = ['created_at', 'updated_at', 'total_items', 'subtotal']
     inlines = [CartItemInline]
+    list_select_related = ['user']
+
+    def get_queryset(self, request):
+        # Totals come from the list query instead of two queries per row
+        return super().get_queryset(request).with_totals()
 
 
 @admin.register(CartItem)
@@ -21,4 +26,5 @@ class CartItemAdmin(admin.ModelAdmin):
     list_display = ['cart', 'product', 'quantity', 'subtotal', 'created_at']
     list_filter = ['created_at']
     search_fields = ['cart__user__username', 'product__title']
+    list_select_related = ['cart__user', 'product']
     readonly_fields = ['subtotal', 'created_at', 'updated_at']
@@ -1,8 +1,30 @@
 from django.db import models
 from django.conf import settings
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Prefetch, Sum, Value
+from django.db.models.functions import Coalesce
 from decimal import Decimal
 
 
+class CartQuerySet(models.QuerySet):
+    def with_totals(self):
+        """Annotate `item_count` and `items_subtotal`, computed by the database in the cart query."""
+        money = DecimalField(max_digits=12, decimal_places=2)
+        return self.annotate(
+            item_count=Count("items"),
+            items_subtotal=Coalesce(
+                Sum(ExpressionWrapper(F("items__quantity") * F("items__product__price"), output_field=money)),
+                Value(Decimal("0.00")),
+                output_field=money,
+            ),
+        )
+
+    def with_items(self):
+        """Prefetch the items with their products and categories in one more query."""
+        return self.prefetch_related(
+            Prefetch("items", queryset=CartItem.objects.select_related("product__category").order_by("id"))
+        )
+
+
 class Cart(models.Model):
     """
     Shopping cart model with one-to-one relationship with User.
@@ -16,17 +38,23 @@ class Cart(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CartQuerySet.as_manager()
+
     def __str__(self):
         return f"Cart for {self.user.username}"
 
     @property
     def total_items(self):
-        """Total number of items in cart."""
+        """Total number of items in cart; free when loaded with_totals()."""
+        if hasattr(self, "item_count"):
+            return self.item_count
         return self.items.count()
 
     @property
     def subtotal(self):
-        """Calculate total price of all items in cart."""
+        """Calculate total price of all items in cart; free when loaded with_totals()."""
+        if hasattr(self, "items_subtotal"):
+            return self.items_subtotal
         return sum(item.subtotal for item in self.items.all())
 
 
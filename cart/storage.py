@@ -0,0 +1,420 @@
+"""
+Pluggable cart storage, selected with the CART_STORAGE setting.
+
+DatabaseCartStorage keeps carts in Cart/CartItem rows, as before.
+
+RedisCartStorage keeps the live cart of each user in one Redis hash:
+
+    cart       Cart row id (also marks the hash as loaded)
+    created    cart created_at    updated    cart updated_at
+    q:<id>     quantity of product <id>
+    c:<id>     line created_at    u:<id>     line updated_at
+
+A mutation and the read of the cart it returns are one MULTI round trip, and
+add the user to a "dirty" set in the same transaction. `persist_dirty_carts`
+(Celery beat, every CART_PERSIST_SECONDS) writes those carts back to
+Cart/CartItem, so the tables trail Redis by at most that interval. A hash
+missing from Redis (first access, eviction, TTL) is loaded from the tables.
+
+Checkout reads a snapshot ({product id: quantity}) with a single atomic
+HGETALL. After the order commits, only the ordered quantities are taken out
+of the hash (items added meanwhile stay in the cart) and the cart is persisted
+right away.
+
+With Redis storage, a cart line's `id` is its product id, so the
+/api/cart/item/<id>/ routes take the id the cart response returned either way.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.module_loading import import_string
+
+from ecommerce.cache import redis_connection
+from products.models import Product
+from .models import Cart, CartItem
+
+
+class InsufficientStock(Exception):
+    def __init__(self, available):
+        super().__init__(f"Only {available} items available in stock")
+        self.available = available
+
+
+class CartContents:
+    """
+    A cart as rendered by CartSerializer, whichever storage it came from.
+    Totals are computed from `items` unless the storage passes them in.
+    """
+
+    def __init__(self, cart_id, user, items, created_at, updated_at, total_items=None, subtotal=None):
+        self.id = cart_id
+        self.user = user
+        self.items = items
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.total_items = len(items) if total_items is None else total_items
+        if subtotal is None:
+            subtotal = sum((item.subtotal for item in items), Decimal("0.00"))
+        self.subtotal = subtotal
+
+
+class CartStorage:
+    """
+    Interface of a cart storage engine. `load` and the mutations return
+    CartContents; lines are addressed by the `id` the contents carry.
+    """
+
+    def load(self, user):
+        raise NotImplementedError
+
+    def add(self, user, product, quantity):
+        """Add `quantity` of an active `product`; raises InsufficientStock."""
+        raise NotImplementedError
+
+    def get_quantity(self, user, line_id):
+        """(product id, quantity) of a line, or None if the cart has no such line."""
+        raise NotImplementedError
+
+    def set_quantity(self, user, line_id, quantity):
+        """Contents after setting the line's quantity, or None if there was no such line."""
+        raise NotImplementedError
+
+    def remove(self, user, line_id):
+        """Contents after removing the line, or None if there was no such line."""
+        raise NotImplementedError
+
+    def clear(self, user):
+        """Contents after removing every line, or None if the user has no cart."""
+        raise NotImplementedError
+
+    def snapshot(self, user):
+        """Consistent {product id: quantity} for checkout, or None if the user has no cart."""
+        raise NotImplementedError
+
+    def consume(self, user, snapshot):
+        """Take an ordered snapshot out of the cart. Call inside the order's transaction."""
+        raise NotImplementedError
+
+
+class DatabaseCartStorage(CartStorage):
+    """
+    Carts in Cart/CartItem. Reading a cart takes two queries whatever its
+    size: the cart with its totals computed by the database, and its items
+    with their products and categories.
+    """
+
+    def _contents(self, user):
+        cart = Cart.objects.with_totals().with_items().filter(user=user).first()
+        if cart is None:
+            return None
+        return CartContents(
+            cart.pk,
+            user,
+            [*cart.items.all()],
+            cart.created_at,
+            cart.updated_at,
+            total_items=cart.item_count,
+            subtotal=cart.items_subtotal,
+        )
+
+    def _empty(self, user, cart):
+        return CartContents(cart.pk, user, [], cart.created_at, cart.updated_at)
+
+    def load(self, user):
+        contents = self._contents(user)
+        if contents is None:
+            cart, _ = Cart.objects.get_or_create(user=user)
+            contents = self._empty(user, cart)
+        return contents
+
+    def add(self, user, product, quantity):
+        if product.stock < quantity:
+            raise InsufficientStock(product.stock)
+        cart, _ = Cart.objects.get_or_create(user=user)
+        cart_item, created = CartItem.objects.get_or_create(
+            cart=cart,
+            product=product,
+            defaults={"quantity": quantity},
+        )
+        if not created:
+            new_quantity = cart_item.quantity + quantity
+            if product.stock < new_quantity:
+                raise InsufficientStock(product.stock)
+            cart_item.quantity = new_quantity
+            cart_item.save(update_fields=["quantity", "updated_at"])
+        return self._contents(user)
+
+    def get_quantity(self, user, line_id):
+        return CartItem.objects.filter(id=line_id, cart__user=user).values_list("product_id", "quantity").first()
+
+    def set_quantity(self, user, line_id, quantity):
+        updated = CartItem.objects.filter(id=line_id, cart__user=user).update(
+            quantity=quantity, updated_at=timezone.now()
+        )
+        if not updated:
+            return None
+        return self._contents(user)
+
+    def remove(self, user, line_id):
+        deleted, _ = CartItem.objects.filter(id=line_id, cart__user=user).delete()
+        if not deleted:
+            return None
+        return self._contents(user)
+
+    def clear(self, user):
+        cart = Cart.objects.filter(user=user).first()
+        if cart is None:
+            return None
+        cart.items.all().delete()
+        return self._empty(user, cart)
+
+    def snapshot(self, user):
+        cart = Cart.objects.filter(user=user).first()
+        if cart is None:
+            return None
+        return dict(cart.items.values_list("product_id", "quantity"))
+
+    def consume(self, user, snapshot):
+        CartItem.objects.filter(cart__user=user, product_id__in=snapshot).delete()
+
+
+# Subtracts ordered quantities; lines that reach zero are removed.
+# KEYS[1] cart hash, KEYS[2] dirty set; ARGV: now, user id, product id, quantity, ...
+CONSUME_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], 'cart') == 0 then
+    return 0
+end
+for i = 3, #ARGV, 2 do
+    local left = redis.call('HINCRBY', KEYS[1], 'q:' .. ARGV[i], -tonumber(ARGV[i + 1]))
+    if left <= 0 then
+        redis.call('HDEL', KEYS[1], 'q:' .. ARGV[i], 'c:' .. ARGV[i], 'u:' .. ARGV[i])
+    end
+end
+redis.call('HSET', KEYS[1], 'updated', ARGV[1])
+redis.call('SADD', KEYS[2], ARGV[2])
+return 1
+"""
+
+# Only an existing line is updated: a line removed concurrently must not come back without c:<id>
+SET_QUANTITY_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], 'q:' .. ARGV[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'q:' .. ARGV[1], ARGV[2], 'u:' .. ARGV[1], ARGV[3])
+return 1
+"""
+
+
+
+class RedisCartStorage(CartStorage):
+    DIRTY_KEY = "carts:dirty"
+
+    def _key(self, user_id):
+        return cache.make_key(f"cart:{user_id}")
+
+    def _ensure_loaded(self, redis, user):
+        """Load the user's cart from Cart/CartItem unless Redis has it already."""
+        key = self._key(user.pk)
+        if redis.hexists(key, "cart"):
+            return
+        cart, _ = Cart.objects.get_or_create(user=user)
+        fields = {"cart": cart.pk, "created": cart.created_at.isoformat(), "updated": cart.updated_at.isoformat()}
+        for product_id, quantity, created_at, updated_at in cart.items.values_list(
+            "product_id", "quantity", "created_at", "updated_at"
+        ):
+            fields.update({
+                f"q:{product_id}": quantity,
+                f"c:{product_id}": created_at.isoformat(),
+                f"u:{product_id}": updated_at.isoformat(),
+            })
+        # HSETNX: a concurrent first request may have loaded and changed it already
+        pipe = redis.pipeline()
+        for field, value in fields.items():
+            pipe.hsetnx(key, field, value)
+        pipe.expire(key, settings.CART_REDIS_TTL_SECONDS)
+        pipe.execute()
+
+    def _mutate(self, user, queue):
+        """Run `queue(pipe, key, now)` and read the cart back in one MULTI; returns the hash."""
+        redis = redis_connection()
+        self._ensure_loaded(redis, user)
+        key, now = self._key(user.pk), timezone.now().isoformat()
+        pipe = redis.pipeline()
+        queue(pipe, key, now)
+        pipe.hset(key, "updated", now)
+        pipe.expire(key, settings.CART_REDIS_TTL_SECONDS)
+        pipe.sadd(cache.make_key(self.DIRTY_KEY), user.pk)
+        pipe.hgetall(key)
+        return pipe.execute()
+
+    def _lines(self, fields):
+        """{product id: (quantity, created_at, updated_at)} of a raw hash."""
+        fields = {field.decode(): value.decode() for field, value in fields.items()}
+        lines = {}
+        for field, value in fields.items():
+            if field.startswith("q:"):
+                product_id = int(field[2:])
+                lines[product_id] = (
+                    int(value),
+                    parse_datetime(fields.get(f"c:{product_id}", fields["updated"])),
+                    parse_datetime(fields.get(f"u:{product_id}", fields["updated"])),
+                )
+        return fields, lines
+
+    def _contents(self, user, raw):
+        fields, lines = self._lines(raw)
+        cart_id = int(fields["cart"])
+        products = Product.objects.select_related("category").in_bulk(lines)
+        items = [
+            CartItem(
+                id=product_id,
+                cart_id=cart_id,
+                product=products[product_id],
+                quantity=quantity,
+                created_at=created_at,
+                updated_at=updated_at,
+            )
+            for product_id, (quantity, created_at, updated_at) in sorted(lines.items(), key=lambda line: line[1][1])
+            # Products deleted since they were added; the next persist drops them
+            if product_id in products
+        ]
+        return CartContents(
+            cart_id, user, items, parse_datetime(fields["created"]), parse_datetime(fields["updated"])
+        )
+
+    def load(self, user):
+        redis = redis_connection()
+        self._ensure_loaded(redis, user)
+        return self._contents(user, redis.hgetall(self._key(user.pk)))
+
+    def add(self, user, product, quantity):
+        if product.stock < quantity:
+            raise InsufficientStock(product.stock)
+
+        def queue(pipe, key, now):
+            pipe.hincrby(key, f"q:{product.pk}", quantity)
+            pipe.hsetnx(key, f"c:{product.pk}", now)
+            pipe.hset(key, f"u:{product.pk}", now)
+
+        results = self._mutate(user, queue)
+        if results[0] > product.stock:
+            # Give the increment back; a concurrent add may have raced us past the stock
+            self._mutate(user, lambda pipe, key, now: pipe.hincrby(key, f"q:{product.pk}", -quantity))
+            raise InsufficientStock(product.stock)
+        return self._contents(user, results[-1])
+
+    def get_quantity(self, user, line_id):
+        redis = redis_connection()
+        self._ensure_loaded(redis, user)
+        quantity = redis.hget(self._key(user.pk), f"q:{line_id}")
+        return (line_id, int(quantity)) if quantity is not None else None
+
+    def set_quantity(self, user, line_id, quantity):
+        results = self._mutate(
+            user, lambda pipe, key, now: pipe.eval(SET_QUANTITY_SCRIPT, 1, key, line_id, quantity, now)
+        )
+        if not results[0]:
+            return None
+        return self._contents(user, results[-1])
+
+    def remove(self, user, line_id):
+        results = self._mutate(
+            user, lambda pipe, key, now: pipe.hdel(key, f"q:{line_id}", f"c:{line_id}", f"u:{line_id}")
+        )
+        if not results[0]:
+            return None
+        return self._contents(user, results[-1])
+
+    def clear(self, user):
+        def queue(pipe, key, now):
+            # Only the line fields are known here; HDEL of absent fields is a no-op
+            for product_id in lines:
+                pipe.hdel(key, f"q:{product_id}", f"c:{product_id}", f"u:{product_id}")
+
+        redis = redis_connection()
+        raw = redis.hgetall(self._key(user.pk))
+        if b"cart" not in raw:
+            if not Cart.objects.filter(user=user).exists():
+                return None
+            self._ensure_loaded(redis, user)
+            raw = redis.hgetall(self._key(user.pk))
+        _, lines = self._lines(raw)
+        return self._contents(user, self._mutate(user, queue)[-1])
+
+    def snapshot(self, user):
+        raw = redis_connection().hgetall(self._key(user.pk))
+        if b"cart" not in raw:
+            # Not loaded into Redis: the tables are current
+            return DatabaseCartStorage().snapshot(user)
+        _, lines = self._lines(raw)
+        return {product_id: quantity for product_id, (quantity, _, _) in lines.items()}
+
+    def consume(self, user, snapshot):
+        def apply():
+            args = [timezone.now().isoformat(), user.pk]
+            for product_id, quantity in snapshot.items():
+                args += [product_id, quantity]
+            redis_connection().eval(
+                CONSUME_SCRIPT, 2, self._key(user.pk), cache.make_key(self.DIRTY_KEY), *args
+            )
+            self.persist(user.pk)
+
+        # The tables may hold lines Redis has not loaded; keep them in step either way
+        DatabaseCartStorage().consume(user, snapshot)
+        transaction.on_commit(apply)
+
+    def persist(self, user_id):
+        """Write the user's Redis cart to Cart/CartItem. Returns False if Redis has none."""
+        with transaction.atomic():
+            # Lock first, read after: concurrent persists of one cart apply in order
+            try:
+                cart, _ = Cart.objects.select_for_update().get_or_create(user_id=user_id)
+            except IntegrityError:
+                # The user was deleted since the cart changed
+                redis_connection().delete(self._key(user_id))
+                return False
+            raw = redis_connection().hgetall(self._key(user_id))
+            if b"cart" not in raw:
+                return False
+            fields, lines = self._lines(raw)
+            existing = set(Product.objects.filter(id__in=lines).values_list("id", flat=True))
+            CartItem.objects.filter(cart=cart).exclude(product_id__in=existing).delete()
+            CartItem.objects.bulk_create(
+                [
+                    CartItem(cart=cart, product_id=product_id, quantity=quantity)
+                    for product_id, (quantity, _, _) in lines.items()
+                    if product_id in existing
+                ],
+                update_conflicts=True,
+                unique_fields=["cart", "product"],
+                update_fields=["quantity", "updated_at"],
+            )
+            Cart.objects.filter(pk=cart.pk).update(updated_at=parse_datetime(fields["updated"]))
+        return True
+
+    def persist_dirty(self, batch_size=500):
+        """Persist every cart changed since the last run. Returns the number persisted."""
+        redis = redis_connection()
+        dirty = cache.make_key(self.DIRTY_KEY)
+        persisted = 0
+        while True:
+            user_ids = [int(user_id) for user_id in redis.spop(dirty, batch_size) or []]
+            if not user_ids:
+                return persisted
+            for index, user_id in enumerate(user_ids):
+                try:
+                    self.persist(user_id)
+                except Exception:
+                    # Keep this cart and the rest of the batch for the next run
+                    redis.sadd(dirty, *user_ids[index:])
+                    raise
+                persisted += 1
+
+
+def get_cart_storage():
+    """The storage engine named by the CART_STORAGE setting."""
+    return import_string(settings.CART_STORAGE)()
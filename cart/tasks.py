@@ -0,0 +1,20 @@
+from celery import shared_task
+from .storage import RedisCartStorage, get_cart_storage
+
+
+@shared_task(bind=True, max_retries=3)
+def persist_dirty_carts(self):
+    """
+    Write carts changed in Redis since the last run back to Cart/CartItem.
+    Scheduled every CART_PERSIST_SECONDS; a no-op with database cart storage.
+    """
+    storage = get_cart_storage()
+    if not isinstance(storage, RedisCartStorage):
+        return 'Cart storage is not write-behind'
+
+    try:
+        persisted = storage.persist_dirty()
+    except Exception as exc:
+        raise self.retry(exc=exc, countdown=30)
+
+    return f'Persisted {persisted} carts'
@@ -1,3 +1,250 @@
-from django.test import TestCase
+import copy
+from decimal import Decimal
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from categories.models import Category
+from ecommerce.cache import redis_connection
+from products.models import Product
+from .models import Cart, CartItem
+from .storage import RedisCartStorage
+
+# Redis carts of test users under their own prefix, apart from any development data
+REDIS_TEST_CACHES = copy.deepcopy(settings.CACHES)
+REDIS_TEST_CACHES["default"]["KEY_PREFIX"] = "ecommerce-cart-tests"
+
+
+@override_settings(CART_STORAGE="cart.storage.DatabaseCartStorage")
+class CartQueryCountTests(APITestCase):
+    """
+    Every cart endpoint runs the same number of queries for a 1-item and a
+    30-item cart: items, products and categories are loaded together and the
+    totals are computed by the database.
+    """
+    sizes = (1, 30)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username="shopper", email="shopper@example.com", password="secret-pass"
+        )
+        category = Category.objects.create(name="Books")
+        cls.products = [
+            Product.objects.create(title=f"Book {i}", price=Decimal("9.99"), stock=100, category=category)
+            for i in range(max(cls.sizes) + 1)
+        ]
+        cls.spare = cls.products[-1]
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def fill_cart(self, size):
+        cart, _ = Cart.objects.get_or_create(user=self.user)
+        cart.items.all().delete()
+        CartItem.objects.bulk_create(
+            CartItem(cart=cart, product=product, quantity=2) for product in self.products[:size]
+        )
+        return [*cart.items.order_by("id")]
+
+    def test_get_cart(self):
+        for size in self.sizes:
+            with self.subTest(size=size):
+                self.fill_cart(size)
+                with self.assertNumQueries(2):
+                    response = self.client.get("/api/cart/")
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data["total_items"], size)
+                self.assertEqual(response.data["subtotal"], str(Decimal("19.98") * size))
+                self.assertEqual(len(response.data["items"]), size)
+
+    def test_get_cart_creates_missing_cart(self):
+        with self.assertNumQueries(5):
+            response = self.client.get("/api/cart/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total_items"], 0)
+        self.assertEqual(response.data["subtotal"], "0.00")
+
+    def test_add_new_product(self):
+        for size in self.sizes:
+            with self.subTest(size=size):
+                self.fill_cart(size)
+                with self.assertNumQueries(8):
+                    response = self.client.post(
+                        "/api/cart/add/", {"product_id": self.spare.pk, "quantity": 1}, format="json"
+                    )
+                self.assertEqual(response.status_code, 201)
+                self.assertEqual(response.data["total_items"], size + 1)
+
+    def test_add_existing_product(self):
+        for size in self.sizes:
+            with self.subTest(size=size):
+                items = self.fill_cart(size)
+                with self.assertNumQueries(6):
+                    response = self.client.post(
+                        "/api/cart/add/", {"product_id": items[0].product_id, "quantity": 1}, format="json"
+                    )
+                self.assertEqual(response.status_code, 201)
+                self.assertEqual(response.data["items"][0]["quantity"], 3)
+
+    def test_update_cart_item(self):
+        for size in self.sizes:
+            with self.subTest(size=size):
+                items = self.fill_cart(size)
+                with self.assertNumQueries(5):
+                    response = self.client.patch(f"/api/cart/item/{items[0].pk}/", {"quantity": 5}, format="json")
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data["subtotal"], str(Decimal("19.98") * size + Decimal("29.97")))
+
+    def test_update_cart_item_to_zero_removes_it(self):
+        for size in self.sizes:
+            with self.subTest(size=size):
+                items = self.fill_cart(size)
+                with self.assertNumQueries(4):
+                    response = self.client.patch(f"/api/cart/item/{items[0].pk}/", {"quantity": 0}, format="json")
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data["total_items"], size - 1)
+
+    def test_remove_from_cart(self):
+        for size in self.sizes:
+            with self.subTest(size=size):
+                items = self.fill_cart(size)
+                with self.assertNumQueries(3):
+                    response = self.client.delete(f"/api/cart/item/{items[0].pk}/remove/")
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data["total_items"], size - 1)
+
+    def test_clear_cart(self):
+        for size in self.sizes:
+            with self.subTest(size=size):
+                self.fill_cart(size)
+                with self.assertNumQueries(2):
+                    response = self.client.delete("/api/cart/clear/")
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data["total_items"], 0)
+                self.assertEqual(response.data["items"], [])
+
+
+@override_settings(CART_STORAGE="cart.storage.RedisCartStorage", CACHES=REDIS_TEST_CACHES)
+class RedisCartStorageTests(APITestCase):
+    """
+    The write-behind engine: carts load from the tables into Redis, mutations
+    reach the tables only when persisted, and checkout takes out only what
+    was ordered.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username="redis-shopper", email="redis-shopper@example.com", password="secret-pass"
+        )
+        category = Category.objects.create(name="Games")
+        cls.chess, cls.go = (
+            Product.objects.create(title=title, price=Decimal("5.00"), stock=10, category=category)
+            for title in ("Chess", "Go")
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+        self.storage = RedisCartStorage()
+        self.redis = redis_connection()
+        self.addCleanup(
+            self.redis.delete, self.storage._key(self.user.pk), cache.make_key(RedisCartStorage.DIRTY_KEY)
+        )
+
+    def persisted_lines(self):
+        return dict(CartItem.objects.filter(cart__user=self.user).values_list("product_id", "quantity"))
+
+    def test_loads_database_cart(self):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.chess, quantity=2)
+
+        response = self.client.get("/api/cart/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["id"], cart.pk)
+        self.assertEqual(
+            [(item["id"], item["quantity"]) for item in response.data["items"]], [(self.chess.pk, 2)]
+        )
+        self.assertEqual(self.redis.hget(self.storage._key(self.user.pk), f"q:{self.chess.pk}"), b"2")
+
+    def test_mutations_are_persisted(self):
+        self.client.post("/api/cart/add/", {"product_id": self.chess.pk, "quantity": 2}, format="json")
+        self.client.post("/api/cart/add/", {"product_id": self.go.pk, "quantity": 1}, format="json")
+        response = self.client.patch(f"/api/cart/item/{self.chess.pk}/", {"quantity": 4}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["subtotal"], "25.00")
+        # Write-behind: the tables only change when the cart is persisted
+        self.assertEqual(self.persisted_lines(), {})
+
+        self.assertEqual(self.storage.persist_dirty(), 1)
+        self.assertEqual(self.persisted_lines(), {self.chess.pk: 4, self.go.pk: 1})
+
+        self.client.delete(f"/api/cart/item/{self.go.pk}/remove/")
+        self.storage.persist_dirty()
+        self.assertEqual(self.persisted_lines(), {self.chess.pk: 4})
+
+    def test_checkout_keeps_items_added_meanwhile(self):
+        self.storage.add(self.user, self.chess, 2)
+        self.storage.persist(self.user.pk)
+        snapshot = self.storage.snapshot(self.user)
+        self.assertEqual(snapshot, {self.chess.pk: 2})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.storage.consume(self.user, snapshot)
+                # A concurrent request adds more before the order commits
+                self.storage.add(self.user, self.chess, 3)
+                self.storage.add(self.user, self.go, 1)
+
+        contents = self.storage.load(self.user)
+        self.assertEqual(
+            {item.product_id: item.quantity for item in contents.items}, {self.chess.pk: 3, self.go.pk: 1}
+        )
+        self.assertEqual(self.persisted_lines(), {self.chess.pk: 3, self.go.pk: 1})
+
+    def test_get_cart_queries(self):
+        # One query for the lines' products and categories (in_bulk + select_related), however many
+        category = self.chess.category
+        products = Product.objects.bulk_create(
+            Product(title=f"Puzzle {n}", slug=f"puzzle-{n}", price=Decimal("2.50"), stock=10, category=category)
+            for n in range(30)
+        )
+        for size in (1, 30):
+            with self.subTest(size=size):
+                self.storage.clear(self.user)
+                for product in products[:size]:
+                    self.storage.add(self.user, product, 1)
+                with self.assertNumQueries(1):
+                    response = self.client.get("/api/cart/")
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data["total_items"], size)
+                self.assertEqual(response.data["subtotal"], str(Decimal("2.50") * size))
+
+    def test_update_line_of_deleted_product(self):
+        self.storage.add(self.user, self.chess, 1)
+        self.storage.add(self.user, self.go, 1)
+        go_id = self.go.pk
+        self.go.delete()
+
+        response = self.client.patch(f"/api/cart/item/{go_id}/", {"quantity": 2}, format="json")
+        self.assertEqual(response.status_code, 404)
+        self.assertIsNone(self.storage.get_quantity(self.user, go_id))
+        self.assertEqual(self.storage.get_quantity(self.user, self.chess.pk), (self.chess.pk, 1))
+
+    def test_set_quantity_of_removed_line(self):
+        self.storage.add(self.user, self.chess, 1)
+        # Removed by another request after this one read the line
+        self.storage.remove(self.user, self.chess.pk)
+
+        self.assertIsNone(self.storage.set_quantity(self.user, self.chess.pk, 3))
+        fields = self.redis.hkeys(self.storage._key(self.user.pk))
+        self.assertFalse({f"q:{self.chess.pk}", f"u:{self.chess.pk}"} & {field.decode() for field in fields})
+
+    def test_clear_without_cart(self):
+        response = self.client.delete("/api/cart/clear/")
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Cart.objects.filter(user=self.user).exists())
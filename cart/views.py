@@ -1,8 +1,8 @@
 from rest_framework import status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from .models import Cart, CartItem
-from .serializers import CartSerializer, CartItemSerializer
+from .serializers import CartSerializer
+from .storage import InsufficientStock, get_cart_storage
 from products.models import Product
 
 
@@ -14,7 +14,7 @@ def get_cart(request):
 
     GET /api/cart/
     """
-    cart, created = Cart.objects.get_or_create(user=request.user)
+    cart = get_cart_storage().load(request.user)
     serializer = CartSerializer(cart)
     return Response(serializer.data)
 
@@ -38,41 +38,22 @@ def add_to_cart(request):
         )
 
     try:
-        product = Product.objects.get(id=product_id, is_active=True)
+        product = Product.objects.only('id', 'stock').get(id=product_id, is_active=True)
     except Product.DoesNotExist:
         return Response(
             {'error': 'Product not found or inactive'},
             status=status.HTTP_404_NOT_FOUND
         )
 
-    # Check stock availability
-    if product.stock < quantity:
+    # Stock is checked against the quantity already in the cart too
+    try:
+        cart = get_cart_storage().add(request.user, product, quantity)
+    except InsufficientStock as exc:
         return Response(
-            {'error': f'Only {product.stock} items available in stock'},
+            {'error': str(exc)},
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    # Get or create cart
-    cart, created = Cart.objects.get_or_create(user=request.user)
-
-    # Check if product already in cart
-    cart_item, item_created = CartItem.objects.get_or_create(
-        cart=cart,
-        product=product,
-        defaults={'quantity': quantity}
-    )
-
-    if not item_created:
-        # Update quantity if item already exists
-        new_quantity = cart_item.quantity + quantity
-        if product.stock < new_quantity:
-            return Response(
-                {'error': f'Only {product.stock} items available in stock'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        cart_item.quantity = new_quantity
-        cart_item.save()
-
     serializer = CartSerializer(cart)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -86,12 +67,9 @@ def update_cart_item(request, item_id):
     PATCH /api/cart/item/{item_id}/
     Body: {"quantity": 3}
     """
-    try:
-        cart_item = CartItem.objects.get(
-            id=item_id,
-            cart__user=request.user
-        )
-    except CartItem.DoesNotExist:
+    storage = get_cart_storage()
+    line = storage.get_quantity(request.user, item_id)
+    if line is None:
         return Response(
             {'error': 'Cart item not found'},
             status=status.HTTP_404_NOT_FOUND
@@ -106,22 +84,32 @@ def update_cart_item(request, item_id):
 
     if quantity <= 0:
         # Delete item if quantity is 0 or negative
-        cart_item.delete()
-        cart = Cart.objects.get(user=request.user)
+        cart = storage.remove(request.user, item_id) or storage.load(request.user)
         serializer = CartSerializer(cart)
         return Response(serializer.data)
 
     # Check stock availability
-    if cart_item.product.stock < quantity:
+    stock = Product.objects.filter(id=line[0]).values_list('stock', flat=True).first()
+    if stock is None:
+        # Deleted since it was added; Redis carts keep such lines until they are persisted
+        storage.remove(request.user, item_id)
+        return Response(
+            {'error': 'Product no longer available'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    if stock < quantity:
         return Response(
-            {'error': f'Only {cart_item.product.stock} items available in stock'},
+            {'error': f'Only {stock} items available in stock'},
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    cart_item.quantity = quantity
-    cart_item.save()
-
-    cart = Cart.objects.get(user=request.user)
+    cart = storage.set_quantity(request.user, item_id, quantity)
+    if cart is None:
+        # Removed by a concurrent request
+        return Response(
+            {'error': 'Cart item not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
     serializer = CartSerializer(cart)
     return Response(serializer.data)
 
@@ -134,22 +122,16 @@ def remove_from_cart(request, item_id):
 
     DELETE /api/cart/item/{item_id}/
     """
-    try:
-        cart_item = CartItem.objects.get(
-            id=item_id,
-            cart__user=request.user
-        )
-        cart_item.delete()
-
-        cart = Cart.objects.get(user=request.user)
-        serializer = CartSerializer(cart)
-        return Response(serializer.data)
-    except CartItem.DoesNotExist:
+    cart = get_cart_storage().remove(request.user, item_id)
+    if cart is None:
         return Response(
             {'error': 'Cart item not found'},
             status=status.HTTP_404_NOT_FOUND
         )
 
+    serializer = CartSerializer(cart)
+    return Response(serializer.data)
+
 
 @api_view(['DELETE'])
 @permission_classes([permissions.IsAuthenticated])
@@ -159,13 +141,12 @@ def clear_cart(request):
 
     DELETE /api/cart/clear/
     """
-    try:
-        cart = Cart.objects.get(user=request.user)
-        cart.items.all().delete()
-        serializer = CartSerializer(cart)
-        return Response(serializer.data)
-    except Cart.DoesNotExist:
+    cart = get_cart_storage().clear(request.user)
+    if cart is None:
         return Response(
             {'error': 'Cart not found'},
             status=status.HTTP_404_NOT_FOUND
         )
+
+    serializer = CartSerializer(cart)
+    return Response(serializer.data)
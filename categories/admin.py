@@ -4,6 +4,8 @@ from .models import Category
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ['id', 'name', 'slug', 'created_at']
+    list_display = ['id', 'name', 'slug', 'parent', 'depth', 'product_count', 'min_price', 'max_price', 'created_at']
+    list_select_related = ['parent']
     search_fields = ['name']
+    readonly_fields = ['path', 'depth', 'product_count', 'min_price', 'max_price', 'products_updated_at']
     prepopulated_fields = {'slug': ('name',)}
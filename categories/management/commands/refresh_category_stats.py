@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from categories.tree import refresh_category_stats
+
+
+class Command(BaseCommand):
+    """
+    Recompute Category.product_count, min_price, max_price and
+    products_updated_at over the active products of each subtree.
+
+    Product saves and deletes keep the stats up to date incrementally and
+    Celery beat refreshes them periodically; run this after raw SQL fixes or
+    to verify drift:
+        python manage.py refresh_category_stats
+    """
+    help = "Recompute subtree product stats of all categories"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            changed = refresh_category_stats()
+        self.stdout.write(self.style.SUCCESS(f"Refreshed category product stats: {changed} categories changed"))
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-17 05:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Value
+from django.db.models.functions import Cast, Concat
+
+
+def backfill_tree(apps, schema_editor):
+    """Existing categories become roots; count their active products."""
+    Category = apps.get_model('categories', 'Category')
+    Category.objects.update(path=Concat(Value('/'), Cast('id', models.CharField()), Value('/')), depth=0)
+    for category in Category.objects.annotate(active=Count('products', filter=Q(products__is_active=True))):
+        if category.active:
+            Category.objects.filter(pk=category.pk).update(product_count=category.active)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0001_initial'),
+        ('products', '0008_product_view_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='children', to='categories.category'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['path'], name='category_path_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(backfill_tree, migrations.RunPython.noop),
+    ]
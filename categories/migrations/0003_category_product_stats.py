@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-17 05:54
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min
+
+
+def backfill_stats(apps, schema_editor):
+    """Aggregate the active products of every category's subtree."""
+    Category = apps.get_model('categories', 'Category')
+    Product = apps.get_model('products', 'Product')
+    for category in Category.objects.all():
+        stats = Product.objects.filter(is_active=True, category__path__startswith=category.path).aggregate(
+            product_count=Count('id'),
+            min_price=Min('price'),
+            max_price=Max('price'),
+            products_updated_at=Max('updated_at'),
+        )
+        Category.objects.filter(pk=category.pk).update(**stats)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0002_category_tree'),
+        ('products', '0008_product_view_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='max_price',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='min_price',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='products_updated_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -1,20 +1,102 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
 from django.utils.text import slugify
 
 
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True, db_index=True)
     slug = models.SlugField(max_length=120, unique=True, blank=True)
+    parent = models.ForeignKey(
+        "self",
+        related_name="children",
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+    )
+    # Materialized path "/<root id>/.../<own id>/" and depth (0 for roots), maintained by save()
+    path = models.CharField(max_length=255, blank=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    # Stats over the active products of this category and its descendants (see categories/tree.py)
+    product_count = models.PositiveIntegerField(default=0, editable=False)
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, editable=False)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, editable=False)
+    products_updated_at = models.DateTimeField(null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Written by save() and categories.tree, never by a full-row save of a stale instance
+    maintained_fields = ("path", "depth", "product_count", "min_price", "max_price", "products_updated_at")
+
     class Meta:
         verbose_name_plural = "Categories"
         ordering = ['name']
+        indexes = [
+            # Subtree lookups are prefix matches: path LIKE '/1/5/%'
+            models.Index(fields=["path"], name="category_path_idx", opclasses=["varchar_pattern_ops"]),
+        ]
+
+    def clean(self):
+        if self.parent_id and self.pk and (
+            self.parent_id == self.pk or f"/{self.pk}/" in self.parent.path
+        ):
+            raise ValidationError({"parent": "A category cannot be moved under itself or its descendants."})
 
     def save(self, *args, **kwargs):
+        """
+        Save the category and keep the materialized paths of it and its
+        descendants, and the subtree product stats, in step with `parent`.
+        """
         if not self.slug:
             self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            previous = None
+            if self.pk and not self._state.adding:
+                previous = (
+                    Category.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values_list("path", flat=True)
+                    .first()
+                )
+                if kwargs.get("update_fields") is None:
+                    kwargs["update_fields"] = [
+                        field.name for field in self._meta.concrete_fields
+                        if not field.primary_key and field.name not in self.maintained_fields
+                    ]
+                else:
+                    kwargs["update_fields"] = [
+                        name for name in kwargs["update_fields"] if name not in self.maintained_fields
+                    ]
+
+            parent_path = ""
+            if self.parent_id:
+                parent_path = Category.objects.select_for_update().values_list("path", flat=True).get(pk=self.parent_id)
+                if previous and parent_path.startswith(previous):
+                    raise ValidationError({"parent": "A category cannot be moved under itself or its descendants."})
+
+            super().save(*args, **kwargs)
+            self._update_path(parent_path or "/", previous)
+
+    def _update_path(self, parent_path, previous):
+        path = f"{parent_path}{self.pk}/"
+        depth = path.count("/") - 2
+        old_path = previous or ""
+        if path == old_path:
+            return
+
+        if old_path:
+            # Rewrite the prefix of every descendant in one statement
+            Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(path), Substr("path", len(old_path) + 1)),
+                depth=F("depth") + (depth - (old_path.count("/") - 2)),
+            )
+        Category.objects.filter(pk=self.pk).update(path=path, depth=depth)
+
+        if old_path:
+            from .tree import refresh_subtree_ancestors
+            refresh_subtree_ancestors(old_path, path)
+        self.path, self.depth = path, depth
 
     def __str__(self):
         return self.name
@@ -7,3 +7,16 @@ class CategorySerializer(serializers.ModelSerializer):
         model = Category
         fields = ["id", "name", "slug", "created_at"]
         read_only_fields = ["slug", "created_at"]
+
+
+class CategoryTreeSerializer(CategorySerializer):
+    """
+    Category with its place in the hierarchy and the stats of its subtree's
+    active products, all stored on the category row (no extra queries).
+    Only used by the category list: product payloads embed the plain
+    CategorySerializer, so stats changes never invalidate product caches.
+    """
+    class Meta(CategorySerializer.Meta):
+        stats_fields = ["product_count", "min_price", "max_price", "products_updated_at"]
+        fields = CategorySerializer.Meta.fields + ["parent", "depth", *stats_fields]
+        read_only_fields = CategorySerializer.Meta.read_only_fields + ["depth", *stats_fields]
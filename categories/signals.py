@@ -1,6 +1,11 @@
+import copy
+
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.core.cache import cache
+from ecommerce.cache import bump_generation
+from products.cache import invalidate_category_product_details
+from products.suggest import suggest_index
 from .models import Category
 
 
@@ -9,9 +14,34 @@ def clear_category_cache(sender, instance, **kwargs):
     """
     Clear category list cache when a category is created, updated, or deleted.
     This ensures the cached category list stays fresh.
+
+    Runs after commit, like the product signals, so no reader can cache
+    the old rows under the new generations.
     """
-    # Clear all category-related caches
-    cache.delete_pattern("ecommerce:*categories*")
+    category_id = instance.pk
+
+    def invalidate():
+        # Orphan all cached category lists
+        bump_generation("categories_list")
+
+        # Also clear product caches since products reference categories
+        bump_generation("products_list")
+
+        # Product details embed the category; drop only this category's products
+        invalidate_category_product_details(category_id)
+
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=Category)
+def update_suggest_index(sender, instance, **kwargs):
+    """Add or rename the category in this process's autocomplete index once the save commits."""
+    category = copy.copy(instance)
+    transaction.on_commit(lambda: suggest_index.category_saved(category))
+
 
-    # Also clear product caches since products reference categories
-    cache.delete_pattern("ecommerce:products_list_*")
\ No newline at end of file
+@receiver(post_delete, sender=Category)
+def remove_from_suggest_index(sender, instance, **kwargs):
+    """Drop a deleted category from this process's autocomplete index once the delete commits."""
+    category = copy.copy(instance)
+    transaction.on_commit(lambda: suggest_index.category_deleted(category))
\ No newline at end of file
@@ -0,0 +1,19 @@
+from celery import shared_task
+from django.db import transaction
+from .tree import refresh_category_stats
+
+
+@shared_task(bind=True, max_retries=3)
+def refresh_category_product_stats(self):
+    """
+    Recompute the subtree product stats (count, price range, last update) of every category.
+    Scheduled every CATEGORY_STATS_REFRESH_SECONDS; corrects drift left by
+    writes that bypass Product.save(), such as raw SQL.
+    """
+    try:
+        with transaction.atomic():
+            changed = refresh_category_stats()
+    except Exception as exc:
+        raise self.retry(exc=exc, countdown=60)
+
+    return f'Refreshed product stats: {changed} categories changed'
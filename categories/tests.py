@@ -1,3 +1,70 @@
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from products.models import Product
+from .models import Category
+from .tree import refresh_category_stats
+
+
+class CategoryStatsTests(TestCase):
+    """Stats applied per product write must match a full recompute."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.electronics = Category.objects.create(name="Electronics")
+        cls.laptops = Category.objects.create(name="Laptops", parent=cls.electronics)
+        cls.gaming = Category.objects.create(name="Gaming", parent=cls.laptops)
+        cls.home = Category.objects.create(name="Home")
+        cls.kitchen = Category.objects.create(name="Kitchen", parent=cls.home)
+
+    def stats(self):
+        return {
+            name: (count, low, high, updated)
+            for name, count, low, high, updated in Category.objects.values_list(
+                "name", "product_count", "min_price", "max_price", "products_updated_at"
+            )
+        }
+
+    def assertStatsMatchRefresh(self):
+        incremental = self.stats()
+        refresh_category_stats()
+        self.assertEqual(incremental, self.stats())
+
+    def write(self, product, **changes):
+        with self.captureOnCommitCallbacks(execute=True):
+            for name, value in changes.items():
+                setattr(product, name, value)
+            product.save()
+        self.assertStatsMatchRefresh()
+
+    def test_product_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            rig = Product.objects.create(title="Gaming Rig", price=Decimal("2000.00"), category=self.gaming)
+            notebook = Product.objects.create(title="Notebook", price=Decimal("800.00"), category=self.laptops)
+            kettle = Product.objects.create(title="Kettle", price=Decimal("30.00"), category=self.kitchen)
+            mouse = Product.objects.create(title="Mouse", price=Decimal("900.00"), category=self.gaming)
+        self.assertStatsMatchRefresh()
+        self.assertEqual(self.stats()["Electronics"][:3], (3, Decimal("800.00"), Decimal("2000.00")))
+
+        # Neither holds a price bound of the subtrees they leave
+        self.write(mouse, is_active=False)
+        self.write(mouse, is_active=True)
+        self.write(mouse, category=self.kitchen)
+        self.write(mouse, category=self.gaming)
+
+        # Between subtrees, taking Electronics' max price with it
+        self.write(rig, category=self.kitchen)
+        self.write(notebook, is_active=False)
+        self.write(notebook, is_active=True)
+        self.write(kettle, price=Decimal("25.00"))
+        # A new max, then back below the old one
+        self.write(notebook, price=Decimal("3000.00"))
+        self.write(notebook, price=Decimal("700.00"))
+        self.write(rig, category=self.gaming, price=Decimal("1500.00"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rig.delete()
+        self.assertStatsMatchRefresh()
+        self.assertEqual(self.stats()["Gaming"][:3], (1, Decimal("900.00"), Decimal("900.00")))
+        self.assertEqual(self.stats()["Electronics"][:3], (2, Decimal("700.00"), Decimal("900.00")))
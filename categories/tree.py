@@ -0,0 +1,193 @@
+"""
+Category hierarchy stored as materialized paths, and per-subtree product stats.
+
+Every category keeps `path`, the ids from its root down to itself
+("/1/5/12/" for Gaming under Laptops under Electronics), and its `depth`.
+A whole subtree is then one indexed prefix match,
+`path LIKE '/1/%'`, with no recursive query, and a category's ancestors are
+read straight from its own path.
+
+Each category also stores stats over the active products of its subtree:
+`product_count`, `min_price`, `max_price` and `products_updated_at`, so the
+category list renders "(123 items, from 9.99 ETB)" from its own rows.
+
+- Product saves that change category, is_active or price, and product
+  deletes, adjust the stats of every ancestor in one UPDATE: counts by one,
+  price bounds with LEAST/GREATEST. Only when the product leaving a category
+  held its min or max price, or its latest update, is that category
+  recomputed from the subtree.
+  These run after the product's transaction commits, in their own short
+  statements, so catalog writes under one root never queue on the root
+  row's lock for the length of each other's transactions. A change lost
+  between the commit and its UPDATE is corrected by the periodic refresh.
+- Moving a category recomputes the stats of its old and new ancestors.
+- Bulk writes that bypass the model (the importer, bulk price updates)
+  recompute the stats of the categories they touched, and a periodic full
+  refresh corrects any drift, e.g. from raw SQL.
+"""
+from django.db import connection, transaction
+from django.db.models import Case, DecimalField, F, PositiveIntegerField, Value, When
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from ecommerce.cache import bump_generation
+from .models import Category
+
+
+def ancestor_ids(path):
+    """Ids on a materialized path, root first, including the category itself."""
+    return [int(part) for part in path.strip("/").split("/") if part]
+
+
+def subtree_filter(path, prefix=""):
+    """Lookup matching a category and all its descendants, e.g. prefix="category__"."""
+    return {f"{prefix}path__startswith": path}
+
+
+def _invalidate():
+    transaction.on_commit(lambda: bump_generation("categories_list"))
+
+
+def apply_product_change(added=None, removed=None, updated_at=None, removed_updated_at=None):
+    """
+    Count one active product into and/or out of the stats of a category and
+    all its ancestors. `added` and `removed` are (category id, price) pairs,
+    e.g. both for a price change; `updated_at` is the product's timestamp
+    where it is added, `removed_updated_at` the one it had where it leaves.
+    Applied once the current transaction commits.
+    """
+    if any(pair and pair[0] for pair in (added, removed)):
+        transaction.on_commit(lambda: _apply_product_change(added, removed, updated_at, removed_updated_at))
+
+
+def _apply_product_change(added, removed, updated_at, removed_updated_at):
+    pairs = [pair for pair in (added, removed) if pair and pair[0]]
+    paths = dict(Category.objects.filter(pk__in={category_id for category_id, _ in pairs}).values_list("pk", "path"))
+
+    counts, added_price = {}, {}
+    for pair, change in ((added, 1), (removed, -1)):
+        if pair and pair[0] in paths:
+            for pk in ancestor_ids(paths[pair[0]]):
+                counts[pk] = counts.get(pk, 0) + change
+                if change > 0:
+                    added_price[pk] = pair[1]
+    if not counts:
+        return
+
+    price = DecimalField(max_digits=10, decimal_places=2)
+    updates = {
+        "product_count": Case(
+            # Clamped at zero: a count that drifted low must not fail the update
+            *(When(pk=pk, then=Greatest(F("product_count") + change, 0)) for pk, change in counts.items() if change),
+            default=F("product_count"),
+            output_field=PositiveIntegerField(),
+        ),
+    }
+    if added_price:
+        updates["min_price"] = Case(
+            *(When(pk=pk, then=Least(Coalesce("min_price", Value(p, price)), Value(p, price))) for pk, p in added_price.items()),
+            default=F("min_price"),
+        )
+        updates["max_price"] = Case(
+            *(When(pk=pk, then=Greatest(Coalesce("max_price", Value(p, price)), Value(p, price))) for pk, p in added_price.items()),
+            default=F("max_price"),
+        )
+    if updated_at is not None and added_price:
+        # Only where the product now counts; where it left, the latest is recomputed below if it was it
+        updates["products_updated_at"] = Case(
+            *(When(pk=pk, then=Greatest(Coalesce("products_updated_at", Value(updated_at)), Value(updated_at)))
+              for pk in added_price),
+            default=F("products_updated_at"),
+        )
+    Category.objects.filter(pk__in=counts).update(**updates)
+
+    if removed and removed[0] in paths:
+        # Only a product that held a bound (or the latest update) can move it; recompute just those ancestors
+        left = ancestor_ids(paths[removed[0]])
+        _recompute([pk for pk in left if pk not in added_price], bound=removed[1], latest=removed_updated_at)
+        _recompute([pk for pk in left if pk in added_price], bound=removed[1])
+    _invalidate()
+
+
+def refresh_subtree_ancestors(old_path, new_path):
+    """Recompute the stats of the ancestors a category was moved away from and under."""
+    _recompute(set(ancestor_ids(old_path)[:-1]) | set(ancestor_ids(new_path)[:-1]))
+    _invalidate()
+
+
+def _recompute(category_ids, bound=None, latest=None):
+    """
+    Recompute the stats of `category_ids` from their subtrees' products.
+    With `bound`, only categories whose min or max price equals it, or with
+    `latest` too, whose products_updated_at equals that.
+    """
+    from products.models import Product
+
+    if not category_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            UPDATE {Category._meta.db_table} c
+            SET product_count = s.products, min_price = s.low, max_price = s.high,
+                products_updated_at = s.latest
+            FROM {Category._meta.db_table} a
+            CROSS JOIN LATERAL (
+                SELECT count(*) AS products, min(p.price) AS low, max(p.price) AS high,
+                       max(p.updated_at) AS latest
+                FROM {Product._meta.db_table} p
+                JOIN {Category._meta.db_table} x ON x.id = p.category_id
+                WHERE p.is_active AND x.path LIKE a.path || '%%'
+            ) s
+            WHERE c.id = a.id AND a.id = ANY(%s)
+              AND (%s::numeric IS NULL
+                   OR %s::numeric IN (a.min_price, a.max_price)
+                   OR a.products_updated_at = %s::timestamptz)
+        """, [list(category_ids), bound, bound, latest])
+
+
+def refresh_category_stats(category_ids=None):
+    """
+    Recompute product stats from the products table: for the given
+    categories and their ancestors, or for every category in one statement.
+    Returns the number of categories whose stats changed.
+    """
+    from products.models import Product
+
+    if category_ids is not None:
+        paths = Category.objects.filter(pk__in=category_ids).values_list("path", flat=True)
+        ids = {pk for path in paths for pk in ancestor_ids(path)}
+        _recompute(ids)
+        if ids:
+            _invalidate()
+        return len(ids)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            WITH direct AS (
+                SELECT category_id, count(*) AS products, min(price) AS low, max(price) AS high,
+                       max(updated_at) AS latest
+                FROM {Product._meta.db_table}
+                WHERE is_active
+                GROUP BY category_id
+            ),
+            rolled_up AS (
+                SELECT ancestor::bigint AS id, sum(d.products) AS products, min(d.low) AS low,
+                       max(d.high) AS high, max(d.latest) AS latest
+                FROM direct d
+                JOIN {Category._meta.db_table} c ON c.id = d.category_id,
+                     unnest(string_to_array(trim(BOTH '/' FROM c.path), '/')) AS ancestor
+                GROUP BY 1
+            )
+            UPDATE {Category._meta.db_table} c
+            SET product_count = COALESCE(r.products, 0), min_price = r.low, max_price = r.high,
+                products_updated_at = r.latest
+            FROM {Category._meta.db_table} t
+            LEFT JOIN rolled_up r ON r.id = t.id
+            WHERE c.id = t.id
+              AND (c.product_count, c.min_price, c.max_price, c.products_updated_at)
+                  IS DISTINCT FROM (COALESCE(r.products, 0), r.low, r.high, r.latest)
+        """)
+        changed = cursor.rowcount
+
+    if changed:
+        _invalidate()
+    return changed
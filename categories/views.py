@@ -1,34 +1,70 @@
 from rest_framework.generics import ListAPIView
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
 from django.conf import settings
+from django.db.models import Max
+from ecommerce.cache import cached_view_response, canonical_query_key, is_cacheable, render_response
+from ecommerce.db_router import ReplicaReadMixin
 from .models import Category
-from .serializers import CategorySerializer
+from .serializers import CategoryTreeSerializer
 from drf_spectacular.utils import extend_schema, OpenApiExample
 
 
 @extend_schema(
     summary="List all categories",
-    description="Returns a list of all product categories available in the store. Cached for 15 minutes.",
-    responses={200: CategorySerializer(many=True)},
+    description=(
+        "Returns a list of all product categories available in the store. Cached for 15 minutes. "
+        "`parent` and `depth` place each category in the tree. `product_count`, `min_price`, `max_price` "
+        "and `products_updated_at` describe the active products of the category and all of its "
+        "subcategories; they are stored on the category, so they cost no extra queries."
+    ),
+    responses={200: CategoryTreeSerializer(many=True)},
     examples=[
         OpenApiExample(
             "Categories Example",
             value=[
-                {"id": 1, "name": "Books", "slug": "books"},
-                {"id": 2, "name": "Electronics", "slug": "electronics"},
+                {
+                    "id": 1, "name": "Electronics", "slug": "electronics", "parent": None, "depth": 0,
+                    "product_count": 123, "min_price": "9.99", "max_price": "2499.00",
+                    "products_updated_at": "2025-01-01T12:00:00Z",
+                },
+                {
+                    "id": 5, "name": "Laptops", "slug": "laptops", "parent": 1, "depth": 1,
+                    "product_count": 12, "min_price": "499.00", "max_price": "2499.00",
+                    "products_updated_at": "2025-01-01T12:00:00Z",
+                },
             ]
         )
     ],
 )
-class CategoryList(ListAPIView):
+class CategoryList(ReplicaReadMixin, ListAPIView):
     """
     List all categories with view-level caching.
     Categories are cached for 15 minutes since they don't change frequently.
+    Category signals bump the "categories_list" generation; stale entries are
+    served while one worker rebuilds them.
     """
-    serializer_class = CategorySerializer
+    serializer_class = CategoryTreeSerializer
     queryset = Category.objects.all()
 
-    @method_decorator(cache_page(settings.CACHE_TTL))
-    def dispatch(self, *args, **kwargs):
-        return super().dispatch(*args, **kwargs)
+    def get_last_modified(self):
+        """Newest category; renames and deletes are covered by the generation bump time."""
+        latest = Category.objects.aggregate(latest=Max("created_at"))["latest"]
+        return latest.timestamp() if latest else None
+
+    def list(self, request, *args, **kwargs):
+        if not is_cacheable(request):
+            return super().list(request, *args, **kwargs)
+
+        # Only pagination affects the response; other parameters must not split the cache
+        cache_key = canonical_query_key(
+            request.query_params,
+            filter(None, [self.paginator.page_query_param, self.paginator.page_size_query_param]),
+            defaults={self.paginator.page_query_param: "1"},
+        )
+        return cached_view_response(
+            request,
+            "categories_list",
+            cache_key,
+            lambda: render_response(self, request, super(CategoryList, self).list(request, *args, **kwargs)),
+            timeout=settings.CACHE_TTL,
+            last_modified=self.get_last_modified,
+        )
@@ -0,0 +1,345 @@
+"""
+Shared helpers for caching API responses in Redis.
+
+Responses are cached as their final rendered bytes plus content type and
+status code instead of pickled DRF Response objects. A cache hit is answered
+with a plain HttpResponse, skipping serialization, content negotiation and
+JSON rendering entirely. Bodies above API_CACHE_COMPRESS_MIN_BYTES are
+zlib-compressed before they are stored.
+
+Cached responses carry a strong ETag and Last-Modified, so conditional
+requests (If-None-Match / If-Modified-Since) are answered with a 304 straight
+from the entry's metadata.
+
+Invalidation is generational: writers bump a per-namespace counter (one INCR)
+instead of deleting keys by pattern. Each entry records the generation it was
+built in, so a bump marks every entry of the namespace stale at once; stale
+entries are still served while a single worker recomputes them.
+"""
+import hashlib
+import threading
+import time
+import zlib
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import NotSupportedError
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, urlencode
+
+from .db_router import use_primary
+
+
+MAX_KEY_LENGTH = 200
+CACHE_EVENTS = ("hit", "stale", "miss")
+
+# Hit/miss counts of this process not yet added to Redis (see record_cache_event)
+_pending_events = Counter()
+_pending_lock = threading.Lock()
+_pending_since = time.monotonic()
+
+
+def redis_connection():
+    """
+    Raw client of the default cache for data structures the cache API lacks
+    (sorted sets, hashes). Keys should still go through cache.make_key().
+    """
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection("default")
+    except (ImportError, NotImplementedError) as exc:
+        raise NotSupportedError("This feature requires the django-redis cache backend") from exc
+
+
+def render_response(view, request, response):
+    """
+    Render a DRF Response inside the view so its bytes can be cached.
+    APIView.finalize_response leaves an already rendered response untouched.
+    """
+    response.accepted_renderer = request.accepted_renderer
+    response.accepted_media_type = request.accepted_media_type
+    response.renderer_context = view.get_renderer_context()
+    response.render()
+    return response
+
+
+def is_cacheable(request):
+    """Only JSON is cached; the browsable API embeds per-user HTML."""
+    return getattr(request.accepted_renderer, "format", None) == "json"
+
+
+def canonical_query_key(query_params, allowed, defaults=None):
+    """
+    Normalize query parameters into a stable cache key suffix.
+
+    Only `allowed` names are kept, with the value the view reads (the last one).
+    Empty values and values equal to `defaults` are dropped and names are sorted,
+    so parameter order, tracking parameters and explicit defaults do not split
+    the cache. Suffixes longer than MAX_KEY_LENGTH are hashed.
+    """
+    defaults = defaults or {}
+    items = []
+    for name in sorted(set(allowed)):
+        value = query_params.get(name, "").strip()
+        if value and value != defaults.get(name):
+            items.append((name, value))
+
+    key = urlencode(items) or "default"
+    if len(key) > MAX_KEY_LENGTH:
+        key = "sha1:" + hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return key
+
+
+def cache_response(key, response, timeout, **meta):
+    """
+    Store the rendered body, content type and status of `response` under `key`.
+    Extra keyword arguments are kept alongside as entry metadata.
+    """
+    body = response.content
+    compressed = (
+        getattr(settings, "API_CACHE_COMPRESS", True)
+        and len(body) >= getattr(settings, "API_CACHE_COMPRESS_MIN_BYTES", 1024)
+    )
+    cache.set(key, {
+        "body": zlib.compress(body) if compressed else body,
+        "compressed": compressed,
+        "content_type": response["Content-Type"],
+        "status": response.status_code,
+        "meta": meta,
+    }, timeout=timeout)
+
+
+def entry_response(entry):
+    """Build an HttpResponse from a cache entry written by `cache_response`."""
+    body = zlib.decompress(entry["body"]) if entry["compressed"] else entry["body"]
+    return HttpResponse(body, content_type=entry["content_type"], status=entry["status"])
+
+
+def get_cached_response(key):
+    """Return an HttpResponse built from the entry stored under `key`, or None."""
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    return entry_response(entry)
+
+
+def make_etag(*parts):
+    """Strong ETag from the values that determine a response body."""
+    return '"%s"' % hashlib.sha1(":".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+
+def set_validators(response, etag, last_modified):
+    response.headers["ETag"] = etag
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+def conditional_response(request, etag, last_modified):
+    """
+    Return a 304 carrying the validators when the request's If-None-Match /
+    If-Modified-Since headers match them, otherwise None.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def serve_entry(request, entry):
+    """Answer from a cache entry, with a 304 if the client already holds it."""
+    etag, last_modified = entry["meta"].get("etag"), entry["meta"].get("last_modified")
+    if etag is None:
+        return entry_response(entry)
+    return conditional_response(request, etag, last_modified) or set_validators(
+        entry_response(entry), etag, last_modified
+    )
+
+
+def _generation_key(namespace):
+    return f"generation:{namespace}"
+
+
+def get_generation(namespace):
+    """
+    Current generation counter of a cache namespace.
+
+    Entries written by `cached_view_response` record this counter, so bumping it
+    marks every entry of the namespace stale at once.
+    """
+    key = _generation_key(namespace)
+    generation = cache.get(key)
+    if generation is None:
+        # Seed from the clock so a lost counter never resurrects old entries.
+        cache.add(key, int(time.time()), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def _incr(key, initial, delta=1):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        cache.add(key, initial, timeout=None)
+        return cache.incr(key, delta)
+
+
+def bump_generation(namespace):
+    """Invalidate a whole namespace with a single INCR instead of a keyspace scan."""
+    cache.set(f"generation_at:{namespace}", int(time.time()), timeout=None)
+    return _incr(_generation_key(namespace), int(time.time()))
+
+
+def get_generation_changed_at(namespace):
+    """Unix time of the last bump of `namespace`, or None if unknown."""
+    return cache.get(f"generation_at:{namespace}")
+
+
+def record_cache_event(namespace, event):
+    """
+    Count a hit, stale hit or miss for `namespace` (see `get_cache_stats`).
+    Counts are buffered in the process and added to Redis at most once every
+    API_CACHE_STATS_FLUSH_SECONDS, so counting a hit costs no round trip.
+    """
+    global _pending_since
+    if not getattr(settings, "API_CACHE_STATS", True):
+        return
+    with _pending_lock:
+        _pending_events[namespace, event] += 1
+        if time.monotonic() - _pending_since < getattr(settings, "API_CACHE_STATS_FLUSH_SECONDS", 10):
+            return
+    flush_cache_events()
+
+
+def flush_cache_events():
+    """Add this process's buffered hit/miss counts to the shared counters."""
+    global _pending_since
+    with _pending_lock:
+        pending = dict(_pending_events)
+        _pending_events.clear()
+        _pending_since = time.monotonic()
+    for (namespace, event), count in pending.items():
+        _incr(f"cache_stats:{namespace}:{event}", 0, count)
+
+
+def get_cache_stats(namespace):
+    """Hit, stale and miss counters of `namespace` and its hit ratio."""
+    flush_cache_events()
+    counters = cache.get_many([f"cache_stats:{namespace}:{event}" for event in CACHE_EVENTS])
+    stats = {event: counters.get(f"cache_stats:{namespace}:{event}", 0) for event in CACHE_EVENTS}
+    total = sum(stats.values())
+    stats["hit_ratio"] = round((stats["hit"] + stats["stale"]) / total, 4) if total else None
+    return stats
+
+
+def reset_cache_stats(namespace):
+    with _pending_lock:
+        for event in CACHE_EVENTS:
+            _pending_events.pop((namespace, event), None)
+    cache.delete_many([f"cache_stats:{namespace}:{event}" for event in CACHE_EVENTS])
+
+
+def _is_fresh(entry, generation):
+    meta = entry["meta"]
+    return meta.get("generation") == generation and meta.get("fresh_until", 0) > time.time()
+
+
+def cached_view_response(request, namespace, suffix, compute, timeout, last_modified=None):
+    """
+    Serve a view response through the cache with stale-while-revalidate.
+
+    Entries live for `timeout` + API_CACHE_STALE_SECONDS but are only fresh for
+    `timeout` and within the namespace generation they were built in. When an
+    entry is stale or missing, a short lock (cache.add) elects one caller to run
+    `compute()`, which must return a rendered response. Everyone else gets the
+    stale entry, or on a cold key waits for the lock holder to store its result,
+    so a flush under load costs one database round trip per key. A waiter whose
+    lock holder has not stored anything within API_CACHE_LOCK_SECONDS computes
+    the response itself, with validators, but does not store it.
+
+    `last_modified` is an optional callable returning a Unix timestamp from a
+    cheap aggregate. Together with the generation it yields the ETag and
+    Last-Modified, and a matching conditional request gets a 304 before
+    `compute()` runs.
+
+    Entries are computed on the primary database even in replica-routed
+    views, so a lagging replica is never cached for everyone; only the
+    `last_modified` aggregate is read through the view's routing.
+    """
+    key = f"{namespace}:{suffix}"
+    generation = get_generation(namespace)
+    entry = cache.get(key)
+    if entry is not None and _is_fresh(entry, generation):
+        record_cache_event(namespace, "hit")
+        return serve_entry(request, entry)
+
+    lock_timeout = getattr(settings, "API_CACHE_LOCK_SECONDS", 10)
+    lock_key = f"lock:{key}"
+    if cache.add(lock_key, 1, timeout=lock_timeout):
+        try:
+            # Another worker may have rebuilt the entry between our read and the lock
+            rebuilt = cache.get(key)
+            if rebuilt is not None and _is_fresh(rebuilt, generation):
+                record_cache_event(namespace, "hit")
+                return serve_entry(request, rebuilt)
+
+            record_cache_event(namespace, "miss")
+            response, etag, modified = _compute_response(request, namespace, suffix, generation, compute, last_modified)
+            if response.status_code == 200:
+                cache_response(
+                    key, response,
+                    timeout=timeout + getattr(settings, "API_CACHE_STALE_SECONDS", 300),
+                    generation=generation,
+                    fresh_until=time.time() + timeout,
+                    etag=etag,
+                    last_modified=modified,
+                )
+            return response
+        finally:
+            cache.delete(lock_key)
+
+    if entry is not None:
+        record_cache_event(namespace, "stale")
+        return serve_entry(request, entry)
+
+    # Cold key and another worker is computing it: wait for its result
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            record_cache_event(namespace, "hit")
+            return serve_entry(request, entry)
+    # The lock holder is slow or failed: compute without storing, still on the primary
+    record_cache_event(namespace, "miss")
+    return _compute_response(request, namespace, suffix, generation, compute, last_modified)[0]
+
+
+def _compute_response(request, namespace, suffix, generation, compute, last_modified):
+    """
+    Run `compute()` on the primary and attach ETag and Last-Modified to a 200.
+    Returns (response, etag, modified); the response is a 304, and etag None,
+    when the conditional request already matches.
+
+    The `last_modified` aggregate keeps the view's routing, so replica-routed
+    views read it from the replica: every write also bumps the generation (part
+    of the ETag) and its time (a floor for Last-Modified), so a lagging
+    aggregate can only cost a 200, never a wrong 304.
+    """
+    # Deletes do not move any updated_at, so the last bump counts as a change too
+    candidates = [get_generation_changed_at(namespace), last_modified() if last_modified else None]
+    modified = max((int(value) for value in candidates if value is not None), default=None)
+    etag = make_etag(namespace, generation, suffix, modified)
+
+    not_modified = conditional_response(request, etag, modified)
+    if not_modified is not None:
+        return not_modified, None, None
+
+    # The body is shared through the cache; never build it from a lagging replica
+    with use_primary():
+        response = compute()
+    if response.status_code == 200:
+        set_validators(response, etag, modified)
+    return response, etag, modified
@@ -0,0 +1,291 @@
+"""
+Two-tier cache backend: a per-process LRU (L1) in front of django-redis.
+
+Hot, read-mostly keys (response entries and the generation counters they are
+checked against) are kept in memory for up to L1_TIMEOUT seconds, so a cache
+hit on the category or product list costs no Redis round trip and no
+unpickling. Only keys starting with one of L1_KEY_PREFIXES use the L1; locks,
+counters and sessions always go straight to Redis.
+
+Every write of an L1 key (set, add, delete, incr, ...) evicts the local copy
+and publishes the key on a Redis pub/sub channel. A daemon thread in each
+process (one per gunicorn worker) listens on that channel and evicts the keys
+from its own L1, so invalidation through the normal cache API, e.g. the
+product and category signals, reaches every worker within milliseconds.
+
+The L1 is only used while that subscription is live: until the listener has
+subscribed, and again after it loses its connection, reads go to Redis and
+the L1 is emptied. A value read from Redis is only kept when no invalidation
+arrived while it was being fetched, so a concurrent write cannot leave an
+older copy behind.
+
+Values in the L1 are shared between threads: treat what `get` returns for L1
+keys as read-only.
+
+Configuration (CACHES["default"]["OPTIONS"]):
+    L1_KEY_PREFIXES   keys eligible for the L1 (default: none, L1 disabled)
+    L1_MAX_ENTRIES    entries per process before least recently used are dropped
+    L1_TIMEOUT        seconds an entry may be served from memory
+    L1_CHANNEL        pub/sub channel name, namespaced with KEY_PREFIX
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django_redis.cache import RedisCache
+
+
+logger = logging.getLogger(__name__)
+
+CLEAR_ALL = "*"
+# Seconds between reconnection attempts of the invalidation listener
+RECONNECT_SECONDS = 1
+# Longest wait for one pub/sub message; keep it below the client's SOCKET_TIMEOUT
+POLL_SECONDS = 1
+_MISSING = object()
+
+
+class LocalLRU:
+    """Thread-safe LRU map whose entries expire `timeout` seconds after they are stored."""
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def evict(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class L1Layer:
+    """
+    The L1 of one process and the listener thread keeping it coherent.
+    Django creates a cache backend per thread; they all share this layer.
+    """
+    _layers = {}
+    _layers_lock = threading.Lock()
+
+    def __init__(self, channel, max_entries, timeout):
+        self.channel = channel
+        self.entries = LocalLRU(max_entries, timeout)
+        self.subscribed = threading.Event()
+        # Bumped for every invalidation seen; guards L1 fills against racing writes
+        self.invalidations = 0
+        self.pid = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_channel(cls, channel, max_entries, timeout):
+        with cls._layers_lock:
+            if channel not in cls._layers:
+                cls._layers[channel] = cls(channel, max_entries, timeout)
+            return cls._layers[channel]
+
+    def ready(self, get_client):
+        """Start the listener in this process if needed; True once it is subscribed."""
+        if self.pid != os.getpid():
+            with self._lock:
+                if self.pid != os.getpid():
+                    # After a fork the parent's listener thread does not exist here
+                    self.pid = os.getpid()
+                    self.subscribed = threading.Event()
+                    self.entries.clear()
+                    threading.Thread(
+                        target=self._listen,
+                        args=(get_client, self.subscribed),
+                        name="cache-l1-invalidation",
+                        daemon=True,
+                    ).start()
+        return self.subscribed.is_set()
+
+    def _listen(self, get_client, subscribed):
+        while True:
+            pubsub = None
+            try:
+                pubsub = get_client().pubsub()
+                pubsub.subscribe(self.channel)
+                while True:
+                    # Poll rather than block: a quiet channel must not hit SOCKET_TIMEOUT
+                    message = pubsub.get_message(timeout=POLL_SECONDS)
+                    if message is None:
+                        continue
+                    if message["type"] == "subscribe":
+                        # Anything cached before now may have missed an invalidation
+                        self.entries.clear()
+                        subscribed.set()
+                    elif message["type"] == "message":
+                        self.evict(message["data"].decode().split("\n"))
+            except Exception:
+                logger.warning(
+                    "Cache L1 invalidation listener disconnected; L1 disabled until it reconnects",
+                    exc_info=True,
+                )
+            finally:
+                subscribed.clear()
+                self.entries.clear()
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+            time.sleep(RECONNECT_SECONDS)
+
+    def evict(self, made_keys):
+        with self._lock:
+            self.invalidations += 1
+        if CLEAR_ALL in made_keys:
+            self.entries.clear()
+        else:
+            self.entries.evict(made_keys)
+
+
+class TwoTierRedisCache(RedisCache):
+    def __init__(self, server, params):
+        options = dict(params.get("OPTIONS", {}))
+        self.l1_key_prefixes = tuple(options.pop("L1_KEY_PREFIXES", ()))
+        max_entries = options.pop("L1_MAX_ENTRIES", 1000)
+        timeout = options.pop("L1_TIMEOUT", 10)
+        channel = options.pop("L1_CHANNEL", "cache_invalidation")
+        super().__init__(server, {**params, "OPTIONS": options})
+        self.l1 = L1Layer.for_channel(self.make_key(channel), max_entries, timeout)
+
+    def _uses_l1(self, key):
+        return bool(self.l1_key_prefixes) and str(key).startswith(self.l1_key_prefixes)
+
+    def _l1_ready(self):
+        return self.l1.ready(lambda: self.client.get_client(write=True))
+
+    def _invalidate(self, keys, version=None):
+        """Evict L1 keys here and publish them to every other process."""
+        made = [self.make_key(key, version=version) for key in keys if self._uses_l1(key)]
+        if made:
+            self._publish(made)
+
+    def _publish(self, made_keys):
+        self.l1.evict(made_keys)
+        self.client.get_client(write=True).publish(self.l1.channel, "\n".join(made_keys))
+
+    # Reads
+
+    def get(self, key, default=None, version=None, client=None):
+        if client is not None or not self._uses_l1(key) or not self._l1_ready():
+            return super().get(key, default, version, client)
+
+        made = self.make_key(key, version=version)
+        value = self.l1.entries.get(made)
+        if value is not _MISSING:
+            return value
+
+        seen = self.l1.invalidations
+        value = super().get(key, _MISSING, version, client)
+        if value is _MISSING:
+            return default
+        if seen == self.l1.invalidations:
+            self.l1.entries.set(made, value)
+        return value
+
+    def get_many(self, keys, version=None, client=None):
+        keys = list(keys)
+        if client is not None or not self._l1_ready():
+            return super().get_many(keys, version=version, client=client)
+
+        found, remote = {}, []
+        for key in keys:
+            value = self.l1.entries.get(self.make_key(key, version=version)) if self._uses_l1(key) else _MISSING
+            if value is _MISSING:
+                remote.append(key)
+            else:
+                found[key] = value
+        if remote:
+            seen = self.l1.invalidations
+            fetched = super().get_many(remote, version=version)
+            if seen == self.l1.invalidations:
+                for key, value in fetched.items():
+                    if self._uses_l1(key):
+                        self.l1.entries.set(self.make_key(key, version=version), value)
+            found.update(fetched)
+        return found
+
+    # Writes
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, **kwargs):
+        result = super().set(key, value, timeout, version=version, **kwargs)
+        self._invalidate([key], version)
+        return result
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, **kwargs):
+        added = super().add(key, value, timeout, version=version, **kwargs)
+        # An L1 copy can outlive its Redis key, so a successful add is a change too
+        if added:
+            self._invalidate([key], version)
+        return added
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None, **kwargs):
+        result = super().set_many(data, timeout, version=version, **kwargs)
+        self._invalidate(data, version)
+        return result
+
+    def delete(self, key, version=None, **kwargs):
+        result = super().delete(key, version=version, **kwargs)
+        self._invalidate([key], version)
+        return result
+
+    def delete_many(self, keys, version=None, **kwargs):
+        keys = list(keys)
+        result = super().delete_many(keys, version=version, **kwargs)
+        self._invalidate(keys, version)
+        return result
+
+    def delete_pattern(self, *args, **kwargs):
+        result = super().delete_pattern(*args, **kwargs)
+        if self.l1_key_prefixes:
+            self._publish([CLEAR_ALL])
+        return result
+
+    def incr(self, key, delta=1, version=None, **kwargs):
+        value = super().incr(key, delta, version=version, **kwargs)
+        self._invalidate([key], version)
+        return value
+
+    def decr(self, key, delta=1, version=None, **kwargs):
+        value = super().decr(key, delta, version=version, **kwargs)
+        self._invalidate([key], version)
+        return value
+
+    def clear(self):
+        result = super().clear()
+        if self.l1_key_prefixes:
+            self._publish([CLEAR_ALL])
+        return result
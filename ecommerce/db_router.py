@@ -0,0 +1,134 @@
+"""
+Read-replica routing.
+
+Writes always go to the primary ("default"). Reads go to the primary too,
+unless a view opts in with ReplicaReadMixin: then the reads of its safe
+requests (GET, HEAD, OPTIONS) are served by the "replica" database, configured
+from DATABASE_REPLICA_URL. Without a replica everything stays on the primary.
+
+The choice is held in a context variable for the duration of one request, so
+code outside such views (checkout, payments, stock updates, Celery tasks,
+management commands) never reads from a replica.
+
+Read-your-writes: after an authenticated user's successful write,
+PrimaryPinMiddleware pins that user to the primary for REPLICA_PIN_SECONDS,
+longer than the replica is expected to lag. Views that write on a GET (the
+payment verification redirect) call pin_to_primary() themselves.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+
+PRIMARY = "default"
+REPLICA = "replica"
+
+_read_database = ContextVar("read_database", default=None)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def read_database():
+    """Alias reads are routed to right now."""
+    return _read_database.get() or PRIMARY
+
+
+@contextmanager
+def use_primary():
+    """
+    Read from the primary inside the block, e.g. to fill a shared cache that
+    must not capture a lagging replica.
+    """
+    token = _read_database.set(None)
+    try:
+        yield
+    finally:
+        _read_database.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_database.get()
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same data on both aliases
+        if {obj1._state.db, obj2._state.db} <= {PRIMARY, REPLICA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema through replication
+        return False if db == REPLICA else None
+
+
+def _pin_key(user_id):
+    return f"db_pin:user:{user_id}"
+
+
+def pin_to_primary(user_id):
+    """Keep a user reading from the primary for REPLICA_PIN_SECONDS."""
+    if replica_configured():
+        cache.set(_pin_key(user_id), 1, timeout=settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user):
+    return bool(user and user.is_authenticated and cache.get(_pin_key(user.pk)))
+
+
+class ReplicaReadMixin:
+    """
+    Serve the reads of safe requests from the replica.
+
+    The decision is made after authentication, so users who wrote within
+    REPLICA_PIN_SECONDS keep reading from the primary. Actions listed in
+    `primary_actions` always read from the primary.
+    """
+    primary_actions = ()
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _read_database.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _read_database.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            replica_configured()
+            and request.method in SAFE_METHODS
+            and getattr(self, "action", None) not in self.primary_actions
+            and not is_pinned(request.user)
+        ):
+            _read_database.set(REPLICA)
+
+
+class PrimaryPinMiddleware:
+    """
+    Pin a user to the primary for REPLICA_PIN_SECONDS after any successful
+    unsafe request. request.user is read after the view ran, so users
+    authenticated by DRF (JWT) are covered too.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            replica_configured()
+            and request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and getattr(request, "user", None) is not None
+            and request.user.is_authenticated
+        ):
+            pin_to_primary(request.user.pk)
+        return response
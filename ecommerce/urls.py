@@ -53,11 +53,19 @@ def home_view(request):
         <h3>Products</h3>
         <ul>
             <li><span class="method get">GET</span> <a href="/api/products/">/api/products/</a> - List all products</li>
-            <li><span class="method get">GET</span> /api/products/&lt;id&gt;/ - Retrieve single product</li>
+            <li><span class="method get">GET</span> /api/products/&lt;id or slug&gt;/ - Retrieve single product</li>
+            <li><span class="method get">GET</span> /api/products/&lt;id or slug&gt;/related/ - Frequently bought together</li>
+            <li><span class="method get">GET</span> /api/products/bestsellers/ - Top sellers by window and category</li>
+            <li><span class="method get">GET</span> /api/products/suggest/?q=lap - Autocomplete product titles and categories</li>
+            <li><span class="method get">GET</span> /api/products/export/?format=csv - Stream the whole catalog as NDJSON/CSV</li>
+            <li><span class="method get">GET</span> /api/products/changes/?since=&lt;seq&gt; - Catalog changes for delta sync</li>
+            <li><span class="method get">GET</span> /api/products/cache-stats/ - Catalog cache hit/miss counters (Admin only)</li>
             <li><span class="method post">POST</span> /api/products/ - Create product (Admin only)</li>
+            <li><span class="method post">POST</span> /api/products/import/ - Bulk import products from CSV/NDJSON (Admin only)</li>
+            <li><span class="method post">POST</span> /api/products/bulk-update/ - Batch stock/price update (Admin only)</li>
             <li><span class="method put">PUT</span> /api/products/&lt;id&gt;/ - Update product (Admin only)</li>
             <li><span class="method delete">DELETE</span> /api/products/&lt;id&gt;/ - Delete product (Admin only)</li>
-            <li>Query params: ?category__id=1, ?search=laptop, ?ordering=price</li>
+            <li>Query params: ?category__id=1, ?category_tree=electronics, ?search=laptop, ?ordering=price</li>
         </ul>
 
         <h3>Categories</h3>
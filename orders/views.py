@@ -5,6 +5,7 @@ from django.db import transaction
 from django.utils import timezone
 from decimal import Decimal
 
+from ecommerce.db_router import ReplicaReadMixin
 from .models import Order, OrderItem
 from .serializers import OrderSerializer, CreateOrderSerializer
 try:
@@ -12,7 +13,7 @@ try:
     CELERY_AVAILABLE = True
 except ImportError:
     CELERY_AVAILABLE = False
-from cart.models import Cart
+from cart.storage import get_cart_storage
 from addresses.models import Address
 from coupons.models import Coupon
 from products.models import Product
@@ -34,16 +35,18 @@ def create_order(request):
     coupon_code = serializer.validated_data.get('coupon_code', '').strip()
     use_shipping_as_billing = serializer.validated_data.get('use_shipping_as_billing', False)
 
-    # Get cart
-    try:
-        cart = Cart.objects.prefetch_related('items__product').get(user=user)
-    except Cart.DoesNotExist:
+    # Snapshot the cart once; items added from here on stay in the cart
+    storage = get_cart_storage()
+    snapshot = storage.snapshot(user)
+    if snapshot is None:
         return Response(
             {'error': 'Cart not found'},
             status=status.HTTP_404_NOT_FOUND
         )
 
-    if not cart.items.exists():
+    products = Product.objects.in_bulk(snapshot)
+    lines = [(products[product_id], quantity) for product_id, quantity in snapshot.items() if product_id in products]
+    if not lines:
         return Response(
             {'error': 'Cart is empty'},
             status=status.HTTP_400_BAD_REQUEST
@@ -74,8 +77,8 @@ def create_order(request):
 
     # Calculate subtotal
     subtotal = Decimal('0.00')
-    for item in cart.items.all():
-        subtotal += item.subtotal
+    for product, quantity in lines:
+        subtotal += product.price * quantity
 
     # Validate and apply coupon
     discount_amount = Decimal('0.00')
@@ -109,9 +112,9 @@ def create_order(request):
     # Create order and order items atomically
     with transaction.atomic():
         # Check stock availability with row-level locking
-        for cart_item in cart.items.select_related('product'):
-            product = Product.objects.select_for_update().get(id=cart_item.product.id)
-            if product.stock < cart_item.quantity:
+        for cart_product, quantity in lines:
+            product = Product.objects.select_for_update().get(id=cart_product.id)
+            if product.stock < quantity:
                 return Response(
                     {'error': f'Insufficient stock for {product.title}. Only {product.stock} available.'},
                     status=status.HTTP_400_BAD_REQUEST
@@ -130,14 +133,14 @@ def create_order(request):
         )
 
         # Create order items (snapshot product details)
-        for cart_item in cart.items.select_related('product'):
+        for product, quantity in lines:
             OrderItem.objects.create(
                 order=order,
-                product=cart_item.product,
-                product_title=cart_item.product.title,
-                product_price=cart_item.product.price,
-                quantity=cart_item.quantity,
-                subtotal=cart_item.subtotal
+                product=product,
+                product_title=product.title,
+                product_price=product.price,
+                quantity=quantity,
+                subtotal=product.price * quantity
             )
 
         # Increment coupon usage
@@ -145,8 +148,8 @@ def create_order(request):
             coupon.used_count += 1
             coupon.save(update_fields=['used_count'])
 
-        # Clear cart
-        cart.items.all().delete()
+        # Take the ordered items out of the cart
+        storage.consume(user, snapshot)
 
     # Send order confirmation email asynchronously if Celery is available
     if CELERY_AVAILABLE:
@@ -158,10 +161,12 @@ def create_order(request):
     )
 
 
-class OrderViewSet(viewsets.ReadOnlyModelViewSet):
+class OrderViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for listing and retrieving user's orders.
     Read-only - orders cannot be modified directly after creation.
+    Order history reads come from the replica when configured; a user who just
+    checked out or paid is pinned to the primary for a few seconds.
     """
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
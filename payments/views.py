@@ -16,7 +16,9 @@ try:
     CELERY_AVAILABLE = True
 except ImportError:
     CELERY_AVAILABLE = False
+from ecommerce.db_router import pin_to_primary
 from orders.models import Order
+from products.bestsellers import record_sales
 from products.models import Product
 
 
@@ -204,6 +206,7 @@ def verify_payment(request):
                     order.save(update_fields=['status', 'confirmed_at'])
 
                     # Deduct stock for each order item
+                    sold = []
                     for order_item in order.items.select_related('product'):
                         product = Product.objects.select_for_update().get(id=order_item.product.id)
 
@@ -216,6 +219,13 @@ def verify_payment(request):
                         # Deduct stock
                         product.stock -= order_item.quantity
                         product.save(update_fields=['stock'])
+                        sold.append((product.id, product.category_id, order_item.quantity))
+
+                    # Count the sales in the bestseller leaderboards once the order is committed
+                    transaction.on_commit(lambda: record_sales(sold, order.confirmed_at))
+
+                # This GET wrote; let the buyer's order history read it back from the primary
+                pin_to_primary(order.user_id)
 
                 # Send payment confirmation email asynchronously if Celery is available
                 if CELERY_AVAILABLE:
@@ -0,0 +1,241 @@
+"""
+Real-time bestseller leaderboards in Redis sorted sets.
+
+When a payment is verified, the quantities of the order's items are added
+(ZINCRBY) to sorted sets keyed by product id:
+
+    bestsellers:all                         units sold, all time
+    bestsellers:category:<id>               all time, per category subtree
+    bestsellers:day:<YYYYMMDD>              one UTC day
+    bestsellers:day:<YYYYMMDD>:category:<id>
+
+A sale is credited to the product's category and every ancestor on its
+materialized path, so a parent's leaderboard includes its children's
+products. Live updates and `rebuild` both use the category the product is in
+when they run; sales recorded before a product or category moved keep their
+old placement until the next rebuild.
+
+Day buckets expire once the longest window no longer needs them. A rolling
+window ("7d": today and the six days before) is the ZUNIONSTORE of its day
+buckets, kept for BESTSELLERS_WINDOW_CACHE_SECONDS, so every read is a single
+ZREVRANGE instead of a GROUP BY over all order items.
+
+The sets are a projection of order history: `rebuild` recomputes them from
+paid orders, e.g. after Redis lost its data or orders were changed by hand.
+"""
+import logging
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from categories.models import Category
+from categories.tree import ancestor_ids
+from ecommerce.cache import redis_connection
+from orders.models import OrderItem
+from .models import Product
+from .recommendations import PAID_STATUSES
+
+
+logger = logging.getLogger(__name__)
+
+# Window name -> number of UTC days, None for all time
+WINDOWS = {"all": None, "1d": 1, "7d": 7, "30d": 30}
+MAX_LIMIT = 100
+REBUILD_KEY = "bestsellers:rebuilding"
+REGISTRY_KEY = "bestsellers:keys"
+STAGING_SUFFIX = ":rebuild"
+# Payments confirmed this recently may still be committing
+SETTLE_SECONDS = 60
+
+
+def _key(name):
+    return cache.make_key(name)
+
+
+def _day(moment):
+    return moment.astimezone(dt_timezone.utc).strftime("%Y%m%d")
+
+
+def leaderboard_keys(category_path, day=None):
+    """
+    All-time sets a sale is counted in, or the day buckets of `day` (YYYYMMDD):
+    the overall set and one per category on `category_path`.
+    """
+    base = "bestsellers:all" if day is None else f"bestsellers:day:{day}"
+    prefix = "bestsellers" if day is None else base
+    return [base, *(f"{prefix}:category:{pk}" for pk in ancestor_ids(category_path or ""))]
+
+
+def _day_expires_at(day):
+    """Unix time after which no window reads the bucket of `day` any more."""
+    start = datetime.strptime(day, "%Y%m%d").replace(tzinfo=dt_timezone.utc)
+    return int((start + timedelta(days=max(filter(None, WINDOWS.values())) + 1)).timestamp())
+
+
+def _increment(pipe, totals, suffix=""):
+    """Queue ZINCRBY for {(name, product id): units} plus expiry and key registry."""
+    for (name, product_id), units in totals.items():
+        pipe.zincrby(_key(name) + suffix, units, product_id)
+    for name in {name for name, _ in totals}:
+        if name.startswith("bestsellers:day:"):
+            pipe.expireat(_key(name) + suffix, _day_expires_at(name.split(":")[2]))
+        pipe.sadd(_key(REGISTRY_KEY) + suffix, name)
+
+
+def _totals(sales, when):
+    totals = {}
+    day = _day(when)
+    paths = dict(
+        Category.objects.filter(pk__in={category_id for _, category_id, _ in sales}).values_list("pk", "path")
+    )
+    for product_id, category_id, quantity in sales:
+        path = paths.get(category_id)
+        for name in leaderboard_keys(path) + leaderboard_keys(path, day):
+            totals[(name, product_id)] = totals.get((name, product_id), 0) + quantity
+    return totals
+
+
+def record_sales(sales, when=None):
+    """
+    Count (product id, category id, quantity) sales confirmed at `when` in the
+    leaderboards of the category and its ancestors. One query for the category
+    paths and one pipelined round trip; call it after the order commits.
+
+    Failures are logged, not raised: the payment is already committed and
+    `rebuild` restores anything that was missed.
+    """
+    when = when or timezone.now()
+    if not sales:
+        return
+    try:
+        totals = _totals(sales, when)
+        redis = redis_connection()
+        pipe = redis.pipeline(transaction=False)
+        _increment(pipe, totals)
+        # A running rebuild takes sales confirmed after its cutoff from here
+        cutoff = redis.get(_key(REBUILD_KEY))
+        if cutoff is not None and when.timestamp() >= float(cutoff):
+            _increment(pipe, totals, STAGING_SUFFIX)
+        pipe.execute()
+    except Exception:
+        logger.exception("Could not record sales in the bestseller leaderboards")
+
+
+def _window_key(window, category_id):
+    """Key of the set to read for `window`, building a rolling union when needed."""
+    days = WINDOWS[window]
+    if days is None:
+        return _key("bestsellers:all" if category_id is None else f"bestsellers:category:{category_id}")
+
+    suffix = f":category:{category_id}" if category_id is not None else ""
+    today = timezone.now()
+    buckets = [_key(f"bestsellers:day:{_day(today - timedelta(days=offset))}{suffix}") for offset in range(days)]
+    if days == 1:
+        return buckets[0]
+
+    redis = redis_connection()
+    key = _key(f"bestsellers:window:{window}:{_day(today)}{suffix}")
+    if not redis.exists(key):
+        # Concurrent builders write the same union; the last one wins harmlessly
+        pipe = redis.pipeline()
+        pipe.zunionstore(key, buckets)
+        pipe.expire(key, settings.BESTSELLERS_WINDOW_CACHE_SECONDS)
+        pipe.execute()
+    return key
+
+
+def top_sellers(window="all", category_id=None, limit=10):
+    """Active products with the most units sold in `window`, best first."""
+    if window not in WINDOWS:
+        raise ValueError(f"Unknown window {window!r}; use one of: {', '.join(WINDOWS)}")
+
+    # Read past `limit` so deactivated products can be skipped without a second round trip
+    ranked = redis_connection().zrevrange(_window_key(window, category_id), 0, limit * 2 - 1, withscores=True)
+    ids = [int(member) for member, _ in ranked]
+    products = {
+        product["id"]: product
+        for product in Product.objects.filter(id__in=ids, is_active=True).values("id", "title", "slug", "price")
+    }
+
+    results = []
+    for product_id, (_, units) in zip(ids, ranked):
+        if product_id in products:
+            product = products[product_id]
+            results.append({**product, "price": str(product["price"]), "units_sold": int(units)})
+        if len(results) == limit:
+            break
+    return results
+
+
+def _history(queryset, by_day):
+    """{(name, product id): units} for order items of `queryset`."""
+    fields = ["product_id", "product__category__path"]
+    if by_day:
+        queryset = queryset.annotate(day=TruncDate("order__confirmed_at", tzinfo=dt_timezone.utc))
+        fields.append("day")
+
+    totals = {}
+    for row in queryset.values(*fields).annotate(units=Sum("quantity")).order_by():
+        product_id, path, units = row["product_id"], row["product__category__path"], row["units"]
+        day = row["day"].strftime("%Y%m%d") if by_day else None
+        for name in leaderboard_keys(path, day):
+            totals[(name, product_id)] = units
+    return totals
+
+
+def rebuild(settle_seconds=SETTLE_SECONDS):
+    """
+    Recompute every leaderboard from paid orders and swap them in atomically.
+
+    Orders confirmed before the cutoff are read from the database; sales
+    recorded after it are also written to the staging sets by `record_sales`,
+    so nothing is lost or counted twice while the rebuild runs. Waiting
+    `settle_seconds` first lets payments confirmed before the cutoff commit.
+    Returns the number of sets written, or None if another rebuild is running.
+    """
+    redis = redis_connection()
+    rebuild_key, registry = _key(REBUILD_KEY), _key(REGISTRY_KEY)
+    # A second in the future, so every sale confirmed after the cutoff sees the marker
+    cutoff = timezone.now() + timedelta(seconds=1)
+    if not redis.set(rebuild_key, cutoff.timestamp(), nx=True, ex=settings.BESTSELLERS_REBUILD_LOCK_SECONDS):
+        return None
+
+    try:
+        # Leftovers of an interrupted rebuild
+        staging_registry = registry + STAGING_SUFFIX
+        for name in redis.smembers(staging_registry):
+            redis.delete(_key(name.decode()) + STAGING_SUFFIX)
+        redis.delete(staging_registry)
+
+        time.sleep(settle_seconds)
+        items = OrderItem.objects.filter(order__status__in=PAID_STATUSES, order__confirmed_at__lt=cutoff)
+        oldest_day = (cutoff - timedelta(days=max(filter(None, WINDOWS.values())))).date()
+        totals = _history(items, by_day=False)
+        totals.update(_history(items.filter(order__confirmed_at__date__gte=oldest_day), by_day=True))
+
+        pipe = redis.pipeline(transaction=False)
+        _increment(pipe, totals, STAGING_SUFFIX)
+        pipe.execute()
+
+        # Swap every staged set in and drop leaderboards with no sales left, in one MULTI
+        staged = {name.decode() for name in redis.smembers(staging_registry)}
+        stale = {name.decode() for name in redis.smembers(registry)} - staged
+        pipe = redis.pipeline()
+        for name in staged:
+            pipe.rename(_key(name) + STAGING_SUFFIX, _key(name))
+        for name in stale:
+            pipe.delete(_key(name))
+        if staged:
+            pipe.rename(staging_registry, registry)
+        else:
+            pipe.delete(registry)
+        pipe.delete(rebuild_key)
+        pipe.execute()
+    finally:
+        redis.delete(rebuild_key)
+    return len(staged)
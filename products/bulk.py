@@ -0,0 +1,67 @@
+"""
+Set-based stock and price updates for warehouse sync.
+
+A whole batch is applied by one UPDATE ... FROM (VALUES ...) statement instead
+of one serializer validation and full-row save() per product. Rows whose stock
+and price already match are left untouched, and only the products that really
+changed have their cached details invalidated. Price changes also refresh the
+product stats (price range) of the categories of the products they touched.
+"""
+from django.db import NotSupportedError, connection, transaction
+
+from categories.tree import refresh_category_stats
+from ecommerce.cache import bump_generation
+from .cache import invalidate_product_details
+from .models import Product
+
+
+def bulk_update_stock_price(rows):
+    """
+    Apply validated {"id", "stock"?, "price"?} rows in a single statement.
+    Returns {id: "updated" | "unchanged" | "not_found"}.
+    """
+    if connection.vendor != "postgresql":
+        raise NotSupportedError("Bulk stock/price updates require PostgreSQL")
+    if not rows:
+        return {}
+
+    table = Product._meta.db_table
+    values = ", ".join(["(%s::bigint, %s::integer, %s::numeric(10, 2))"] * len(rows))
+    params = []
+    for row in rows:
+        params += [row["id"], row.get("stock"), row.get("price")]
+
+    # Omitted columns arrive as NULL and keep their current value
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"""
+            WITH batch (id, stock, price) AS (VALUES {values}),
+            changed AS (
+                UPDATE {table} p
+                SET stock = COALESCE(b.stock, p.stock),
+                    price = COALESCE(b.price, p.price),
+                    updated_at = now()
+                FROM batch b
+                WHERE p.id = b.id
+                  AND (p.stock, p.price) IS DISTINCT FROM
+                      (COALESCE(b.stock, p.stock), COALESCE(b.price, p.price))
+                RETURNING p.id, CASE WHEN b.price IS NOT NULL THEN p.category_id END AS priced_category_id
+            )
+            SELECT b.id, c.id IS NOT NULL, p.id IS NOT NULL, c.priced_category_id
+            FROM batch b
+            LEFT JOIN changed c ON c.id = b.id
+            LEFT JOIN {table} p ON p.id = b.id
+        """, params)
+        fetched = cursor.fetchall()
+        results = {
+            pk: "updated" if updated else "unchanged" if found else "not_found"
+            for pk, updated, found, _ in fetched
+        }
+        priced_categories = {category_id for *_, category_id in fetched if category_id}
+        if priced_categories:
+            refresh_category_stats(priced_categories)
+
+    updated_ids = [pk for pk, result in results.items() if result == "updated"]
+    if updated_ids:
+        bump_generation("products_list")
+        invalidate_product_details(updated_ids)
+    return results
@@ -0,0 +1,60 @@
+"""
+Cache keys and targeted invalidation for single products.
+
+Product details are cached per id under `product_detail:<id>`, and
+`product_slug:<slug>` points a slug at its id. Writes delete only the detail
+entries of the products they touch instead of flushing every product.
+
+An invalidation also stamps `product_version:<id>` with a new token. An entry
+records the token its filler read before loading the row, and is only served
+while the token is unchanged, so a fill that loaded the row before a write
+committed cannot bring the old row back after the write's invalidation.
+"""
+import uuid
+
+from django.core.cache import cache
+
+from ecommerce.cache import get_generation, get_generation_changed_at, make_etag
+
+
+def product_detail_key(pk):
+    return f"product_detail:{pk}"
+
+
+def product_slug_key(slug):
+    return f"product_slug:{slug}"
+
+
+def product_version_key(pk):
+    return f"product_version:{pk}"
+
+
+def product_validators(product_id, updated_at):
+    """
+    ETag and Last-Modified of a product detail response.
+    The embedded category only changes with a "categories_list" generation bump.
+    """
+    changed_at = get_generation_changed_at("categories_list")
+    modified = max(int(updated_at.timestamp()), changed_at or 0)
+    etag = make_etag("product_detail", product_id, updated_at.isoformat(), get_generation("categories_list"))
+    return etag, modified
+
+
+def invalidate_product_details(product_ids, batch_size=1000):
+    """Drop the cached detail responses of `product_ids` and move their versions on."""
+    product_ids = list(product_ids)
+    version = uuid.uuid4().hex
+    for start in range(0, len(product_ids), batch_size):
+        batch = product_ids[start:start + batch_size]
+        # Versions never expire: an entry filled late must not outlive the version that rejects it
+        cache.set_many({product_version_key(pk): version for pk in batch}, timeout=None)
+        cache.delete_many([product_detail_key(pk) for pk in batch])
+
+
+def invalidate_category_product_details(category_id):
+    """Drop the cached detail responses of every product in a category."""
+    from .models import Product
+
+    invalidate_product_details(
+        Product.objects.filter(category_id=category_id).values_list("id", flat=True).iterator()
+    )
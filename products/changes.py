@@ -0,0 +1,106 @@
+"""
+Catalog delta-sync feed for /api/products/changes/.
+
+Database triggers append a CatalogChange row for every product and category
+insert, update and delete. The feed reads them in (txid, seq) order and only
+from transactions older than the oldest one still running, so the order is
+append-only: nothing can later appear before a position a client has passed.
+Clients keep the `seq` of the last change they applied and ask for what came
+after it.
+
+Each batch is compacted: an object changed several times in the batch is
+reported once, with its current data for upserts.
+"""
+from decimal import Decimal
+
+from django.db import NotSupportedError, connection
+from django.db.models import Min, Q
+from django.db.models.expressions import RawSQL
+
+from categories.models import Category
+from .export import EXPORT_FIELDS, product_rows
+from .models import CatalogChange, Product
+
+
+CATEGORY_FIELDS = ("id", "name", "slug")
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+
+
+class ChangeLogPruned(Exception):
+    """The requested position is older than the retained change log."""
+
+
+def finished_changes():
+    """Changes written by transactions that have all finished, in feed order."""
+    if connection.vendor != "postgresql":
+        raise NotSupportedError("The catalog change feed requires PostgreSQL (change log triggers)")
+    return CatalogChange.objects.filter(
+        txid__lt=RawSQL("pg_snapshot_xmin(pg_current_snapshot())::text::bigint", [])
+    ).order_by("txid", "seq")
+
+
+def current_position():
+    """Seq of the latest change a client can start after; 0 when the log is empty."""
+    return finished_changes().reverse().values_list("seq", flat=True).first() or 0
+
+
+def changes_after(since, limit=DEFAULT_LIMIT):
+    """
+    Up to `limit` changes after the change `since` (0 starts at the oldest
+    retained change). Returns (changes, next_since, has_more).
+    """
+    changes = finished_changes()
+    if since:
+        txid = CatalogChange.objects.filter(seq=since).values_list("txid", flat=True).first()
+        if txid is None:
+            oldest = CatalogChange.objects.aggregate(oldest=Min("seq"))["oldest"]
+            if oldest is None or since < oldest:
+                raise ChangeLogPruned(f"Change {since} is no longer retained")
+            raise ValueError(f"Unknown change sequence: {since}")
+        changes = changes.filter(Q(txid__gt=txid) | Q(txid=txid, seq__gt=since))
+
+    rows = list(changes.values_list("seq", "entity", "object_id", "op")[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    # Last change per object wins; objects are ordered by their last change
+    latest = {}
+    for seq, entity, object_id, op in rows:
+        latest.pop((entity, object_id), None)
+        latest[(entity, object_id)] = (seq, op)
+
+    data = load_objects([key for key, (_, op) in latest.items() if op == "upsert"])
+    results = []
+    for (entity, object_id), (seq, op) in latest.items():
+        change = {"seq": seq, "entity": entity, "op": op, "id": object_id}
+        if op == "upsert":
+            current = data.get((entity, object_id))
+            if current is None:
+                # Deleted since; its delete entry may still be held back
+                change["op"] = "delete"
+            else:
+                change["data"] = current
+        results.append(change)
+
+    next_since = rows[-1][0] if rows else since
+    return results, next_since, has_more
+
+
+def load_objects(keys):
+    """Current rows for (entity, id) keys, in one query per entity."""
+    product_ids = [object_id for entity, object_id in keys if entity == "product"]
+    category_ids = [object_id for entity, object_id in keys if entity == "category"]
+
+    data = {}
+    if product_ids:
+        for row in product_rows(Product.objects.filter(id__in=product_ids)):
+            # Decimals as strings, like the product API (the JSON renderer would emit floats)
+            data[("product", row[0])] = {
+                name: str(value) if isinstance(value, Decimal) else value
+                for name, value in zip(EXPORT_FIELDS, row)
+            }
+    if category_ids:
+        for row in Category.objects.filter(id__in=category_ids).values_list(*CATEGORY_FIELDS):
+            data[("category", row[0])] = dict(zip(CATEGORY_FIELDS, row))
+    return data
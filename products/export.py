@@ -0,0 +1,94 @@
+"""
+Streaming catalog export for /api/products/export/.
+
+Rows are read with a server-side cursor (QuerySet.iterator) as plain tuples
+and written out chunk by chunk through a StreamingHttpResponse, so memory
+stays flat however large the catalog is. Rows come in (updated_at, id) order;
+`?updated_since=` turns a full dump into an incremental pull.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from rest_framework import renderers
+
+from .models import Product
+
+
+EXPORT_FIELDS = (
+    "id", "title", "slug", "description", "price", "category_id", "category_slug",
+    "stock", "is_active", "rating_avg", "rating_count", "created_at", "updated_at",
+)
+CHUNK_SIZE = 2000
+
+
+class NDJSONRenderer(renderers.BaseRenderer):
+    """One JSON object per line. Only non-streamed (error) responses go through render()."""
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, cls=DjangoJSONEncoder) + "\n"
+
+
+class CSVRenderer(NDJSONRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+
+def export_queryset(updated_since=None):
+    """
+    Products to export, oldest change first. A full export has active products
+    only; an incremental one also includes deactivated products so consumers
+    can drop them.
+    """
+    queryset = Product.objects.all()
+    if updated_since is None:
+        queryset = queryset.filter(is_active=True)
+    else:
+        queryset = queryset.filter(updated_at__gte=updated_since)
+    return product_rows(queryset.order_by("updated_at", "id"))
+
+
+def product_rows(queryset):
+    """EXPORT_FIELDS tuples for `queryset`, category slug included."""
+    return queryset.annotate(category_slug=F("category__slug")).values_list(*EXPORT_FIELDS)
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def ndjson_chunks(queryset, chunk_size=CHUNK_SIZE):
+    encoder = DjangoJSONEncoder()
+    lines = []
+    for row in queryset.iterator(chunk_size=chunk_size):
+        lines.append(encoder.encode(dict(zip(EXPORT_FIELDS, row))))
+        if len(lines) >= chunk_size:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def csv_chunks(queryset, chunk_size=CHUNK_SIZE):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    lines = []
+    for row in queryset.iterator(chunk_size=chunk_size):
+        lines.append(writer.writerow(
+            value.isoformat() if hasattr(value, "isoformat") else value for value in row
+        ))
+        if len(lines) >= chunk_size:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
+
+
+STREAMS = {"ndjson": ndjson_chunks, "csv": csv_chunks}
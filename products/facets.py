@@ -0,0 +1,76 @@
+"""
+Facet counts for the product list (?facets=category,price).
+
+Both facets come from one grouped query over the filtered queryset: products
+are grouped by category and every price range is a conditional COUNT in the
+same row, so the price counts are the column sums.
+"""
+from django.conf import settings
+from django.db.models import Count, Q
+from rest_framework.exceptions import ValidationError
+
+
+FACETS = ("category", "price")
+
+
+def parse_facets(value):
+    """Validate a comma-separated ?facets= value; returns the requested names in order."""
+    names = list(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+    unknown = [name for name in names if name not in FACETS]
+    if unknown:
+        raise ValidationError({
+            "facets": f"Unknown facet: {', '.join(unknown)}. Choose from: {', '.join(FACETS)}"
+        })
+    return names
+
+
+def price_ranges():
+    """(min, max) pairs from PRODUCT_PRICE_FACET_BOUNDS; open-ended at both ends."""
+    bounds = [None, *settings.PRODUCT_PRICE_FACET_BOUNDS, None]
+    return list(zip(bounds, bounds[1:]))
+
+
+def compute_facets(queryset, names):
+    ranges = price_ranges()
+    price_counts = {}
+    for i, (low, high) in enumerate(ranges):
+        condition = Q()
+        if low is not None:
+            condition &= Q(price__gte=low)
+        if high is not None:
+            condition &= Q(price__lt=high)
+        price_counts[f"price_{i}"] = Count("id", filter=condition) if condition else Count("id")
+
+    # Ordering from ?ordering= would leak into GROUP BY
+    queryset = queryset.order_by()
+    if "category" in names:
+        rows = list(
+            queryset.values("category_id", "category__name", "category__slug")
+            .annotate(count=Count("id"), **(price_counts if "price" in names else {}))
+            .order_by("category__name")
+        )
+    else:
+        rows = [queryset.aggregate(**price_counts)]
+
+    facets = {}
+    for name in names:
+        if name == "category":
+            facets["category"] = [
+                {
+                    "id": row["category_id"],
+                    "name": row["category__name"],
+                    "slug": row["category__slug"],
+                    "count": row["count"],
+                }
+                for row in rows
+            ]
+        elif name == "price":
+            facets["price"] = [
+                {
+                    "min": None if low is None else str(low),
+                    "max": None if high is None else str(high),
+                    "count": sum(row[f"price_{i}"] for row in rows),
+                }
+                for i, (low, high) in enumerate(ranges)
+            ]
+    return facets
@@ -0,0 +1,105 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F
+from rest_framework import filters
+
+from categories.models import Category
+from categories.tree import subtree_filter
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """
+    PostgreSQL full-text search over Product.search_vector.
+
+    Keeps the `?search=` parameter of DRF's SearchFilter but matches against the
+    trigger-maintained tsvector column (GIN indexed) instead of running
+    ILIKE '%term%' over title and description. Matching rows are annotated with
+    a `relevance` rank so they can be sorted with `?ordering=relevance`.
+    """
+    search_config = "english"
+    search_description = (
+        "Full-text search on title and description. "
+        'Supports "quoted phrases", OR and -excluded words.'
+    )
+
+    def filter_queryset(self, request, queryset, view):
+        terms = request.query_params.get(self.search_param, "").replace("\x00", "").strip()
+        if not terms:
+            return queryset
+
+        query = SearchQuery(terms, config=self.search_config, search_type="websearch")
+        return queryset.filter(search_vector=query).annotate(
+            relevance=SearchRank(F("search_vector"), query)
+        )
+
+
+class ProductOrderingFilter(filters.OrderingFilter):
+    """
+    OrderingFilter that also understands computed sort keys.
+
+    `ordering_aliases` maps a public ordering name to the annotation or column
+    it sorts on. An alias is only honoured when its target exists on the
+    queryset, e.g. `relevance` only applies together with `?search=`.
+    """
+    ordering_aliases = {
+        "relevance": "-relevance",
+        # Most viewed first; counts are flushed from Redis in batches (products/popularity.py)
+        "popularity": "-view_count",
+    }
+
+    def remove_invalid_fields(self, queryset, fields, view, request):
+        valid_fields = []
+        for term in fields:
+            name = term.lstrip("-")
+            if name not in self.ordering_aliases:
+                valid_fields.extend(super().remove_invalid_fields(queryset, [term], view, request))
+                continue
+
+            target = self.ordering_aliases[name]
+            column = target.lstrip("-")
+            columns = {field.name for field in queryset.model._meta.concrete_fields}
+            if column not in queryset.query.annotations and column not in columns:
+                continue
+            if term.startswith("-"):
+                target = target[1:] if target.startswith("-") else f"-{target}"
+            valid_fields.append(target)
+        return valid_fields
+
+
+class CategoryTreeFilter(filters.BaseFilterBackend):
+    """
+    `?category_tree=<slug or id>`: products in a category or any of its
+    descendants. The category's materialized path is looked up by its unique
+    slug or id, then the products are matched with one indexed prefix
+    condition (category path LIKE '/1/5/%'), however deep the subtree is.
+    """
+    category_tree_param = "category_tree"
+
+    def filter_queryset(self, request, queryset, view):
+        lookup = request.query_params.get(self.category_tree_param, "").strip()
+        if not lookup:
+            return queryset
+
+        path = self.get_category_path(request, lookup)
+        if path is None:
+            return queryset.none()
+        return queryset.filter(**subtree_filter(path, prefix="category__"))
+
+    def get_category_path(self, request, lookup):
+        # The list, its facets and its Last-Modified check filter the same request
+        cached = getattr(request, "_category_tree_path", None)
+        if cached is None or cached[0] != lookup:
+            field = "pk" if lookup.isdigit() else "slug"
+            path = Category.objects.filter(**{field: lookup}).order_by().values_list("path", flat=True).first()
+            cached = request._category_tree_path = (lookup, path)
+        return cached[1]
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.category_tree_param,
+                "required": False,
+                "in": "query",
+                "description": "Category slug or id; matches products in that category and all of its subcategories.",
+                "schema": {"type": "string"},
+            },
+        ]
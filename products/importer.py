@@ -0,0 +1,337 @@
+"""
+Bulk product import through a staging table and PostgreSQL COPY.
+
+Rows are streamed from CSV or NDJSON, validated in Python and written to a
+temporary staging table with COPY in batches, so memory stays flat however
+large the file is. One INSERT ... SELECT ... ON CONFLICT (slug) DO UPDATE then
+upserts the whole file: categories are resolved by slug in the same statement
+and no model save() or signal runs per row. Category product stats are
+recomputed in the same transaction and the caches are invalidated once,
+after it commits.
+
+Explicit slugs are the upsert key. A row without a `slug` always creates a
+product: its slug comes from the title, with -2, -3, ... suffixes until it
+matches neither an existing product nor another row of the file, so a title
+never overwrites an unrelated product that happens to share its slug.
+"""
+import csv
+import io
+import json
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.db import NotSupportedError, connection, transaction
+from django.utils.text import slugify
+
+from categories.models import Category
+from categories.tree import refresh_category_stats
+from ecommerce.cache import bump_generation
+from .cache import invalidate_product_details
+from .models import Product
+
+
+FORMATS = ("csv", "ndjson")
+REQUIRED_FIELDS = ("title", "price", "category")
+STAGING_TABLE = "products_import_staging"
+STAGING_COLUMNS = (
+    "line", "title", "slug", "base", "n", "description", "price", "stock", "is_active", "category_slug",
+)
+TRUE_VALUES = {"1", "true", "t", "yes", "y"}
+FALSE_VALUES = {"0", "false", "f", "no", "n"}
+MAX_PRICE = Decimal("99999999.99")
+# Largest value of the stock integer column
+MAX_STOCK = 2147483647
+
+
+def detect_format(name):
+    """Guess the input format from a file name; defaults to CSV."""
+    return "ndjson" if name.lower().endswith((".ndjson", ".jsonl", ".json")) else "csv"
+
+
+def read_rows(stream, fmt):
+    """Yield (line number, row dict or error message) from a text stream."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        missing = [field for field in REQUIRED_FIELDS if field not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"Missing CSV columns: {', '.join(missing)}")
+        for line, row in enumerate(reader, start=2):
+            yield line, row
+        return
+
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError:
+            yield line, "Invalid JSON"
+            continue
+        yield line, row if isinstance(row, dict) else "Expected a JSON object"
+
+
+def parse_bool(value, default=True):
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f"Invalid boolean: {value!r}")
+
+
+class ProductImporter:
+    """
+    Stream CSV/NDJSON rows into Product with COPY and a single upsert.
+
+    Usage:
+        with open("catalog.csv", newline="") as stream:
+            summary = ProductImporter().run(stream, "csv")
+    """
+
+    def __init__(self, batch_size=50_000, max_errors=100):
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+
+    def run(self, stream, fmt):
+        if connection.vendor != "postgresql":
+            raise NotSupportedError("Bulk product import requires PostgreSQL (COPY)")
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported format {fmt!r}; use one of: {', '.join(FORMATS)}")
+
+        start = time.perf_counter()
+        self.errors, self.invalid, self.rows_read = [], 0, 0
+        self.slug_counts = {}
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"""
+                CREATE TEMPORARY TABLE {STAGING_TABLE} (
+                    line integer NOT NULL,
+                    title varchar(255) NOT NULL,
+                    slug varchar(255) NOT NULL,
+                    base varchar(255),
+                    n integer,
+                    description text,
+                    price numeric(10, 2) NOT NULL,
+                    stock integer NOT NULL,
+                    is_active boolean NOT NULL,
+                    category_slug text NOT NULL
+                ) ON COMMIT DROP
+            """)
+
+            staged = 0
+            batch = []
+            for line, row in read_rows(stream, fmt):
+                self.rows_read += 1
+                try:
+                    batch.append(self.clean(line, row))
+                except ValueError as exc:
+                    self.add_error(line, str(exc))
+                if len(batch) >= self.batch_size:
+                    staged += self.copy(cursor, batch)
+                    batch = []
+            if batch:
+                staged += self.copy(cursor, batch)
+
+            self.resolve_generated_slugs(cursor)
+            known, distinct = self.count_staged(cursor)
+            self.report_unknown_categories(cursor)
+            results = self.upsert(cursor)
+            # Inserts and category, is_active or price changes bypass Product.save()
+            if results:
+                refresh_category_stats()
+
+        updated_ids = [pk for pk, inserted in results if not inserted]
+        inserted = len(results) - len(updated_ids)
+
+        # One invalidation for the whole file
+        bump_generation("products_list")
+        invalidate_product_details(updated_ids)
+
+        seconds = time.perf_counter() - start
+        return {
+            "rows": self.rows_read,
+            "inserted": inserted,
+            "updated": len(updated_ids),
+            "unchanged": distinct - len(results),
+            "invalid": self.invalid,
+            "unknown_category": staged - known,
+            "duplicates": known - distinct,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(self.rows_read / seconds) if seconds else None,
+            "errors": self.errors,
+        }
+
+    def add_error(self, line, message):
+        self.invalid += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "error": message})
+
+    def clean(self, line, row):
+        """Validate a raw row and return the staging tuple."""
+        if isinstance(row, str):
+            raise ValueError(row)
+
+        # PostgreSQL text cannot hold NUL; COPY would fail the whole file on it
+        for field in ("title", "description", "category"):
+            if "\x00" in str(row.get(field) or ""):
+                raise ValueError(f"{field} contains a NUL character")
+
+        title = str(row.get("title") or "").strip()
+        if not title:
+            raise ValueError("title is required")
+        if len(title) > 255:
+            raise ValueError("title is longer than 255 characters")
+
+        try:
+            price = Decimal(str(row.get("price"))).quantize(Decimal("0.01"))
+        except (InvalidOperation, ValueError):
+            raise ValueError(f"Invalid price: {row.get('price')!r}")
+        if not price.is_finite() or not Decimal(0) <= price <= MAX_PRICE:
+            raise ValueError(f"Price out of range: {price}")
+
+        category = str(row.get("category") or "").strip()
+        if not category:
+            raise ValueError("category is required")
+
+        try:
+            stock = int(row.get("stock") or 0)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid stock: {row.get('stock')!r}")
+        if not 0 <= stock <= MAX_STOCK:
+            raise ValueError(f"Stock out of range: {stock}")
+
+        return (
+            line,
+            title,
+            *self.make_slug(row.get("slug"), title),
+            str(row.get("description") or ""),
+            price,
+            stock,
+            "t" if parse_bool(row.get("is_active")) else "f",
+            category,
+        )
+
+    def make_slug(self, slug, title):
+        """
+        (slug, base, n) for a row. Explicit slugs are kept and have no base.
+        Generated ones are `base` plus an -n suffix counting repeats within the
+        file; `resolve_generated_slugs` moves them past existing products.
+        """
+        if slug:
+            explicit = slugify(str(slug))[:255]
+            if explicit:
+                return explicit, None, None
+
+        base = slugify(title)[:240] or "product"
+        count = self.slug_counts[base] = self.slug_counts.get(base, 0) + 1
+        return (base if count == 1 else f"{base}-{count}"), base, count
+
+    def resolve_generated_slugs(self, cursor):
+        """
+        Renumber generated slugs that are taken by an existing product, an
+        explicit slug of the file or an earlier row's generated slug. A clashing
+        row's suffix grows by the number of rows sharing its base, so rows of
+        one base never clash with each other; repeat until nothing clashes.
+        """
+        product_table = Product._meta.db_table
+        # Temporary tables are never auto-analyzed; without statistics the self-join plans badly
+        cursor.execute(f"ANALYZE {STAGING_TABLE}")
+        while True:
+            cursor.execute(f"""
+                WITH sizes AS (
+                    SELECT base, count(*) AS size
+                    FROM {STAGING_TABLE}
+                    WHERE base IS NOT NULL
+                    GROUP BY base
+                ),
+                clashes AS (
+                    SELECT s.line
+                    FROM {STAGING_TABLE} s
+                    JOIN {product_table} p ON p.slug = s.slug
+                    WHERE s.base IS NOT NULL
+                    UNION
+                    SELECT s.line
+                    FROM {STAGING_TABLE} s
+                    JOIN {STAGING_TABLE} o ON o.slug = s.slug AND o.line <> s.line
+                    WHERE s.base IS NOT NULL
+                      AND (o.base IS NULL OR (o.base <> s.base AND o.line < s.line))
+                )
+                UPDATE {STAGING_TABLE} s
+                SET n = s.n + z.size, slug = s.base || '-' || (s.n + z.size)
+                FROM clashes c, sizes z
+                WHERE s.line = c.line AND z.base = s.base
+            """)
+            if not cursor.rowcount:
+                return
+
+    def copy(self, cursor, batch):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(batch)
+        buffer.seek(0)
+        cursor.copy_expert(
+            f"COPY {STAGING_TABLE} ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+        return len(batch)
+
+    def count_staged(self, cursor):
+        """Rows with a known category, and how many distinct slugs they carry."""
+        cursor.execute(f"""
+            SELECT count(*), count(DISTINCT s.slug)
+            FROM {STAGING_TABLE} s
+            JOIN {Category._meta.db_table} c ON c.slug = s.category_slug
+        """)
+        return cursor.fetchone()
+
+    def report_unknown_categories(self, cursor):
+        cursor.execute(f"""
+            SELECT s.line, s.category_slug
+            FROM {STAGING_TABLE} s
+            LEFT JOIN {Category._meta.db_table} c ON c.slug = s.category_slug
+            WHERE c.id IS NULL
+            ORDER BY s.line
+            LIMIT %s
+        """, [max(self.max_errors - len(self.errors), 0)])
+        for line, slug in cursor.fetchall():
+            self.errors.append({"line": line, "error": f"Unknown category: {slug}"})
+
+    def upsert(self, cursor):
+        """
+        Insert or update every staged row in one statement.
+        Rows identical to the stored product are skipped, so re-imports only
+        rewrite (and re-index) what changed. Returns (id, inserted) pairs for the
+        written rows; xmax = 0 marks freshly inserted ones.
+        """
+        product_table, category_table = Product._meta.db_table, Category._meta.db_table
+        # Model defaults are applied by Django, not the database; new products start unrated and unviewed
+        counter_columns = ["rating_avg", "rating_count", *(f"rating_{star}" for star in range(1, 6)), "view_count"]
+        cursor.execute(f"""
+            INSERT INTO {product_table}
+                (title, slug, description, price, category_id, stock, is_active, created_at, updated_at,
+                 {', '.join(counter_columns)})
+            SELECT DISTINCT ON (s.slug)
+                s.title, s.slug, COALESCE(s.description, ''), s.price, c.id, s.stock, s.is_active, now(), now(),
+                {', '.join('0' for _ in counter_columns)}
+            FROM {STAGING_TABLE} s
+            JOIN {category_table} c ON c.slug = s.category_slug
+            ORDER BY s.slug, s.line DESC
+            ON CONFLICT (slug) DO UPDATE SET
+                title = EXCLUDED.title,
+                description = EXCLUDED.description,
+                price = EXCLUDED.price,
+                category_id = EXCLUDED.category_id,
+                stock = EXCLUDED.stock,
+                is_active = EXCLUDED.is_active,
+                updated_at = EXCLUDED.updated_at
+            WHERE ({product_table}.title, {product_table}.description, {product_table}.price,
+                   {product_table}.category_id, {product_table}.stock, {product_table}.is_active)
+                IS DISTINCT FROM
+                  (EXCLUDED.title, EXCLUDED.description, EXCLUDED.price,
+                   EXCLUDED.category_id, EXCLUDED.stock, EXCLUDED.is_active)
+            RETURNING id, (xmax = 0)
+        """)
+        return cursor.fetchall()
@@ -0,0 +1,303 @@
+import random
+import statistics
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from django.test import RequestFactory
+from django.utils.http import urlencode
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+
+from categories.models import Category
+from products.filters import ProductSearchFilter
+from products.models import Product
+from products.pagination import ProductKeysetPagination
+from ecommerce.cache import bump_generation, cache_response, get_cached_response
+from products.serializers import ProductSerializer
+from products.views import ProductViewSet
+from products.suggest import SuggestIndex
+
+
+BENCH_PREFIX = "bench"
+
+ADJECTIVES = [
+    "wireless", "leather", "organic", "vintage", "portable", "stainless", "handmade",
+    "ergonomic", "waterproof", "compact", "smart", "classic", "deluxe", "bamboo",
+]
+NOUNS = [
+    "headphones", "wallet", "coffee", "jacket", "speaker", "bottle", "basket",
+    "keyboard", "backpack", "lamp", "watch", "blender", "notebook", "sandals",
+]
+SEARCH_TERMS = ["wireless", "leather wallet", "waterproof backpack", "bamboo"]
+
+
+class Command(BaseCommand):
+    """
+    Benchmark catalog read paths against a seeded Product table.
+
+    Usage:
+        python manage.py benchmark_catalog pagination --products 1000000
+        python manage.py benchmark_catalog search --products 10000,100000,1000000
+        python manage.py benchmark_catalog suggest --products 500000
+        python manage.py benchmark_catalog cache --products 100000
+        python manage.py benchmark_catalog stampede --products 100000 --clients 500
+
+    --products accepts a comma-separated list of catalog sizes; the scenario runs
+    once per size, growing the seeded catalog in between.
+
+    Seeded rows use the "bench-" slug prefix and can be removed with --cleanup.
+    Run against a disposable database: seeding a million rows takes a few minutes.
+    """
+    help = "Benchmark catalog read paths against a seeded Product table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("scenario", choices=["pagination", "search", "suggest", "cache", "stampede"])
+        parser.add_argument(
+            "--products", default="1000000",
+            help="Catalog size to seed, or a comma-separated list of sizes",
+        )
+        parser.add_argument("--categories", type=int, default=50)
+        parser.add_argument("--repeat", type=int, default=20, help="Timed runs per measurement")
+        parser.add_argument("--clients", type=int, default=500, help="Concurrent clients for stampede")
+        parser.add_argument("--cleanup", action="store_true", help="Delete seeded rows afterwards")
+
+    def handle(self, *args, **options):
+        self.repeat = options["repeat"]
+        self.factory = RequestFactory()
+        sizes = sorted(int(size) for size in options["products"].split(","))
+
+        try:
+            for size in sizes:
+                self.seed(size, options["categories"])
+                self.stdout.write(self.style.MIGRATE_HEADING(f"\n{options['scenario']} @ {size} products"))
+                getattr(self, f"bench_{options['scenario']}")(options)
+        finally:
+            if options["cleanup"]:
+                Product.objects.filter(slug__startswith=f"{BENCH_PREFIX}-").delete()
+                Category.objects.filter(slug__startswith=f"{BENCH_PREFIX}-").delete()
+
+    def seed(self, total, category_count, batch_size=5000):
+        """Bulk insert synthetic products until the catalog holds `total` bench rows."""
+        categories = [
+            Category.objects.get_or_create(
+                slug=f"{BENCH_PREFIX}-category-{i}",
+                defaults={"name": f"Bench Category {i}"},
+            )[0]
+            for i in range(category_count)
+        ]
+        existing = Product.objects.filter(slug__startswith=f"{BENCH_PREFIX}-").count()
+        if existing >= total:
+            return
+
+        self.stdout.write(f"Seeding {total - existing} products...")
+        rng = random.Random(42)
+        for start in range(existing, total, batch_size):
+            Product.objects.bulk_create([
+                Product(
+                    title=f"{rng.choice(ADJECTIVES).title()} {rng.choice(NOUNS).title()} {i}",
+                    slug=f"{BENCH_PREFIX}-{i}",
+                    description=" ".join(rng.choices(ADJECTIVES + NOUNS, k=30)),
+                    price=Decimal(rng.randint(100, 100_000)) / 100,
+                    category=categories[i % len(categories)],
+                    stock=rng.randint(0, 500),
+                )
+                for i in range(start, min(start + batch_size, total))
+            ])
+        self.stdout.write(self.style.SUCCESS(f"Catalog seeded with {total} bench products"))
+
+    def timed(self, func):
+        """Run `func` repeatedly and return (median, p99) in milliseconds."""
+        func()  # warm up connections and plan caches
+        samples = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) * 1000)
+        samples.sort()
+        return statistics.median(samples), samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+    def report(self, label, timings):
+        median, p99 = timings
+        self.stdout.write(f"  {label:<40} median {median:8.2f} ms   p99 {p99:8.2f} ms")
+
+    def bench_pagination(self, options):
+        queryset = Product.objects.filter(is_active=True).select_related("category")
+        page_size = ProductKeysetPagination().page_size
+
+        for ordering in ["price", "-created_at"]:
+            self.stdout.write(f"\nordering={ordering}")
+            ordered = queryset.order_by(ordering)
+
+            for page in [1, 5000]:
+                def offset_page(page=page):
+                    request = Request(self.factory.get("/api/products/", {"page": page, "ordering": ordering}))
+                    results = PageNumberPagination().paginate_queryset(ordered, request)
+                    return ProductSerializer(results, many=True).data
+
+                params = {"pagination": "cursor", "ordering": ordering}
+                if page > 1:
+                    # Locate the row that ends page N-1 once; the timed runs only seek.
+                    boundary_paginator = ProductKeysetPagination()
+                    boundary_paginator.ordering = ordering
+                    tie = "-id" if ordering.startswith("-") else "id"
+                    boundary = queryset.order_by(ordering, tie)[(page - 1) * page_size - 1]
+                    params["cursor"] = boundary_paginator.cursor_for(boundary)
+
+                def keyset_page(params=params):
+                    request = Request(self.factory.get("/api/products/", params))
+                    results = ProductKeysetPagination().paginate_queryset(ordered, request)
+                    return ProductSerializer(results, many=True).data
+
+                self.report(f"page {page:>5} offset (PageNumberPagination)", self.timed(offset_page))
+                self.report(f"page {page:>5} keyset (?pagination=cursor)", self.timed(keyset_page))
+
+    def bench_search(self, options):
+        queryset = Product.objects.filter(is_active=True).select_related("category").defer("search_vector")
+
+        for term in SEARCH_TERMS:
+            self.stdout.write(f"\nsearch={term!r}")
+
+            def ilike_search(term=term):
+                # What rest_framework.filters.SearchFilter generates for search_fields = [title, description]
+                matches = queryset
+                for word in term.split():
+                    matches = matches.filter(Q(title__icontains=word) | Q(description__icontains=word))
+                return list(matches[:10])
+
+            def fulltext_search(term=term, ordering=None):
+                request = Request(self.factory.get("/api/products/", {"search": term}))
+                matches = ProductSearchFilter().filter_queryset(request, queryset, view=None)
+                if ordering:
+                    matches = matches.order_by(ordering)
+                return list(matches[:10])
+
+            self.report("ILIKE (SearchFilter)", self.timed(ilike_search))
+            self.report("full-text", self.timed(fulltext_search))
+            self.report("full-text, ?ordering=relevance", self.timed(lambda: fulltext_search(ordering="-relevance")))
+
+    def bench_suggest(self, options):
+        index = SuggestIndex()
+        start = time.perf_counter()
+        index.build()
+        self.stdout.write(f"  index built in {time.perf_counter() - start:.2f} s")
+
+        rng = random.Random(7)
+        words = [word for word in ADJECTIVES + NOUNS if len(word) > 4]
+        queries = []
+        for _ in range(1000):
+            first, second = rng.choice(words), rng.choice(words)
+            queries.append(first[:rng.randint(1, len(first))])  # typing a single word
+            queries.append(f"{first} {second[:3]}")  # second word in progress
+            position = rng.randrange(1, len(first))
+            queries.append(first[:position] + first[position + 1:])  # one dropped letter
+
+        samples = []
+        for query in queries:
+            start = time.perf_counter()
+            index.suggest(query)
+            samples.append((time.perf_counter() - start) * 1000)
+        samples.sort()
+        self.stdout.write(
+            f"  {len(samples)} queries: median {statistics.median(samples):.3f} ms   "
+            f"p99 {samples[int(len(samples) * 0.99)]:.3f} ms   max {samples[-1]:.3f} ms"
+        )
+
+    def bench_cache(self, options):
+        try:
+            from django_redis import get_redis_connection
+            redis = get_redis_connection("default")
+        except (ImportError, NotImplementedError):
+            raise CommandError("The cache scenario needs the django_redis cache backend")
+
+        view = ProductViewSet.as_view({"get": "list"})
+        request = self.factory.get("/api/products/", {"ordering": "price"}, HTTP_ACCEPT="application/json")
+        response = view(request)
+        response.render()
+
+        legacy_key, bytes_key = "bench_cache_legacy", "bench_cache_bytes"
+        # Before: the DRF Response object itself was pickled into Redis.
+        cache.set(legacy_key, response, timeout=300)
+        cache_response(bytes_key, response, timeout=300)
+
+        for label, key in [("pickled Response", legacy_key), ("rendered bytes", bytes_key)]:
+            size = redis.memory_usage(cache.make_key(key))
+            self.stdout.write(f"  {label:<40} {size:>8} bytes in Redis")
+
+        self.report("hit: unpickle Response", self.timed(lambda: cache.get(legacy_key)))
+        self.report("hit: rendered bytes -> HttpResponse", self.timed(lambda: get_cached_response(bytes_key)))
+        self.report("hit: full view dispatch", self.timed(lambda: view(request)))
+        cache.delete_many([legacy_key, bytes_key])
+
+    def bench_stampede(self, options):
+        """
+        Invalidate the product list cache while --clients threads request it at once,
+        then count the SQL statements each cache key cost. A single rebuild of a
+        page-number list is three statements: MAX(updated_at) for Last-Modified,
+        COUNT(*) and the page itself.
+        """
+        view = ProductViewSet.as_view({"get": "list"})
+        variants = [
+            {"ordering": "price"},
+            {"ordering": "-price"},
+            {"category__slug": f"{BENCH_PREFIX}-category-0"},
+            {"search": "wireless"},
+            {"page": 2},
+        ]
+        flushes = [
+            ("generation bump, stale copies kept", lambda: bump_generation("products_list")),
+            ("cold keys, entries deleted", lambda: cache.delete_many(
+                [f"products_list:{urlencode(params)}" for params in variants]
+            )),
+        ]
+
+        for label, flush in flushes:
+            for params in variants:
+                view(self.factory.get("/api/products/", params, HTTP_ACCEPT="application/json"))
+            flush()
+
+            clients = options["clients"]
+            barrier = threading.Barrier(clients)
+            lock = threading.Lock()
+            queries, requests = Counter(), Counter()
+
+            def client(params):
+                name = urlencode(params)
+
+                def count_queries(execute, sql, sql_params, many, context):
+                    with lock:
+                        queries[name] += 1
+                    return execute(sql, sql_params, many, context)
+
+                request = self.factory.get("/api/products/", params, HTTP_ACCEPT="application/json")
+                barrier.wait()
+                try:
+                    with connection.execute_wrapper(count_queries):
+                        view(request)
+                    with lock:
+                        requests[name] += 1
+                finally:
+                    connection.close()
+
+            threads = [
+                threading.Thread(target=client, args=(variants[i % len(variants)],))
+                for i in range(clients)
+            ]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+
+            self.stdout.write(f"\n{label}: {clients} clients in {elapsed:.2f} s")
+            for params in variants:
+                name = urlencode(params)
+                self.stdout.write(
+                    f"  {name:<40} {requests[name]:>4} requests   {queries[name]:>3} SQL statements"
+                )
@@ -0,0 +1,39 @@
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.db import NotSupportedError
+
+from products.recommendations import build_neighbors, run_exclusively, update_neighbors
+
+
+class Command(BaseCommand):
+    """
+    Build "frequently bought together" neighbours without a Celery worker.
+
+    Usage:
+        python manage.py build_related_products
+        python manage.py build_related_products --incremental
+
+    Needs NumPy and SciPy (pip install numpy scipy).
+    """
+    help = "Build related products from paid order co-occurrence"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--incremental", action="store_true",
+            help="Only fold in orders paid since the last run",
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            count = run_exclusively(update_neighbors if options["incremental"] else build_neighbors)
+        except (ImproperlyConfigured, NotSupportedError) as exc:
+            raise CommandError(str(exc))
+
+        if count is None:
+            raise CommandError("Another related products build is running")
+        self.stdout.write(self.style.SUCCESS(
+            f"Related products written for {count} products in {time.perf_counter() - start:.1f} s"
+        ))
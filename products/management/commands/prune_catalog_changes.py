@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from products.models import CatalogChange
+
+
+class Command(BaseCommand):
+    """
+    Delete catalog change log entries older than the retention window.
+
+    Usage (e.g. from a daily cron):
+        python manage.py prune_catalog_changes
+        python manage.py prune_catalog_changes --days 7
+
+    Clients whose position is pruned get a 410 from /api/products/changes/ and
+    re-export the catalog. The newest entry is always kept, so an up-to-date
+    client never loses its position.
+    """
+    help = "Delete catalog change log entries older than CATALOG_CHANGES_RETENTION_DAYS"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.CATALOG_CHANGES_RETENTION_DAYS)
+
+    def handle(self, *args, **options):
+        # Last entry in feed order: (txid, seq)
+        newest = CatalogChange.objects.order_by("-txid", "-seq").values_list("seq", flat=True).first()
+        if newest is None:
+            self.stdout.write("Change log is empty")
+            return
+
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        deleted, _ = CatalogChange.objects.filter(changed_at__lt=cutoff).exclude(seq=newest).delete()
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} catalog changes older than {cutoff:%Y-%m-%d %H:%M}"))
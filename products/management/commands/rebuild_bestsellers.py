@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import NotSupportedError
+
+from products.bestsellers import SETTLE_SECONDS, rebuild
+
+
+class Command(BaseCommand):
+    """
+    Backfill the bestseller leaderboards in Redis from paid order history.
+
+    Usage:
+        python manage.py rebuild_bestsellers
+        python manage.py rebuild_bestsellers --settle-seconds 0   # no payments in flight
+    """
+    help = "Rebuild the Redis bestseller leaderboards from paid orders"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--settle-seconds", type=int, default=SETTLE_SECONDS,
+            help=f"Wait for in-flight payments to commit before reading orders (default {SETTLE_SECONDS})",
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            written = rebuild(settle_seconds=options["settle_seconds"])
+        except NotSupportedError as exc:
+            raise CommandError(str(exc))
+
+        if written is None:
+            raise CommandError("Another bestseller rebuild is running")
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {written} bestseller leaderboards in {time.perf_counter() - start:.1f} s"
+        ))
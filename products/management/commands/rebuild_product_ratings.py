@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from products.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    """
+    Recompute Product.rating_avg, rating_count and rating_1..rating_5 from reviews.
+
+    Reviews keep these aggregates up to date incrementally; run this after bulk
+    review imports, raw SQL fixes or to verify drift:
+        python manage.py rebuild_product_ratings
+    """
+    help = "Rebuild denormalized product rating aggregates from reviews"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        changed = rebuild_ratings(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rating aggregates: {changed} products changed"))
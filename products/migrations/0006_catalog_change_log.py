@@ -0,0 +1,80 @@
+# Generated by Django 5.2.8 on 2026-10-17 05:00
+
+from django.db import migrations, models
+
+
+# Statement-level triggers with transition tables: one INSERT ... SELECT per
+# statement however many rows it touched, so bulk imports stay set-based.
+# Updates that leave the row identical are not logged.
+CREATE_FUNCTION = """
+CREATE OR REPLACE FUNCTION products_catalog_change_log() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO products_catalogchange (txid, entity, object_id, op, changed_at)
+        SELECT pg_current_xact_id()::text::bigint, TG_ARGV[0], n.id, 'upsert', now()
+        FROM new_rows n ORDER BY n.id;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO products_catalogchange (txid, entity, object_id, op, changed_at)
+        SELECT pg_current_xact_id()::text::bigint, TG_ARGV[0], n.id, 'upsert', now()
+        FROM new_rows n JOIN old_rows o ON o.id = n.id
+        WHERE n IS DISTINCT FROM o
+        ORDER BY n.id;
+    ELSE
+        INSERT INTO products_catalogchange (txid, entity, object_id, op, changed_at)
+        SELECT pg_current_xact_id()::text::bigint, TG_ARGV[0], o.id, 'delete', now()
+        FROM old_rows o ORDER BY o.id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+TRANSITION_TABLES = {
+    "INSERT": "NEW TABLE AS new_rows",
+    "UPDATE": "OLD TABLE AS old_rows NEW TABLE AS new_rows",
+    "DELETE": "OLD TABLE AS old_rows",
+}
+TABLES = {"products_product": "product", "categories_category": "category"}
+
+CREATE_TRIGGERS = CREATE_FUNCTION + "".join(
+    f"""
+CREATE TRIGGER {table}_change_{event.lower()}
+AFTER {event} ON {table}
+REFERENCING {transition}
+FOR EACH STATEMENT EXECUTE FUNCTION products_catalog_change_log('{entity}');
+"""
+    for table, entity in TABLES.items()
+    for event, transition in TRANSITION_TABLES.items()
+)
+
+DROP_TRIGGERS = "".join(
+    f"DROP TRIGGER IF EXISTS {table}_change_{event.lower()} ON {table};\n"
+    for table in TABLES
+    for event in TRANSITION_TABLES
+) + "DROP FUNCTION IF EXISTS products_catalog_change_log();\n"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0001_initial'),
+        ('products', '0005_product_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChange',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('txid', models.BigIntegerField()),
+                ('entity', models.CharField(choices=[('product', 'Product'), ('category', 'Category')], max_length=16)),
+                ('object_id', models.BigIntegerField()),
+                ('op', models.CharField(choices=[('upsert', 'Upsert'), ('delete', 'Delete')], max_length=8)),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['txid', 'seq'], name='catalog_change_txid_seq_idx'), models.Index(fields=['changed_at'], name='catalog_change_changed_idx')],
+            },
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS, reverse_sql=DROP_TRIGGERS),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.8 on 2026-10-17 05:38
+
+from django.db import migrations, models
+
+
+# View counter flushes only move view_count; keep them out of the catalog change feed
+LOG_UPDATE = """
+        INSERT INTO products_catalogchange (txid, entity, object_id, op, changed_at)
+        SELECT pg_current_xact_id()::text::bigint, TG_ARGV[0], n.id, 'upsert', now()
+        FROM new_rows n JOIN old_rows o ON o.id = n.id
+        WHERE {condition}
+        ORDER BY n.id;
+"""
+
+CHANGE_LOG_FUNCTION = """
+CREATE OR REPLACE FUNCTION products_catalog_change_log() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO products_catalogchange (txid, entity, object_id, op, changed_at)
+        SELECT pg_current_xact_id()::text::bigint, TG_ARGV[0], n.id, 'upsert', now()
+        FROM new_rows n ORDER BY n.id;
+    ELSIF TG_OP = 'UPDATE' THEN{log_update}    ELSE
+        INSERT INTO products_catalogchange (txid, entity, object_id, op, changed_at)
+        SELECT pg_current_xact_id()::text::bigint, TG_ARGV[0], o.id, 'delete', now()
+        FROM old_rows o ORDER BY o.id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+IGNORE_VIEW_COUNT = CHANGE_LOG_FUNCTION.format(log_update=LOG_UPDATE.format(
+    condition="n IS DISTINCT FROM o\n          AND (to_jsonb(n) - 'view_count') IS DISTINCT FROM (to_jsonb(o) - 'view_count')"
+))
+LOG_ALL_UPDATES = CHANGE_LOG_FUNCTION.format(log_update=LOG_UPDATE.format(condition="n IS DISTINCT FROM o"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0001_initial'),
+        ('products', '0007_product_neighbors'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='view_count',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['view_count', 'id'], name='product_active_views_id_idx'),
+        ),
+        migrations.RunSQL(IGNORE_VIEW_COUNT, reverse_sql=LOG_ALL_UPDATES),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.8 on 2026-10-17 06:40
+
+from django.db import migrations
+
+
+# Columns written by bulk maintenance rather than catalog edits: product view
+# counts, and category paths and subtree stats (Category.maintained_fields).
+# None of them is part of the change feed payload, so updates that only move
+# them are not logged.
+LOG_UPDATE = """
+        INSERT INTO products_catalogchange (txid, entity, object_id, op, changed_at)
+        SELECT pg_current_xact_id()::text::bigint, TG_ARGV[0], n.id, 'upsert', now()
+        FROM new_rows n JOIN old_rows o ON o.id = n.id
+        WHERE n IS DISTINCT FROM o
+          AND (to_jsonb(n) - {ignored}::text[]) IS DISTINCT FROM (to_jsonb(o) - {ignored}::text[])
+        ORDER BY n.id;
+"""
+
+CHANGE_LOG_FUNCTION = """
+CREATE OR REPLACE FUNCTION products_catalog_change_log() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO products_catalogchange (txid, entity, object_id, op, changed_at)
+        SELECT pg_current_xact_id()::text::bigint, TG_ARGV[0], n.id, 'upsert', now()
+        FROM new_rows n ORDER BY n.id;
+    ELSIF TG_OP = 'UPDATE' THEN{log_update}    ELSE
+        INSERT INTO products_catalogchange (txid, entity, object_id, op, changed_at)
+        SELECT pg_current_xact_id()::text::bigint, TG_ARGV[0], o.id, 'delete', now()
+        FROM old_rows o ORDER BY o.id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+
+def ignoring(*columns):
+    array = "ARRAY[{}]".format(", ".join(f"'{column}'" for column in columns))
+    return CHANGE_LOG_FUNCTION.format(log_update=LOG_UPDATE.format(ignored=array))
+
+
+IGNORE_MAINTAINED_FIELDS = ignoring(
+    "view_count",
+    "path", "depth", "product_count", "min_price", "max_price", "products_updated_at",
+)
+IGNORE_VIEW_COUNT = ignoring("view_count")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0003_category_product_stats'),
+        ('products', '0008_product_view_count'),
+    ]
+
+    operations = [
+        migrations.RunSQL(IGNORE_MAINTAINED_FIELDS, reverse_sql=IGNORE_VIEW_COUNT),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-17 08:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_change_log_ignore_maintained_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ViewCountFlush',
+            fields=[
+                ('flush_id', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('flushed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
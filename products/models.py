@@ -1,6 +1,11 @@
-from django.db import models
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
 from django.utils.text import slugify
 
+from categories.tree import apply_product_change
+
 
 class Product(models.Model):
     title = models.CharField(max_length=255, db_index=True)
@@ -17,17 +22,175 @@ class Product(models.Model):
     is_active = models.BooleanField(default=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Review aggregates, kept in step by Review.save() and the review post_delete signal
+    rating_avg = models.DecimalField(max_digits=3, decimal_places=2, default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+    # Detail page views, buffered in Redis and added in batches (see products/popularity.py)
+    view_count = models.PositiveBigIntegerField(default=0)
+    # Maintained by a database trigger from title (weight A) and description (weight B)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # Written by F() updates and batched flushes, never by a full-row save of a stale instance
+    maintained_fields = (
+        "rating_avg", "rating_count", "rating_1", "rating_2", "rating_3", "rating_4", "rating_5", "view_count",
+    )
 
     class Meta:
         ordering = ["-created_at"]
         indexes = [
             models.Index(fields=["category", "is_active"], name="product_category_active_idx"),
+            # Keyset pagination: (ordering column, id) over active products only
+            models.Index(
+                fields=["price", "id"],
+                name="product_active_price_id_idx",
+                condition=models.Q(is_active=True),
+            ),
+            models.Index(
+                fields=["created_at", "id"],
+                name="product_active_created_id_idx",
+                condition=models.Q(is_active=True),
+            ),
+            models.Index(
+                fields=["rating_avg", "id"],
+                name="product_active_rating_id_idx",
+                condition=models.Q(is_active=True),
+            ),
+            models.Index(
+                fields=["view_count", "id"],
+                name="product_active_views_id_idx",
+                condition=models.Q(is_active=True),
+            ),
+            # Catalog export streams in (updated_at, id) order; ?updated_since= seeks into it
+            models.Index(fields=["updated_at", "id"], name="product_updated_id_idx"),
+            GinIndex(fields=["search_vector"], name="product_search_vector_idx"),
         ]
 
     def save(self, *args, **kwargs):
+        """
+        Save the product and update the subtree product stats of its categories
+        once it commits. Saves that cannot change the category,
+        is_active or price (update_fields=["stock"]) skip this entirely.
+        Deletes are handled by the post_delete signal so cascades are covered too.
+
+        Updates never write `maintained_fields`, so a review or view count
+        flush committed after this instance was loaded is not overwritten,
+        and always write updated_at, e.g. with update_fields=["stock"].
+        """
         if not self.slug:
             self.slug = slugify(self.title)
-        super().save(*args, **kwargs)
+
+        if self.pk and not self._state.adding:
+            if kwargs.get("update_fields") is None:
+                kwargs["update_fields"] = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name not in self.maintained_fields
+                ]
+            else:
+                kwargs["update_fields"] = [
+                    name for name in kwargs["update_fields"] if name not in self.maintained_fields
+                ]
+                # updated_at versions the detail ETag, so every write that lands moves it
+                if kwargs["update_fields"] and "updated_at" not in kwargs["update_fields"]:
+                    kwargs["update_fields"].append("updated_at")
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and not {"category", "category_id", "is_active", "price"} & set(update_fields):
+            super().save(*args, **kwargs)
+            return
+
+        with transaction.atomic():
+            previous = None
+            if self.pk and not self._state.adding:
+                previous = (
+                    Product.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values_list("category_id", "is_active", "price", "updated_at")
+                    .first()
+                )
+            super().save(*args, **kwargs)
+
+            removed = (previous[0], previous[2]) if previous and previous[1] else None
+            added = (self.category_id, self.price) if self.is_active else None
+            if removed != added:
+                apply_product_change(
+                    added=added,
+                    removed=removed,
+                    updated_at=self.updated_at,
+                    removed_updated_at=previous[3] if previous else None,
+                )
 
     def __str__(self):
         return self.title
+
+
+class ProductNeighbors(models.Model):
+    """
+    "Frequently bought together" neighbours of a product, best first.
+
+    Built from paid order co-occurrence by products.recommendations: one row
+    per ordered product, so /api/products/<id>/related/ is a primary key lookup.
+    `co_counts` and `order_count` keep the raw counts incremental updates add to.
+    """
+    product = models.OneToOneField(
+        Product,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name="neighbors",
+    )
+    order_count = models.PositiveIntegerField(default=0)
+    neighbor_ids = ArrayField(models.BigIntegerField(), default=list)
+    co_counts = ArrayField(models.PositiveIntegerField(), default=list)
+    scores = ArrayField(models.FloatField(), default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Neighbors of product {self.product_id}"
+
+
+class ViewCountFlush(models.Model):
+    """
+    Batches of buffered page views already added to Product.view_count.
+
+    products.popularity inserts the batch's id in the transaction of its
+    UPDATE, so a batch whose Redis hash outlived the commit is not added twice.
+    """
+    flush_id = models.CharField(max_length=32, primary_key=True)
+    flushed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"View count flush {self.flush_id}"
+
+
+class CatalogChange(models.Model):
+    """
+    Append-only log of product and category writes behind /api/products/changes/.
+
+    Rows are written by database triggers (migration 0006), so bulk imports,
+    QuerySet.update() and raw SQL are logged as well as model saves. `txid` is
+    the writing transaction; the feed is read in (txid, seq) order and only
+    from finished transactions, so a change is never delivered behind one the
+    client has already passed.
+    """
+    ENTITY_CHOICES = [("product", "Product"), ("category", "Category")]
+    OP_CHOICES = [("upsert", "Upsert"), ("delete", "Delete")]
+
+    seq = models.BigAutoField(primary_key=True)
+    txid = models.BigIntegerField()
+    entity = models.CharField(max_length=16, choices=ENTITY_CHOICES)
+    object_id = models.BigIntegerField()
+    op = models.CharField(max_length=8, choices=OP_CHOICES)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["txid", "seq"], name="catalog_change_txid_seq_idx"),
+            models.Index(fields=["changed_at"], name="catalog_change_changed_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.seq}: {self.op} {self.entity} {self.object_id}"
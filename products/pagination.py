@@ -0,0 +1,130 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+class ProductKeysetPagination(CursorPagination):
+    """
+    Keyset (seek) pagination for the product catalog.
+
+    Unlike PageNumberPagination this never runs COUNT(*) and never uses OFFSET:
+    each page continues from the (ordering value, id) pair of the last row seen,
+    so page 5,000 costs the same as page 1. The `id` column breaks ties between
+    rows sharing the same price or creation date.
+
+    Every ordering listed in `keyset_fields` must be backed by a matching
+    composite index on Product (see Product.Meta.indexes).
+    """
+    keyset_fields = ["price", "created_at", "rating_avg", "view_count"]
+    tie_breaker = "id"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.model = queryset.model
+        self.ordering = self.get_keyset_ordering(queryset)
+        field, descending = self.ordering.lstrip("-"), self.ordering.startswith("-")
+
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor["reverse"]
+
+        # Walking backwards is the same seek with the direction flipped.
+        seek_descending = descending != reverse
+        tie = f"-{self.tie_breaker}" if seek_descending else self.tie_breaker
+        queryset = queryset.order_by(f"-{field}" if seek_descending else field, tie)
+
+        if cursor is not None:
+            value, pk = cursor["value"], cursor["id"]
+            if seek_descending:
+                queryset = queryset.filter(**{f"{field}__lte": value}).exclude(
+                    **{field: value, f"{self.tie_breaker}__gte": pk}
+                )
+            else:
+                queryset = queryset.filter(**{f"{field}__gte": value}).exclude(
+                    **{field: value, f"{self.tie_breaker}__lte": pk}
+                )
+
+        results = list(queryset[:self.page_size + 1])
+        has_following = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_following
+        else:
+            self.has_next, self.has_previous = has_following, cursor is not None
+
+        return self.page
+
+    def get_keyset_ordering(self, queryset):
+        """
+        Resolve the single ordering column the seek runs on.
+        OrderingFilter has already applied `?ordering=`; otherwise the model default applies.
+        """
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        ordering = [o for o in ordering if o.lstrip("-") != self.tie_breaker]
+        if len(ordering) != 1 or ordering[0].lstrip("-") not in self.keyset_fields:
+            raise ValidationError({
+                "ordering": (
+                    "Cursor pagination supports ordering by a single field: "
+                    f"{', '.join(self.keyset_fields)}"
+                )
+            })
+        return ordering[0]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            tokens = json.loads(urlsafe_b64decode(encoded.encode("ascii")))
+            field = self.model._meta.get_field(self.ordering.lstrip("-"))
+            cursor = {
+                "value": field.to_python(tokens["v"]),
+                "id": int(tokens["id"]),
+                "reverse": bool(tokens.get("r")),
+            }
+        except (TypeError, ValueError, KeyError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        # A cursor only makes sense for the ordering it was issued under.
+        if tokens.get("o") != self.ordering:
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def cursor_for(self, instance, reverse=False):
+        """Return the opaque cursor token pointing just past `instance`."""
+        field = self.ordering.lstrip("-")
+        tokens = {
+            "o": self.ordering,
+            "v": str(getattr(instance, field)),
+            "id": getattr(instance, self.tie_breaker),
+        }
+        if reverse:
+            tokens["r"] = 1
+        return urlsafe_b64encode(json.dumps(tokens, separators=(",", ":")).encode("ascii")).decode("ascii")
+
+    def encode_cursor(self, instance, reverse=False):
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, self.cursor_for(instance, reverse=reverse)
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
@@ -0,0 +1,114 @@
+"""
+Buffered product view counters behind ?ordering=popularity.
+
+A product page view is one HINCRBY on a Redis hash instead of an UPDATE of
+products_product. `flush_view_counts`, run by Celery beat every
+PRODUCT_VIEWS_FLUSH_SECONDS, renames the hash away (new views start a fresh
+one) and adds its counts to Product.view_count with a single UPDATE.
+
+A renamed batch gets an id, recorded in a ViewCountFlush row by the UPDATE's
+transaction. If the process dies after that commits but before the batch is
+deleted from Redis, the next flush finds the id and only deletes the batch.
+
+Views are counted under the id or slug they were requested by; slugs are
+resolved to ids when the batch is flushed, not on the request path.
+"""
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import NotSupportedError, connection, transaction
+
+from ecommerce.cache import redis_connection
+from .models import Product, ViewCountFlush
+
+
+logger = logging.getLogger(__name__)
+
+VIEWS_KEY = "product_views"
+# A batch whose UPDATE failed stays here and is retried by the next flush
+FLUSHING_KEY = "product_views:flushing"
+LOCK_KEY = "lock:product_views_flush"
+# Field of the pending batch holding its id; lookups are ids or slugs, which never contain ":"
+FLUSH_ID_FIELD = "flush:id"
+# Applied batch ids are kept this long; a stranded batch is retried well within it
+FLUSH_ID_RETENTION = "1 day"
+
+
+def record_view(lookup):
+    """Count one view of the product requested as `lookup` (id or slug)."""
+    try:
+        redis_connection().hincrby(cache.make_key(VIEWS_KEY), lookup, 1)
+    except Exception:
+        # Popularity is best effort; never fail a product page over it
+        logger.warning("Could not record a view of product %s", lookup, exc_info=True)
+
+
+def _batch(redis):
+    """
+    (flush id, {product id: views}) of the pending batch, taking the live
+    counters if there is none. Returns (None, {}) when nothing is buffered.
+    """
+    pending = cache.make_key(FLUSHING_KEY)
+    if not redis.exists(pending):
+        # Swap the live hash out; views arriving from now on start a new one
+        if not redis.exists(cache.make_key(VIEWS_KEY)):
+            return None, {}
+        redis.rename(cache.make_key(VIEWS_KEY), pending)
+    # Kept if the batch already has one: a retried batch must keep its id
+    redis.hsetnx(pending, FLUSH_ID_FIELD, uuid.uuid4().hex)
+
+    fields = redis.hgetall(pending)
+    flush_id = fields.pop(FLUSH_ID_FIELD.encode()).decode()
+    counts, by_slug = {}, {}
+    for field, views in fields.items():
+        lookup = field.decode()
+        if lookup.isdigit():
+            counts[int(lookup)] = counts.get(int(lookup), 0) + int(views)
+        else:
+            by_slug[lookup] = int(views)
+
+    for slug, pk in Product.objects.filter(slug__in=by_slug).values_list("slug", "id"):
+        counts[pk] = counts.get(pk, 0) + by_slug[slug]
+    return flush_id, counts
+
+
+def flush_view_counts():
+    """
+    Add buffered views to Product.view_count in one statement. Returns the
+    number of products updated, or None if another flush is running.
+    """
+    if connection.vendor != "postgresql":
+        raise NotSupportedError("Flushing product view counts requires PostgreSQL")
+    if not cache.add(LOCK_KEY, 1, timeout=settings.PRODUCT_VIEWS_FLUSH_SECONDS):
+        return None
+
+    try:
+        redis = redis_connection()
+        flush_id, counts = _batch(redis)
+        updated = 0
+        if counts:
+            # No updated_at bump and no cache invalidation: a view is not a catalog change
+            with transaction.atomic(), connection.cursor() as cursor:
+                table = ViewCountFlush._meta.db_table
+                cursor.execute(
+                    f"DELETE FROM {table} WHERE flushed_at < now() - interval '{FLUSH_ID_RETENTION}'"
+                )
+                cursor.execute(
+                    f"INSERT INTO {table} (flush_id, flushed_at) VALUES (%s, now()) ON CONFLICT DO NOTHING",
+                    [flush_id],
+                )
+                # Already applied by a flush that died before deleting the batch
+                if cursor.rowcount:
+                    cursor.execute(f"""
+                        UPDATE {Product._meta.db_table} p
+                        SET view_count = p.view_count + b.views
+                        FROM unnest(%s::bigint[], %s::bigint[]) AS b (id, views)
+                        WHERE p.id = b.id
+                    """, [list(counts), list(counts.values())])
+                    updated = cursor.rowcount
+        redis.delete(cache.make_key(FLUSHING_KEY))
+        return updated
+    finally:
+        cache.delete(LOCK_KEY)
@@ -0,0 +1,107 @@
+"""
+Denormalized review aggregates on Product.
+
+`rating_count`, `rating_1` ... `rating_5` and `rating_avg` are adjusted by a
+single UPDATE per review write, computed from the stored column values, so
+concurrent reviews never lose increments and product cards never aggregate
+over reviews at read time. `rebuild_ratings` recomputes them from scratch.
+Both move updated_at, which the product detail ETag is built from.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Value
+from django.db.models.functions import Cast, Coalesce, Now, NullIf
+from django.utils import timezone
+
+from ecommerce.cache import bump_generation
+from .cache import invalidate_product_details
+from .models import Product
+
+
+STARS = range(1, 6)
+AVG_PRECISION = Decimal("0.01")
+
+
+def _average(rating_sum, rating_count):
+    """SQL expression for rating_sum / rating_count, or 0 without reviews."""
+    return Coalesce(
+        ExpressionWrapper(
+            Cast(rating_sum, DecimalField(max_digits=14, decimal_places=4)) / NullIf(rating_count, 0),
+            output_field=DecimalField(max_digits=14, decimal_places=4),
+        ),
+        Value(Decimal("0")),
+        output_field=DecimalField(max_digits=3, decimal_places=2),
+    )
+
+
+def apply_rating_change(product_id, added=None, removed=None):
+    """
+    Add and/or remove one review rating on a product's aggregates.
+    Call inside the transaction that writes the review.
+    """
+    delta = {star: 0 for star in STARS}
+    if added:
+        delta[added] += 1
+    if removed:
+        delta[removed] -= 1
+    count_change = sum(delta.values())
+
+    # SET expressions see the old row, so the new sum/count are old values plus the change
+    rating_sum = sum((star * F(f"rating_{star}") for star in STARS), Value(0)) + sum(
+        star * change for star, change in delta.items()
+    )
+    rating_count = F("rating_count") + count_change
+
+    updates = {f"rating_{star}": F(f"rating_{star}") + change for star, change in delta.items() if change}
+    updates["rating_count"] = rating_count
+    updates["rating_avg"] = _average(rating_sum, rating_count)
+    updates["updated_at"] = Now()
+    Product.objects.filter(pk=product_id).update(**updates)
+
+    transaction.on_commit(lambda: _invalidate([product_id]))
+
+
+def _invalidate(product_ids):
+    bump_generation("products_list")
+    invalidate_product_details(product_ids)
+
+
+def rebuild_ratings(batch_size=1000):
+    """
+    Recompute every product's rating aggregates from reviews in bulk.
+    Only rows whose stored values differ are written; returns how many.
+    """
+    from reviews.models import Review
+
+    fields = ["rating_count", "rating_avg", *(f"rating_{star}" for star in STARS)]
+    aggregates = {
+        row["product_id"]: row
+        for row in Review.objects.order_by().values("product_id").annotate(
+            rating_count=Count("id"),
+            **{f"rating_{star}": Count("id", filter=Q(rating=star)) for star in STARS},
+        )
+    }
+
+    changed, now = [], timezone.now()
+    for product in Product.objects.only(*fields).iterator(chunk_size=batch_size):
+        row = aggregates.get(product.pk)
+        count = row["rating_count"] if row else 0
+        values = {
+            "rating_count": count,
+            **{f"rating_{star}": row[f"rating_{star}"] if row else 0 for star in STARS},
+        }
+        total = sum(star * values[f"rating_{star}"] for star in STARS)
+        values["rating_avg"] = (Decimal(total) / count).quantize(AVG_PRECISION) if count else Decimal("0.00")
+
+        if any(getattr(product, field) != value for field, value in values.items()):
+            for field, value in values.items():
+                setattr(product, field, value)
+            product.updated_at = now
+            changed.append(product)
+
+    with transaction.atomic():
+        Product.objects.bulk_update(changed, [*fields, "updated_at"], batch_size=batch_size)
+    if changed:
+        _invalidate([product.pk for product in changed])
+    return len(changed)
@@ -0,0 +1,273 @@
+"""
+"Frequently bought together" recommendations from order co-occurrence.
+
+A full build reads every (order, product) pair of paid orders with one COPY,
+builds the sparse order x product incidence matrix A with SciPy and takes
+C = A.T @ A: C[i, j] is the number of orders containing both products and the
+diagonal is each product's order count. Neighbours are ranked by cosine
+similarity, C[i, j] / sqrt(C[i, i] * C[j, j]), so best-sellers that land in
+every basket do not crowd out real pairings. The top RELATED_PRODUCTS_TOP_K
+per product are written to ProductNeighbors in one COPY.
+
+Incremental updates add the co-occurrence of orders paid since the last run
+to the stored counts of the products in them. Pairs outside a product's
+stored top-K are not kept, so a scheduled full build corrects the drift.
+
+NumPy and SciPy are only imported here, so web processes do not need them.
+"""
+import io
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import NotSupportedError, connection, transaction
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+from .models import Product, ProductNeighbors
+
+
+PAID_STATUSES = ("confirmed", "processing", "shipped", "delivered")
+WATERMARK_KEY = "related_products:watermark"
+LOCK_KEY = "lock:related_products"
+# Orders confirmed this recently may still be committing; pick them up next run
+SETTLE_SECONDS = 60
+
+
+def _numeric():
+    try:
+        import numpy as np
+        from scipy import sparse
+    except ImportError as exc:
+        raise ImproperlyConfigured(
+            "Related products need NumPy and SciPy on the worker: pip install numpy scipy"
+        ) from exc
+    return np, sparse
+
+
+def load_order_items(confirmed_after=None, confirmed_before=None):
+    """
+    (order index, product id) arrays for paid orders, one pair per distinct
+    product in an order, with orders numbered 0..n-1.
+    """
+    np, _ = _numeric()
+    if connection.vendor != "postgresql":
+        raise NotSupportedError("Related products require PostgreSQL (COPY)")
+
+    conditions, params = ["o.status IN %s"], [PAID_STATUSES]
+    if confirmed_after is not None:
+        conditions.append("o.confirmed_at >= %s")
+        params.append(confirmed_after)
+    if confirmed_before is not None:
+        conditions.append("o.confirmed_at < %s")
+        params.append(confirmed_before)
+
+    # Order UUIDs are hashed to 64-bit integers and numbered in NumPy: sorting
+    # or grouping millions of rows in Postgres would spill to disk
+    buffer = io.StringIO()
+    with connection.cursor() as cursor:
+        query = cursor.mogrify(f"""
+            SELECT hashtextextended(oi.order_id::text, 0), oi.product_id
+            FROM {OrderItem._meta.db_table} oi
+            JOIN {Order._meta.db_table} o ON o.order_id = oi.order_id
+            WHERE {' AND '.join(conditions)}
+        """, params)
+        cursor.copy_expert(f"COPY ({query.decode()}) TO STDOUT", buffer)
+
+    if not buffer.tell():
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    buffer.seek(0)
+    pairs = np.loadtxt(buffer, dtype=np.int64, delimiter="\t", ndmin=2)
+    _, orders = np.unique(pairs[:, 0], return_inverse=True)
+    products = pairs[:, 1]
+
+    # A product listed twice in one order counts once
+    base = products.max() + 1
+    keys = np.unique(orders * base + products)
+    orders, products = keys // base, keys % base
+
+    # Bulk and B2B baskets pair everything with everything; leave them out
+    sizes = np.bincount(orders)
+    keep = sizes[orders] <= settings.RELATED_PRODUCTS_MAX_ORDER_ITEMS
+    return orders[keep], products[keep]
+
+
+def cooccurrence(orders, products):
+    """
+    Sparse product x product co-occurrence counts (CSR) over dense product
+    columns, and the product id of each column. The diagonal holds order counts.
+    """
+    np, sparse = _numeric()
+    product_ids, columns = np.unique(products, return_inverse=True)
+    # Orders dropped by the basket size filter just leave empty rows
+    incidence = sparse.csr_matrix(
+        (np.ones(len(orders), dtype=np.int32), (orders, columns)),
+        shape=(orders.max() + 1 if len(orders) else 0, len(product_ids)),
+    )
+    return product_ids, (incidence.T @ incidence).tocsr()
+
+
+def top_neighbors(product_ids, counts):
+    """
+    Yield (product id, order count, neighbour ids, co-counts, scores) for every
+    column of `counts`, keeping the top RELATED_PRODUCTS_TOP_K pairs with at
+    least RELATED_PRODUCTS_MIN_SUPPORT shared orders. Ranking is vectorized:
+    one lexsort over all pairs instead of a sort per product.
+    """
+    np, _ = _numeric()
+    top_k = settings.RELATED_PRODUCTS_TOP_K
+    order_counts = counts.diagonal()
+
+    pairs = counts.tocoo()
+    keep = (pairs.row != pairs.col) & (pairs.data >= settings.RELATED_PRODUCTS_MIN_SUPPORT)
+    rows, cols, together = pairs.row[keep], pairs.col[keep], pairs.data[keep]
+    scores = together / np.sqrt(order_counts[rows].astype(np.float64) * order_counts[cols])
+
+    # Best score first within each row, then the first top_k of every row
+    order = np.lexsort((cols, -scores, rows))
+    rows, cols, together, scores = rows[order], cols[order], together[order], scores[order]
+    rank = np.arange(len(rows)) - np.searchsorted(rows, rows, side="left")
+    keep = rank < top_k
+    rows, cols, together, scores = rows[keep], cols[keep], together[keep], scores[keep]
+
+    bounds = np.searchsorted(rows, np.arange(len(product_ids) + 1))
+    neighbor_ids = product_ids[cols].tolist()
+    together, scores = together.tolist(), np.round(scores, 6).tolist()
+    for column, product_id in enumerate(product_ids.tolist()):
+        start, end = bounds[column], bounds[column + 1]
+        yield (
+            product_id,
+            int(order_counts[column]),
+            neighbor_ids[start:end],
+            together[start:end],
+            scores[start:end],
+        )
+
+
+def _array(values):
+    return "{" + ",".join(str(value) for value in values) + "}"
+
+
+def build_neighbors():
+    """Rebuild every product's neighbours from all paid orders. Returns the row count."""
+    cutoff = timezone.now() - timedelta(seconds=SETTLE_SECONDS)
+    orders, products = load_order_items(confirmed_before=cutoff)
+    product_ids, counts = cooccurrence(orders, products)
+
+    now = timezone.now().isoformat()
+    buffer = io.StringIO()
+    written = 0
+    for product_id, order_count, neighbor_ids, together, scores in top_neighbors(product_ids, counts):
+        buffer.write(
+            f"{product_id}\t{order_count}\t{_array(neighbor_ids)}\t"
+            f"{_array(together)}\t{_array(scores)}\t{now}\n"
+        )
+        written += 1
+    buffer.seek(0)
+
+    table = ProductNeighbors._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        # DELETE rather than TRUNCATE: readers keep seeing the previous build until commit
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.copy_expert(
+            f"COPY {table} (product_id, order_count, neighbor_ids, co_counts, scores, updated_at) FROM STDIN",
+            buffer,
+        )
+    cache.set(WATERMARK_KEY, cutoff, timeout=None)
+    return written
+
+
+def update_neighbors():
+    """
+    Fold orders paid since the last run into the stored neighbours of the
+    products they contain. Falls back to a full build when there is no
+    previous run. Returns the number of products updated.
+    """
+    watermark = cache.get(WATERMARK_KEY)
+    if watermark is None:
+        return build_neighbors()
+
+    cutoff = timezone.now() - timedelta(seconds=SETTLE_SECONDS)
+    orders, products = load_order_items(confirmed_after=watermark, confirmed_before=cutoff)
+    if not len(orders):
+        cache.set(WATERMARK_KEY, cutoff, timeout=None)
+        return 0
+
+    product_ids, counts = cooccurrence(orders, products)
+    ids = product_ids.tolist()
+    existing = {row.product_id: row for row in ProductNeighbors.objects.filter(product_id__in=ids)}
+
+    # Order counts of every product a score can involve, after this batch
+    candidates = set(ids).union(*(row.neighbor_ids for row in existing.values()))
+    order_counts = dict(
+        ProductNeighbors.objects.filter(product_id__in=candidates).values_list("product_id", "order_count")
+    )
+    added = counts.diagonal().tolist()
+    for product_id, count in zip(ids, added):
+        order_counts[product_id] = order_counts.get(product_id, 0) + count
+
+    top_k = settings.RELATED_PRODUCTS_TOP_K
+    min_support = settings.RELATED_PRODUCTS_MIN_SUPPORT
+    rows = []
+    for column, product_id in enumerate(ids):
+        row = existing.get(product_id)
+        together = dict(zip(row.neighbor_ids, row.co_counts)) if row else {}
+        start, end = counts.indptr[column], counts.indptr[column + 1]
+        for other, count in zip(counts.indices[start:end].tolist(), counts.data[start:end].tolist()):
+            if other != column:
+                together[ids[other]] = together.get(ids[other], 0) + count
+
+        ranked = sorted(
+            (
+                (count / math.sqrt(order_counts[product_id] * order_counts[other]), other, count)
+                for other, count in together.items()
+                if count >= min_support and order_counts.get(other)
+            ),
+            key=lambda item: (-item[0], item[1]),
+        )[:top_k]
+        rows.append(ProductNeighbors(
+            product_id=product_id,
+            order_count=order_counts[product_id],
+            neighbor_ids=[other for _, other, _ in ranked],
+            co_counts=[count for _, _, count in ranked],
+            scores=[round(score, 6) for score, _, _ in ranked],
+        ))
+
+    with transaction.atomic():
+        ProductNeighbors.objects.filter(product_id__in=ids).delete()
+        ProductNeighbors.objects.bulk_create(rows, batch_size=1000)
+    cache.set(WATERMARK_KEY, cutoff, timeout=None)
+    return len(rows)
+
+
+def run_exclusively(func):
+    """Run a build under a cache lock so full and incremental runs never overlap."""
+    if not cache.add(LOCK_KEY, 1, timeout=settings.RELATED_PRODUCTS_LOCK_SECONDS):
+        return None
+    try:
+        return func()
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+def related_products(product_id, limit):
+    """Active neighbours of `product_id`, best first, with their scores."""
+    row = ProductNeighbors.objects.filter(product_id=product_id).values_list("neighbor_ids", "scores").first()
+    if row is None:
+        return []
+
+    neighbor_ids, scores = row
+    products = {
+        product["id"]: product
+        for product in Product.objects.filter(id__in=neighbor_ids, is_active=True)
+        .values("id", "title", "slug", "price")
+    }
+    results = []
+    for neighbor_id, score in zip(neighbor_ids, scores):
+        if neighbor_id in products:
+            results.append({**products[neighbor_id], "price": str(products[neighbor_id]["price"]), "score": score})
+        if len(results) == limit:
+            break
+    return results
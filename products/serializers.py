@@ -1,21 +1,94 @@
 from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
 from .models import Product
 from categories.serializers import CategorySerializer
 
 
 class ProductSerializer(serializers.ModelSerializer):
+    """
+    Product representation. Pass `fields=[...]` to render only some fields
+    (the view builds it from ?fields= / ?omit=, see `select_fields`).
+    """
     category = CategorySerializer(read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(
         queryset=Product._meta.get_field("category").remote_field.model.objects.all(),
         write_only=True,
         source="category"
     )
+    rating_histogram = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
         fields = [
             "id", "title", "slug", "description", "price",
             "category", "category_id", "stock",
-            "is_active", "created_at", "updated_at"
+            "is_active", "rating_avg", "rating_count", "rating_histogram",
+            "created_at", "updated_at"
         ]
-        read_only_fields = ["slug", "created_at", "updated_at"]
+        read_only_fields = ["slug", "rating_avg", "rating_count", "created_at", "updated_at"]
+
+    # Model columns a field reads when it is not a plain column of the same name
+    field_columns = {
+        "category": [f"category__{name}" for name in CategorySerializer.Meta.fields],
+        "rating_histogram": [f"rating_{star}" for star in range(1, 6)],
+    }
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def readable_fields(cls):
+        return [name for name, field in cls().fields.items() if not field.write_only]
+
+    @classmethod
+    def select_fields(cls, fields=None, omit=None):
+        """
+        Resolve comma-separated ?fields= / ?omit= values into the field names to
+        render, in declaration order. Returns None when every field is selected.
+        """
+        available = cls.readable_fields()
+
+        def parse(param, value):
+            names = [name.strip() for name in value.split(",") if name.strip()]
+            unknown = [name for name in names if name not in available]
+            if unknown:
+                raise ValidationError({
+                    param: f"Unknown field: {', '.join(unknown)}. Choose from: {', '.join(available)}"
+                })
+            return set(names)
+
+        selected = parse("fields", fields) if fields else set(available)
+        if omit:
+            selected -= parse("omit", omit)
+        if not selected:
+            raise ValidationError({"omit" if omit else "fields": "Select at least one field."})
+        if selected == set(available):
+            return None
+        return [name for name in available if name in selected]
+
+    @classmethod
+    def columns_for(cls, fields):
+        """Arguments for QuerySet.only() that load exactly what `fields` render."""
+        columns = ["id"]
+        for name in fields:
+            columns.extend(cls.field_columns.get(name, [name]))
+        return list(dict.fromkeys(columns))
+
+    def get_rating_histogram(self, obj) -> dict:
+        """Review count per star, e.g. {"1": 0, ..., "5": 12}."""
+        return {str(star): getattr(obj, f"rating_{star}") for star in range(1, 6)}
+
+
+class ProductStockPriceSerializer(serializers.Serializer):
+    """One row of a bulk stock/price update; at least one of stock and price is required."""
+    id = serializers.IntegerField(min_value=1)
+    stock = serializers.IntegerField(min_value=0, max_value=2147483647, required=False)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+
+    def validate(self, attrs):
+        if "stock" not in attrs and "price" not in attrs:
+            raise serializers.ValidationError("Provide stock, price or both.")
+        return attrs
@@ -1,7 +1,13 @@
+import copy
+
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.core.cache import cache
+from ecommerce.cache import bump_generation
+from categories.tree import apply_product_change
+from .cache import invalidate_product_details
 from .models import Product
+from .suggest import suggest_index
 
 
 @receiver([post_save, post_delete], sender=Product)
@@ -9,6 +15,43 @@ def clear_product_cache(sender, instance, **kwargs):
     """
     Clear product list cache when a product is created, updated, or deleted.
     This ensures the cached product lists stay fresh.
+
+    Runs after commit: invalidating earlier would let a concurrent reader
+    cache the old row under the new generation until the entry expires.
     """
-    # Clear all product-related caches
-    cache.delete_pattern("ecommerce:products_list_*")
\ No newline at end of file
+    product_id = instance.pk
+
+    def invalidate():
+        # Orphan every cached product list with a single INCR; old entries expire on their own
+        bump_generation("products_list")
+
+        # Only this product's detail entry is affected
+        invalidate_product_details([product_id])
+
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=Product)
+def update_suggest_index(sender, instance, **kwargs):
+    """
+    Add, update or drop the product in this process's autocomplete index once
+    the save commits; a rolled back save never becomes suggestible.
+    """
+    # As saved now, not as the instance may look when the transaction commits
+    product = copy.copy(instance)
+    transaction.on_commit(lambda: suggest_index.product_saved(product))
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_suggest_index(sender, instance, **kwargs):
+    """Drop a deleted product from this process's autocomplete index once the delete commits."""
+    # Deletion clears instance.pk before the transaction commits
+    product = copy.copy(instance)
+    transaction.on_commit(lambda: suggest_index.product_deleted(product))
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_category_stats(sender, instance, **kwargs):
+    """Take a deleted active product out of its categories' subtree stats."""
+    if instance.is_active:
+        apply_product_change(removed=(instance.category_id, instance.price), removed_updated_at=instance.updated_at)
\ No newline at end of file
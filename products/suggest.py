@@ -0,0 +1,327 @@
+"""
+In-memory autocomplete index for /api/products/suggest/.
+
+Each worker process keeps a word-level prefix index over active product titles
+and category names, so a keystroke is answered without touching Postgres:
+
+- `_words` is a sorted array of every distinct word; a prefix maps to a
+  contiguous slice found with bisect.
+- `_postings` maps each word to a sorted array of ids containing that word.
+  Multi-word queries intersect postings; frequent words also keep a cached set.
+
+Writes made in this process are applied incrementally by the product and
+category signals. Writes made by other workers are picked up by a background
+rebuild once the index is older than PRODUCT_SUGGEST_REFRESH_SECONDS.
+"""
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from bisect import bisect_left, insort
+from itertools import groupby, islice
+
+from django.conf import settings
+
+
+WORD_RE = re.compile(r"\w+")
+MAX_PREFIX_EXPANSIONS = 64
+MIN_FUZZY_LENGTH = 3
+QUICK_PROBES = 256
+HOT_WORD_POSTINGS = 2_000
+MAX_HOT_WORDS = 64
+
+
+def unique_justseen(iterable):
+    """Drop consecutive duplicates from a sorted iterable."""
+    return (key for key, _ in groupby(iterable))
+
+
+def normalize(text):
+    """Lowercase, strip accents and split into words."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return WORD_RE.findall(text.lower())
+
+
+class PrefixIndex:
+    """
+    Word-level prefix index over (id, label, slug) entries.
+
+    Every query token matches words starting with it; results must match all
+    tokens. When that yields fewer than `limit` results, tokens also match
+    words starting with any string within edit distance 1 of them, so a typo
+    that happens to prefix an unrelated word still finds the intended one.
+    Prefix matches are returned first.
+    """
+
+    def __init__(self):
+        self._words = []
+        self._postings = {}
+        self._entries = {}
+        self._alphabet = set()
+        self._hot_sets = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Bulk-build an index from (id, label, slug) rows in one pass."""
+        index = cls()
+        postings = {}
+        for pk, label, slug in rows:
+            index._entries[pk] = (label, slug)
+            for word in set(normalize(label)):
+                postings.setdefault(word, []).append(pk)
+
+        for word, ids in postings.items():
+            index._postings[word] = array("q", sorted(ids))
+            index._alphabet.update(word)
+        index._words = sorted(postings)
+        return index
+
+    def add(self, pk, label, slug):
+        with self._lock:
+            self.remove(pk)
+            self._entries[pk] = (label, slug)
+            for word in set(normalize(label)):
+                ids = self._postings.get(word)
+                if ids is None:
+                    ids = self._postings[word] = array("q")
+                    insort(self._words, word)
+                    self._alphabet.update(word)
+                insort(ids, pk)
+                if word in self._hot_sets:
+                    self._hot_sets[word].add(pk)
+
+    def remove(self, pk):
+        with self._lock:
+            entry = self._entries.pop(pk, None)
+            if entry is None:
+                return
+            for word in set(normalize(entry[0])):
+                ids = self._postings.get(word)
+                if ids is None:
+                    continue
+                position = bisect_left(ids, pk)
+                if position < len(ids) and ids[position] == pk:
+                    del ids[position]
+                if word in self._hot_sets:
+                    self._hot_sets[word].discard(pk)
+                if not ids:
+                    self._hot_sets.pop(word, None)
+                    del self._postings[word]
+                    del self._words[bisect_left(self._words, word)]
+
+    def search(self, query, limit=10):
+        """Return up to `limit` (id, label, slug) entries matching every token of `query`."""
+        tokens = normalize(query)
+        if not tokens:
+            return []
+
+        with self._lock:
+            tokens = list(dict.fromkeys(tokens))
+            groups = [self._expand(token) for token in tokens]
+            matches = self._match(groups, limit) if all(groups) else []
+            if len(matches) < limit:
+                widened = [self._widen(token, words) for token, words in zip(tokens, groups)]
+                if widened != groups and all(widened):
+                    seen = set(matches)
+                    matches += [pk for pk in self._match(widened, limit) if pk not in seen][:limit - len(matches)]
+            return [(pk, *self._entries[pk]) for pk in matches]
+
+    def _match(self, groups, limit):
+        """Up to `limit` ids, newest first, containing a word of every group."""
+        # Intersect from the rarest token outwards, newest entries first.
+        groups = sorted(groups, key=self._group_size)
+        driver, others = groups[0], groups[1:]
+
+        candidates = unique_justseen(heapq.merge(
+            *(reversed(self._postings[word]) for word in driver), reverse=True
+        ))
+        if not others:
+            return list(islice(candidates, limit))
+        # Dense intersections fill up after a few probes; sparse ones need set algebra.
+        matches = [
+            pk for pk in islice(candidates, QUICK_PROBES)
+            if all(self._contains_any(words, pk) for words in others)
+        ][:limit]
+        if len(matches) < limit:
+            matches = heapq.nlargest(limit, self._intersect(groups))
+        return matches
+
+    def _widen(self, token, words):
+        """`words` plus the words within edit distance 1 of `token`, if it is long enough."""
+        if len(token) < MIN_FUZZY_LENGTH:
+            return words
+        known = set(words)
+        return words + [word for word in self._expand_fuzzy(token) if word not in known]
+
+    def _group_size(self, words):
+        return sum(len(self._postings[word]) for word in words)
+
+    def _group_set(self, words):
+        if len(words) == 1:
+            return self._posting_set(words[0])
+        return set().union(*(self._posting_set(word) for word in words))
+
+    def _posting_set(self, word):
+        """Set view of a posting array; sets of frequent words are kept in a small LRU."""
+        ids = self._postings[word]
+        if len(ids) < HOT_WORD_POSTINGS:
+            return set(ids)
+        cached = self._hot_sets.get(word)
+        if cached is None:
+            cached = self._hot_sets[word] = set(ids)
+            if len(self._hot_sets) > MAX_HOT_WORDS:
+                self._hot_sets.popitem(last=False)
+        else:
+            self._hot_sets.move_to_end(word)
+        return cached
+
+    def _intersect(self, groups):
+        sets = sorted((self._group_set(words) for words in groups), key=len)
+        return sets[0].intersection(*sets[1:])
+
+    def _expand(self, prefix):
+        """Words starting with `prefix`, capped at MAX_PREFIX_EXPANSIONS."""
+        words = []
+        position = bisect_left(self._words, prefix)
+        while position < len(self._words) and len(words) < MAX_PREFIX_EXPANSIONS:
+            word = self._words[position]
+            if not word.startswith(prefix):
+                break
+            words.append(word)
+            position += 1
+        return words
+
+    def _expand_fuzzy(self, token):
+        """Words starting with any string within edit distance 1 of `token`."""
+        words = {}
+        for variant in self._edits(token):
+            for word in self._expand(variant):
+                words[word] = None
+            if len(words) >= MAX_PREFIX_EXPANSIONS:
+                break
+        return list(words)[:MAX_PREFIX_EXPANSIONS]
+
+    def _edits(self, token):
+        """
+        Deletions, transpositions, substitutions and insertions of `token`.
+        Insertions at the end are skipped: they only narrow the plain prefix match.
+        """
+        alphabet = sorted(self._alphabet)
+        for i in range(len(token)):
+            left, right = token[:i], token[i:]
+            yield left + right[1:]
+            if len(right) > 1:
+                yield left + right[1] + right[0] + right[2:]
+            for ch in alphabet:
+                if ch != right[0]:
+                    yield left + ch + right[1:]
+                yield left + ch + right
+
+    def _contains_any(self, words, pk):
+        for word in words:
+            ids = self._postings[word]
+            position = bisect_left(ids, pk)
+            if position < len(ids) and ids[position] == pk:
+                return True
+        return False
+
+
+class SuggestIndex:
+    """
+    Per-process product and category autocomplete index.
+
+    Built lazily on the first suggestion request, kept fresh incrementally by
+    signals in this process and rebuilt in the background when stale.
+    """
+
+    def __init__(self):
+        self.products = None
+        self.categories = None
+        self.built_at = None
+        self._build_lock = threading.Lock()
+        self._refreshing = False
+
+    @property
+    def is_built(self):
+        return self.built_at is not None
+
+    def build(self):
+        from categories.models import Category
+        from .models import Product
+
+        products = PrefixIndex.from_rows(
+            Product.objects.filter(is_active=True)
+            .values_list("id", "title", "slug")
+            .iterator(chunk_size=5000)
+        )
+        categories = PrefixIndex.from_rows(Category.objects.values_list("id", "name", "slug"))
+        self.products, self.categories, self.built_at = products, categories, time.monotonic()
+
+    def ensure_fresh(self):
+        """Build on first use; afterwards refresh in a background thread when stale."""
+        if not self.is_built:
+            with self._build_lock:
+                if not self.is_built:
+                    self.build()
+            return
+
+        max_age = getattr(settings, "PRODUCT_SUGGEST_REFRESH_SECONDS", 300)
+        if time.monotonic() - self.built_at < max_age or self._refreshing:
+            return
+        with self._build_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, daemon=True).start()
+
+    def _refresh(self):
+        from django.db import connection
+        try:
+            self.build()
+        finally:
+            self._refreshing = False
+            connection.close()
+
+    def suggest(self, query, limit=10, max_categories=3):
+        """Category matches first (at most `max_categories`), then products."""
+        self.ensure_fresh()
+        categories = [
+            {"type": "category", "id": pk, "name": label, "slug": slug}
+            for pk, label, slug in self.categories.search(query, min(limit, max_categories))
+        ]
+        products = [
+            {"type": "product", "id": pk, "title": label, "slug": slug}
+            for pk, label, slug in self.products.search(query, limit - len(categories))
+        ]
+        return categories + products
+
+    def product_saved(self, product):
+        if not self.is_built:
+            return
+        if product.is_active:
+            self.products.add(product.pk, product.title, product.slug)
+        else:
+            self.products.remove(product.pk)
+
+    def product_deleted(self, product):
+        if self.is_built:
+            self.products.remove(product.pk)
+
+    def category_saved(self, category):
+        if self.is_built:
+            self.categories.add(category.pk, category.name, category.slug)
+
+    def category_deleted(self, category):
+        if self.is_built:
+            self.categories.remove(category.pk)
+
+
+suggest_index = SuggestIndex()
@@ -0,0 +1,50 @@
+from celery import shared_task
+from .popularity import flush_view_counts
+from .recommendations import build_neighbors, run_exclusively, update_neighbors
+
+
+@shared_task(bind=True, max_retries=3)
+def rebuild_related_products(self):
+    """
+    Rebuild "frequently bought together" neighbours from all paid orders.
+    Scheduled daily; corrects the approximation of incremental updates.
+    """
+    try:
+        written = run_exclusively(build_neighbors)
+    except Exception as exc:
+        raise self.retry(exc=exc, countdown=300)
+
+    if written is None:
+        return 'Related products build already running'
+    return f'Rebuilt related products for {written} products'
+
+
+@shared_task(bind=True, max_retries=3)
+def update_related_products(self):
+    """
+    Fold orders paid since the last run into the related products table.
+    """
+    try:
+        updated = run_exclusively(update_neighbors)
+    except Exception as exc:
+        raise self.retry(exc=exc, countdown=60)
+
+    if updated is None:
+        return 'Related products build already running'
+    return f'Updated related products for {updated} products'
+
+
+@shared_task(bind=True, max_retries=3)
+def flush_product_views(self):
+    """
+    Add the view counts buffered in Redis to Product.view_count.
+    Scheduled every PRODUCT_VIEWS_FLUSH_SECONDS; a failed batch is kept and retried.
+    """
+    try:
+        updated = flush_view_counts()
+    except Exception as exc:
+        raise self.retry(exc=exc, countdown=60)
+
+    if updated is None:
+        return 'Product view flush already running'
+    return f'Flushed view counts for {updated} products'
@@ -1,3 +1,392 @@
-from django.test import TestCase
+import copy
+import io
+import json
+from base64 import urlsafe_b64encode
+from decimal import Decimal
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from categories.models import Category
+from categories.tree import refresh_category_stats
+from ecommerce.cache import redis_connection
+from .cache import invalidate_product_details, product_detail_key
+from .importer import ProductImporter
+from .models import CatalogChange, Product
+from . import popularity
+from .suggest import PrefixIndex, suggest_index
+
+# Cached responses of test runs under their own prefix, without the per-process L1
+REDIS_TEST_CACHES = copy.deepcopy(settings.CACHES)
+REDIS_TEST_CACHES["default"]["KEY_PREFIX"] = "ecommerce-product-tests"
+REDIS_TEST_CACHES["default"].setdefault("OPTIONS", {})["L1_KEY_PREFIXES"] = ()
+
+
+class EmptyCacheMixin:
+    """
+    Run against an empty cache: test databases reuse ids, so entries left by
+    an earlier run must not answer for this one.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.clear_cache()
+        self.addCleanup(self.clear_cache)
+
+    def clear_cache(self):
+        redis = redis_connection()
+        keys = list(redis.scan_iter(cache.make_key("*")))
+        if keys:
+            redis.delete(*keys)
+
+
+@override_settings(CACHES=REDIS_TEST_CACHES)
+class CachedAPITestCase(EmptyCacheMixin, APITestCase):
+    pass
+
+
+@override_settings(CACHES=REDIS_TEST_CACHES)
+class CachedAPITransactionTestCase(EmptyCacheMixin, APITransactionTestCase):
+    pass
+
+
+class PrefixIndexTests(SimpleTestCase):
+    def test_prefix_match(self):
+        index = PrefixIndex.from_rows([(1, "Wireless Headphones", "wireless-headphones")])
+        self.assertEqual(index.search("wire head"), [(1, "Wireless Headphones", "wireless-headphones")])
+
+    def test_typo_without_prefix_match(self):
+        index = PrefixIndex.from_rows([(1, "Wireless Mouse", "wireless-mouse")])
+        self.assertEqual([pk for pk, *_ in index.search("muose")], [1])
+
+    def test_typo_that_prefixes_another_word(self):
+        # "mose" prefixes "moses", but the one-letter typo of "mouse" must still be found
+        index = PrefixIndex.from_rows([
+            (1, "Wireless Mouse", "wireless-mouse"),
+            (2, "Moses Basket", "moses-basket"),
+        ])
+        self.assertEqual([pk for pk, *_ in index.search("mose")], [2, 1])
+        self.assertEqual([pk for pk, *_ in index.search("mose", limit=1)], [2])
+
+
+class SuggestIndexSignalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Garden")
+
+    def setUp(self):
+        suggest_index.build()
+        self.addCleanup(setattr, suggest_index, "built_at", None)
+
+    def suggested(self, query):
+        return [row["id"] for row in suggest_index.suggest(query) if row["type"] == "product"]
+
+    def test_rolled_back_save_is_not_suggested(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                Product.objects.create(title="Watering Can", price=Decimal("9.00"), category=self.category)
+                raise RuntimeError
+        self.assertEqual(self.suggested("water"), [])
+
+    def test_committed_writes_update_the_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(title="Watering Can", price=Decimal("9.00"), category=self.category)
+        self.assertEqual(self.suggested("water"), [product.pk])
+
+        product_id = product.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+        self.assertNotIn(product_id, self.suggested("water"))
+
+
+class ProductImporterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Lighting")
+        cls.lamp = Product.objects.create(title="Desk Lamp", price=Decimal("10.00"), stock=5, category=cls.category)
+        cls.lamp_2 = Product.objects.create(
+            title="Other Lamp", slug="desk-lamp-2", price=Decimal("12.00"), stock=5, category=cls.category
+        )
+
+    def run_import(self, text):
+        return ProductImporter().run(io.StringIO(text), "csv")
+
+    def test_generated_slug_does_not_overwrite_existing_product(self):
+        summary = self.run_import(
+            "title,price,category,stock\n"
+            "Desk Lamp,20.00,lighting,1\n"
+            "Desk Lamp,30.00,lighting,2\n"
+        )
+        self.assertEqual((summary["inserted"], summary["updated"]), (2, 0))
+
+        self.lamp.refresh_from_db()
+        self.lamp_2.refresh_from_db()
+        self.assertEqual((self.lamp.title, self.lamp.price, self.lamp.stock), ("Desk Lamp", Decimal("10.00"), 5))
+        self.assertEqual((self.lamp_2.title, self.lamp_2.price), ("Other Lamp", Decimal("12.00")))
+        self.assertEqual(
+            list(Product.objects.filter(price__in=["20.00", "30.00"]).order_by("price").values_list("slug", flat=True)),
+            ["desk-lamp-3", "desk-lamp-4"],
+        )
+
+    def test_out_of_range_rows_are_rejected(self):
+        summary = self.run_import(
+            "title,price,category,stock,description\n"
+            "Floor Lamp,20.00,lighting,2147483648,\n"
+            "Wall Lamp,20.00,lighting,-1,\n"
+            "Tall Lamp,100000000.00,lighting,1,\n"
+            "Bad\x00Lamp,20.00,lighting,1,\n"
+            "Reading Lamp,20.00,lighting,1,Bright\x00\n"
+            "Table Lamp,20.00,lighting,2147483647,\n"
+        )
+        self.assertEqual((summary["inserted"], summary["invalid"]), (1, 5))
+        self.assertEqual([error["line"] for error in summary["errors"]], [2, 3, 4, 5, 6])
+        self.assertEqual(Product.objects.get(title="Table Lamp").stock, 2147483647)
+
+    def test_explicit_slug_updates_existing_product(self):
+        summary = self.run_import("title,slug,price,category\nDesk Lamp,desk-lamp,15.00,lighting\n")
+        self.assertEqual((summary["inserted"], summary["updated"]), (0, 1))
+        self.lamp.refresh_from_db()
+        self.assertEqual(self.lamp.price, Decimal("15.00"))
+
+
+class ProductKeysetPaginationTests(CachedAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Stationery")
+        # 25 products over three prices, so every page boundary falls inside a run of equal prices
+        cls.products = Product.objects.bulk_create(
+            Product(
+                title=f"Notebook {n}", slug=f"notebook-{n}", price=Decimal((5, 10, 20)[n % 3]),
+                stock=1, category=category,
+            )
+            for n in range(25)
+        )
+
+    def walk(self, ordering):
+        """Ids of every page following the next links, and of the pages walked back from the end."""
+        response = self.client.get("/api/products/", {"pagination": "cursor", "ordering": ordering})
+        pages = [response.data["results"]]
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data["results"])
+
+        backwards = [pages[-1]]
+        while response.data["previous"]:
+            response = self.client.get(response.data["previous"])
+            self.assertEqual(response.status_code, 200)
+            backwards.insert(0, response.data["results"])
+
+        ids = lambda walked: [row["id"] for page in walked for row in page]
+        return ids(pages), ids(backwards)
+
+    def expected(self, descending):
+        rows = sorted(((product.price, product.pk) for product in self.products), reverse=descending)
+        return [pk for _, pk in rows]
+
+    def test_ascending_pages(self):
+        forward, backward = self.walk("price")
+        self.assertEqual(forward, self.expected(descending=False))
+        self.assertEqual(backward, forward)
+
+    def test_descending_pages(self):
+        forward, backward = self.walk("-price")
+        self.assertEqual(forward, self.expected(descending=True))
+        self.assertEqual(backward, forward)
+
+    def test_malformed_cursor(self):
+        def encode(tokens):
+            return urlsafe_b64encode(json.dumps(tokens).encode()).decode()
+
+        for cursor in (
+            "not-a-cursor",
+            encode(["price", "5.00", 1]),
+            encode({"o": "price", "v": "cheap", "id": 1}),
+            encode({"o": "price", "v": "5.00", "id": "x"}),
+            encode({"o": "price", "v": "Infinity", "id": 1}),
+            # Issued under another ordering
+            encode({"o": "-price", "v": "5.00", "id": 1}),
+        ):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(
+                    "/api/products/", {"pagination": "cursor", "ordering": "price", "cursor": cursor}
+                )
+                self.assertEqual(response.status_code, 404)
+
+
+class ProductDetailCacheTests(CachedAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Kitchen")
+        cls.product = Product.objects.create(title="Kettle", price=Decimal("30.00"), stock=3, category=category)
+
+    def test_repeat_request_is_served_from_cache(self):
+        self.client.get(f"/api/products/{self.product.pk}/")
+        with self.assertNumQueries(0):
+            response = self.client.get(f"/api/products/{self.product.pk}/")
+        self.assertEqual(response.status_code, 200)
+
+    def assertRevalidates(self, etag, status, **expected):
+        """Send `etag` back to the uncached path, then to the cached one."""
+        url = f"/api/products/{self.product.pk}/"
+        self.clear_cache()
+        for cached in (False, True):
+            if cached:
+                self.client.get(url)
+                self.assertIsNotNone(cache.get(product_detail_key(self.product.pk)))
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status)
+            if expected:
+                self.assertEqual({name: response.json()[name] for name in expected}, expected)
+
+    def test_unchanged_product_revalidates_with_304(self):
+        etag = self.client.get(f"/api/products/{self.product.pk}/")["ETag"]
+        self.assertRevalidates(etag, 304)
+
+    def test_stock_save_changes_etag(self):
+        etag = self.client.get(f"/api/products/{self.product.pk}/")["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.stock = 1
+            self.product.save(update_fields=["stock"])
+        self.assertRevalidates(etag, 200, stock=1)
+
+    def test_review_changes_etag(self):
+        user = get_user_model().objects.create_user(username="critic", email="critic@example.com", password="pw")
+        etag = self.client.get(f"/api/products/{self.product.pk}/")["ETag"]
+
+        self.client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/reviews/", {"product": self.product.pk, "rating": 4}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertRevalidates(etag, 200, rating_avg="4.00", rating_count=1)
+
+    def test_rebuilt_ratings_change_etag(self):
+        from reviews.models import Review
+        from .ratings import rebuild_ratings
+
+        user = get_user_model().objects.create_user(username="critic", email="critic@example.com", password="pw")
+        Review.objects.create(user=user, product=self.product, rating=5)
+        # Aggregates drifted from the reviews, e.g. after raw SQL
+        Product.objects.filter(pk=self.product.pk).update(rating_count=0, rating_5=0, rating_avg=0)
+        etag = self.client.get(f"/api/products/{self.product.pk}/")["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(rebuild_ratings(), 1)
+        self.assertRevalidates(etag, 200, rating_avg="5.00", rating_count=1)
+
+    def test_fill_that_read_the_old_row_is_not_served(self):
+        for lookup in (self.product.pk, self.product.slug):
+            with self.subTest(lookup=lookup):
+                self.client.get(f"/api/products/{lookup}/")
+                entry = cache.get(product_detail_key(self.product.pk))
+                self.assertIsNotNone(entry)
+
+                title = f"Kettle {lookup}"
+                Product.objects.filter(pk=self.product.pk).update(title=title)
+                invalidate_product_details([self.product.pk])
+                # A reader that loaded the row before the write stores it after the invalidation
+                cache.set(product_detail_key(self.product.pk), entry)
+
+                response = self.client.get(f"/api/products/{lookup}/")
+                self.assertEqual(response.json()["title"], title)
+
+
+class ProductChangeFeedTests(CachedAPITransactionTestCase):
+    """The feed reads committed changes, so these tests commit for real."""
+
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name="Audio")
+        self.product = Product.objects.create(title="Speaker", price=Decimal("80.00"), stock=4, category=self.category)
+
+    def feed(self, since=0):
+        response = self.client.get("/api/products/changes/", {"since": since})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def logged(self):
+        return list(CatalogChange.objects.order_by("seq").values_list("entity", "object_id"))
+
+    def test_changes_wait_for_older_transactions(self):
+        since = self.feed()["next_since"]
+
+        # An older transaction, still open, may yet commit changes before ours in txid order
+        other = connection.copy()
+        self.addCleanup(other.close)
+        with other.cursor() as cursor:
+            cursor.execute("BEGIN")
+            cursor.execute("SELECT pg_current_xact_id()")
+
+            Product.objects.filter(pk=self.product.pk).update(price=Decimal("75.00"))
+            self.assertEqual(self.feed(since), {"changes": [], "next_since": since, "has_more": False})
+
+            cursor.execute("COMMIT")
+
+        data = self.feed(since)
+        self.assertEqual([(change["id"], change["data"]["price"]) for change in data["changes"]], [
+            (self.product.pk, "75.00")
+        ])
+        self.assertGreater(data["next_since"], since)
+
+    def test_maintained_column_updates_are_not_logged(self):
+        before = self.logged()
+        Product.objects.filter(pk=self.product.pk).update(view_count=F("view_count") + 5)
+        Category.objects.filter(pk=self.category.pk).update(product_count=7, min_price=1, max_price=2)
+        refresh_category_stats()
+        self.assertEqual(self.logged(), before)
+
+        Product.objects.filter(pk=self.product.pk).update(stock=3, view_count=F("view_count") + 1)
+        self.assertEqual(self.logged(), [*before, ("product", self.product.pk)])
+
+    def test_positions_outside_the_log(self):
+        Product.objects.create(title="Headphones", price=Decimal("60.00"), category=self.category)
+        seqs = list(CatalogChange.objects.order_by("seq").values_list("seq", flat=True))
+        # Pruned up to the last change
+        CatalogChange.objects.filter(seq__lt=seqs[-1]).delete()
+
+        response = self.client.get("/api/products/changes/", {"since": seqs[0]})
+        self.assertEqual(response.status_code, 410)
+        for since in (seqs[-1] + 1000, -1, "latest"):
+            with self.subTest(since=since):
+                response = self.client.get("/api/products/changes/", {"since": since})
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.feed(seqs[-1])["changes"], [])
+
+
+@override_settings(CACHES=REDIS_TEST_CACHES)
+class ViewCountFlushTests(EmptyCacheMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Books")
+        cls.product = Product.objects.create(title="Atlas", price=Decimal("25.00"), category=category)
+
+    def view_count(self):
+        return Product.objects.values_list("view_count", flat=True).get(pk=self.product.pk)
+
+    def test_views_are_flushed_once(self):
+        for lookup in (str(self.product.pk), self.product.slug, self.product.slug):
+            popularity.record_view(lookup)
+
+        redis = redis_connection()
+        pending = cache.make_key(popularity.FLUSHING_KEY)
+        popularity._batch(redis)
+        stranded = redis.hgetall(pending)
+
+        self.assertEqual(popularity.flush_view_counts(), 1)
+        self.assertEqual(self.view_count(), 3)
+        self.assertFalse(redis.exists(pending))
+
+        # The process died after the UPDATE committed, before the batch was deleted
+        redis.hset(pending, mapping=stranded)
+        self.assertEqual(popularity.flush_view_counts(), 0)
+        self.assertEqual(self.view_count(), 3)
+        self.assertFalse(redis.exists(pending))
+
+        popularity.record_view(self.product.slug)
+        self.assertEqual(popularity.flush_view_counts(), 1)
+        self.assertEqual(self.view_count(), 4)
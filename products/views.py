@@ -1,12 +1,49 @@
-from rest_framework import viewsets, filters
-from django_filters.rest_framework import DjangoFilterBackend
-from django.core.cache import cache
+import io
+from collections import Counter
+from datetime import datetime, time
 from django.conf import settings
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
+from django.core.cache import cache
+from django.db import NotSupportedError
+from django.db.models import Max
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from django_filters.rest_framework import DjangoFilterBackend
+from ecommerce.cache import (
+    cache_response,
+    cached_view_response,
+    canonical_query_key,
+    conditional_response,
+    get_cache_stats,
+    is_cacheable,
+    record_cache_event,
+    render_response,
+    reset_cache_stats,
+    serve_entry,
+    set_validators,
+)
+from categories.models import Category
+from ecommerce.db_router import ReplicaReadMixin, use_primary
+from .cache import product_detail_key, product_slug_key, product_validators, product_version_key
 from .models import Product
-from .serializers import ProductSerializer
-from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiExample
+from .serializers import ProductSerializer, ProductStockPriceSerializer
+from .bulk import bulk_update_stock_price
+from .pagination import ProductKeysetPagination
+from .filters import CategoryTreeFilter, ProductSearchFilter, ProductOrderingFilter
+from .facets import FACETS, compute_facets, parse_facets
+from .importer import FORMATS, ProductImporter, detect_format
+from .export import EXPORT_FIELDS, STREAMS, CSVRenderer, NDJSONRenderer, export_queryset
+from .changes import DEFAULT_LIMIT, MAX_LIMIT, ChangeLogPruned, changes_after, current_position
+from .popularity import record_view
+from .recommendations import related_products
+from .bestsellers import MAX_LIMIT as BESTSELLERS_MAX_LIMIT, WINDOWS, top_sellers
+from .suggest import suggest_index
+from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiExample, OpenApiParameter
 
 
 @extend_schema_view(
@@ -14,15 +51,39 @@ from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiExam
         summary="List all active products",
         description=(
             "Returns a paginated list of active products with intelligent caching. "
-            "Supports filtering by category, searching by title/description, "
-            "and ordering by price or creation date. Results are cached based on query parameters."
+            "Supports filtering by category, full-text search on title/description (?search=), "
+            "and ordering by price, creation date, rating (?ordering=-rating_avg, -rating_count), "
+            "search relevance (?ordering=relevance) or page views (?ordering=popularity). "
+            "Results are cached based on query parameters. "
+            "Pass ?pagination=cursor to switch to keyset pagination (no total count, "
+            "constant cost per page); follow the returned next/previous links. "
+            "Pass ?category_tree=electronics to list a category together with all of its subcategories. "
+            "Pass ?facets=category,price to add category and price-range counts for the "
+            "filtered results under `facets`. "
+            "Pass ?fields=id,title,price,slug (or ?omit=description) to return only some fields; "
+            "unselected columns are not read from the database."
         ),
+        parameters=[
+            OpenApiParameter("fields", str, description="Comma-separated fields to include"),
+            OpenApiParameter("omit", str, description="Comma-separated fields to leave out"),
+            OpenApiParameter(
+                "facets", str,
+                description=f"Comma-separated facets to count: {', '.join(FACETS)}",
+            ),
+        ],
         responses={200: ProductSerializer(many=True)},
         examples=[
             OpenApiExample(
                 "Product List Example",
                 value={
                     "count": 1,
+                    "facets": {
+                        "category": [{"id": 1, "name": "Books", "slug": "books", "count": 1}],
+                        "price": [
+                            {"min": None, "max": "25", "count": 1},
+                            {"min": "25", "max": "50", "count": 0},
+                        ]
+                    },
                     "results": [
                         {
                             "id": 1,
@@ -33,6 +94,9 @@ from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiExam
                             "category": {"id": 1, "name": "Books", "slug": "books"},
                             "stock": 10,
                             "is_active": True,
+                            "rating_avg": "4.50",
+                            "rating_count": 2,
+                            "rating_histogram": {"1": 0, "2": 0, "3": 0, "4": 1, "5": 1},
                             "created_at": "2025-01-01T12:00:00Z"
                         }
                     ]
@@ -40,6 +104,21 @@ from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiExam
             )
         ],
     ),
+    retrieve=extend_schema(
+        summary="Retrieve a product by id or slug",
+        description=(
+            "Returns a single active product. The lookup accepts the numeric id "
+            "(/api/products/7/) or the slug (/api/products/laptop-lenovo/). "
+            "Responses are cached per product and invalidated when that product "
+            "or its category changes. ?fields= / ?omit= select fields as on the list "
+            "(sparse responses are not cached)."
+        ),
+        parameters=[
+            OpenApiParameter("fields", str, description="Comma-separated fields to include"),
+            OpenApiParameter("omit", str, description="Comma-separated fields to leave out"),
+        ],
+        responses={200: ProductSerializer},
+    ),
     create=extend_schema(
         summary="Create a new product",
         description="Creates a product with category id. The slug is generated automatically.",
@@ -60,68 +139,709 @@ from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiExam
         ],
     ),
 )
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """
     ViewSet for products with intelligent query caching.
 
     Caching Strategy:
     - List views are cached based on query parameters (filters, search, ordering, page)
-    - Cache keys include all query parameters to ensure unique caching
+    - Cache keys are canonical: only parameters the list reads, sorted, defaults folded
     - Cache timeout: 5 minutes (configurable in settings)
-    - Cache is automatically invalidated when products are created/updated/deleted
+    - Cache is automatically invalidated when products are created/updated/deleted:
+      product and category signals bump the "products_list" generation recorded in every entry
+    - Stale entries are served while a single worker (holding a short cache lock) rebuilds them
+    - Detail views are cached per product id (and resolved by slug through a pointer key);
+      signals delete only the entries of the products that changed
+
+    Pagination:
+    - Default: page number pagination (?page=N) with a total count
+    - Opt-in: keyset pagination (?pagination=cursor), which skips COUNT(*) and OFFSET
+
+    Category tree:
+    - ?category_tree=<slug or id> matches a category and all its subcategories
+      with one prefix condition on the materialized category path
+
+    Facets:
+    - ?facets=category,price adds counts for the filtered results in one grouped query
+
+    Sparse fieldsets:
+    - ?fields= / ?omit= trim the serializer and load only the matching columns (QuerySet.only())
+
+    Read replica:
+    - Safe requests read from DATABASE_REPLICA_URL when set; cache fills read from the primary
     """
-    queryset = Product.objects.filter(is_active=True).select_related("category")
+    queryset = (
+        Product.objects.filter(is_active=True)
+        .select_related("category")
+        .defer("search_vector")
+    )
     serializer_class = ProductSerializer
 
     filter_backends = [
         DjangoFilterBackend,
-        filters.SearchFilter,
-        filters.OrderingFilter
+        CategoryTreeFilter,
+        ProductSearchFilter,
+        ProductOrderingFilter
     ]
 
     filterset_fields = ["category__id", "category__slug"]
-    search_fields = ["title", "description"]
-    ordering_fields = ["price", "created_at"]
+    ordering_fields = ["price", "created_at", "rating_avg", "rating_count"]
+    pagination_query_param = "pagination"
+    facets_query_param = "facets"
+    fields_query_param = "fields"
+    omit_query_param = "omit"
+    # Export timestamps and change feed positions must not trail the primary
+    primary_actions = ("export", "changes")
+
+    @property
+    def paginator(self):
+        """
+        Use keyset pagination when the client opts in with ?pagination=cursor,
+        otherwise fall back to the global PageNumberPagination.
+        """
+        if not hasattr(self, "_paginator"):
+            request = getattr(self, "request", None)
+            if request is not None and request.query_params.get(self.pagination_query_param) == "cursor":
+                self._paginator = ProductKeysetPagination()
+            else:
+                self._paginator = self.pagination_class() if self.pagination_class else None
+        return self._paginator
+
+    def get_sparse_fields(self):
+        """
+        Field names selected with ?fields= / ?omit= on list and retrieve,
+        or None for the full representation.
+        """
+        if not hasattr(self, "_sparse_fields"):
+            self._sparse_fields = None
+            request = getattr(self, "request", None)
+            if request is not None and self.action in ("list", "retrieve"):
+                self._sparse_fields = ProductSerializer.select_fields(
+                    request.query_params.get(self.fields_query_param),
+                    request.query_params.get(self.omit_query_param),
+                )
+        return self._sparse_fields
+
+    def get_queryset(self):
+        """
+        Load only the columns the selected fields render, so a grid asking for
+        ?fields=id,title,price,slug never reads description or joins category.
+        """
+        queryset = super().get_queryset()
+        fields = self.get_sparse_fields()
+        if fields is None:
+            return queryset
+
+        columns = ProductSerializer.columns_for(fields)
+        if isinstance(self.paginator, ProductKeysetPagination):
+            # Cursors are built from the ordering column of the last row
+            columns += self.paginator.keyset_fields
+        if "category" not in fields:
+            queryset = queryset.select_related(None)
+        return queryset.only(*columns)
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            kwargs.setdefault("fields", fields)
+        return super().get_serializer(*args, **kwargs)
+
+    def get_object(self):
+        """Look products up by numeric id or by slug."""
+        lookup = str(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        field = "pk" if lookup.isdigit() else "slug"
+
+        queryset = self.filter_queryset(self.get_queryset())
+        obj = get_object_or_404(queryset, **{field: lookup})
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    def get_list_cache_key(self, request):
+        """
+        Canonical cache key suffix for a list request.
+        Keeps only the parameters the list reads, so parameter order, tracking
+        parameters (utm_*) and explicit defaults (page=1) share one entry.
+        ?fields= / ?omit= are folded into the resolved field set, so every
+        spelling of the same selection shares an entry too.
+        """
+        query = request.query_params.copy()
+        for name in (self.fields_query_param, self.omit_query_param):
+            query.pop(name, None)
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            query[self.fields_query_param] = ",".join(fields)
+
+        params = [
+            *self.filterset_fields,
+            CategoryTreeFilter.category_tree_param,
+            ProductSearchFilter.search_param,
+            ProductOrderingFilter.ordering_param,
+            self.facets_query_param,
+            self.fields_query_param,
+        ]
+        if isinstance(self.paginator, ProductKeysetPagination):
+            params += [self.pagination_query_param, self.paginator.cursor_query_param]
+        else:
+            params += [self.paginator.page_query_param, self.paginator.page_size_query_param]
+
+        defaults = {
+            getattr(self.paginator, "page_query_param", "page"): "1",
+            ProductOrderingFilter.ordering_param: ",".join(Product._meta.ordering),
+        }
+        return canonical_query_key(query, filter(None, params), defaults)
+
+    def get_paginated_response(self, data):
+        """Add ?facets= counts for the filtered queryset next to the page."""
+        response = super().get_paginated_response(data)
+        requested = self.request.query_params.get(self.facets_query_param, "")
+        names = parse_facets(requested) if requested else []
+        if names:
+            response.data["facets"] = compute_facets(self.filter_queryset(self.get_queryset()), names)
+        return response
+
+    def get_list_last_modified(self):
+        """Latest update among the products matching the request's filters."""
+        latest = self.filter_queryset(self.get_queryset()).aggregate(latest=Max("updated_at"))["latest"]
+        return latest.timestamp() if latest else None
 
     def list(self, request, *args, **kwargs):
         """
         List products with query-level caching.
-        Cache key is generated from query parameters to ensure unique results.
+        Cache key is normalized from the query parameters the list actually reads.
+        The rendered JSON bytes are cached, so a hit skips serialization and rendering.
+        After an invalidation the previous response is served while one worker rebuilds it.
+        Responses carry an ETag and Last-Modified; revalidation is answered with a 304.
+        """
+        if not is_cacheable(request):
+            return super().list(request, *args, **kwargs)
+
+        # Fresh for 5 minutes, then stale-while-revalidate; Max(updated_at) feeds Last-Modified
+        return cached_view_response(
+            request,
+            "products_list",
+            self.get_list_cache_key(request),
+            lambda: render_response(self, request, super(ProductViewSet, self).list(request, *args, **kwargs)),
+            timeout=300,
+            last_modified=self.get_list_last_modified,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Retrieve a product and count the page view (cached and 304 answers included)
+        for ?ordering=popularity.
+        """
+        response = self.retrieve_cached(request, *args, **kwargs)
+        if request.method == "GET" and response.status_code in (200, 304):
+            record_view(str(kwargs[self.lookup_url_kwarg or self.lookup_field]))
+        return response
+
+    def retrieve_cached(self, request, *args, **kwargs):
         """
-        # Generate cache key from query parameters
-        query_params = request.query_params.urlencode()
-        cache_key = f"products_list_{query_params}" if query_params else "products_list_default"
+        Retrieve a product with a read-through cache keyed by product id.
+        Slug lookups are resolved through a slug -> id pointer, so both URLs share one entry.
+        Entries are only served under the product version they were filled in.
+        ETag and Last-Modified come from updated_at and the category generation.
+        """
+        # Filters, sparse fieldsets and alternate formats change the response; serve those uncached
+        if not is_cacheable(request) or set(request.query_params) - {"format"}:
+            return super().retrieve(request, *args, **kwargs)
+
+        lookup = str(kwargs[self.lookup_url_kwarg or self.lookup_field])
+        pk = int(lookup) if lookup.isdigit() else cache.get(product_slug_key(lookup))
+        if pk is not None:
+            found = cache.get_many([product_detail_key(pk), product_version_key(pk)])
+            entry, version = found.get(product_detail_key(pk)), found.get(product_version_key(pk))
+            # A renamed product leaves a stale pointer behind; only trust matching slugs
+            if (
+                entry is not None
+                and entry["meta"].get("version") == version
+                and (lookup.isdigit() or entry["meta"].get("slug") == lookup)
+            ):
+                record_cache_event("product_detail", "hit")
+                return serve_entry(request, entry)
 
-        # Try to get from cache
-        cached_response = cache.get(cache_key)
-        if cached_response is not None:
-            return cached_response
+        record_cache_event("product_detail", "miss")
 
-        # If not in cache, get from database
-        response = super().list(request, *args, **kwargs)
+        # Revalidating an uncached product only needs its id and updated_at
+        if "If-None-Match" in request.headers or "If-Modified-Since" in request.headers:
+            field = "pk" if lookup.isdigit() else "slug"
+            row = self.get_queryset().filter(**{field: lookup}).values_list("id", "updated_at").first()
+            if row is not None:
+                not_modified = conditional_response(request, *product_validators(*row))
+                if not_modified is not None:
+                    return not_modified
 
-        # Cache the response for 5 minutes
-        cache.set(cache_key, response, timeout=300)
+        # The entry is shared by every reader; never fill it from a lagging replica
+        with use_primary():
+            if not lookup.isdigit():
+                # The version must be read before the row, so resolve the slug first
+                pk = self.get_queryset().filter(slug=lookup).values_list("id", flat=True).first()
+                version = cache.get(product_version_key(pk)) if pk is not None else None
+            instance = self.get_object()
+            etag, modified = product_validators(instance.pk, instance.updated_at)
+            response = set_validators(Response(self.get_serializer(instance).data), etag, modified)
+
+        render_response(self, request, response)
+        # A slug taken over by another product between the two reads: its version was not read
+        if instance.pk == pk:
+            cache_response(
+                product_detail_key(instance.pk),
+                response,
+                timeout=settings.CACHE_TTL,
+                slug=instance.slug,
+                version=version,
+                etag=etag,
+                last_modified=modified,
+            )
+            cache.set(product_slug_key(instance.slug), instance.pk, timeout=settings.CACHE_TTL)
 
         return response
 
-    def perform_create(self, serializer):
-        """Clear product list cache when a new product is created."""
-        super().perform_create(serializer)
-        self._clear_product_cache()
-
-    def perform_update(self, serializer):
-        """Clear product list cache when a product is updated."""
-        super().perform_update(serializer)
-        self._clear_product_cache()
-
-    def perform_destroy(self, instance):
-        """Clear product list cache when a product is deleted."""
-        super().perform_destroy(instance)
-        self._clear_product_cache()
-
-    def _clear_product_cache(self):
-        """Clear all product-related caches."""
-        # Clear all product list caches (this is a simple implementation)
-        # In production, consider using cache versioning or tagged caching
-        cache.delete_pattern("ecommerce:products_list_*")
+    @extend_schema(
+        summary="Autocomplete product titles and category names",
+        description=(
+            "Prefix suggestions for the storefront search box, served from an in-memory index "
+            "in each worker (no database query per keystroke). Every word of `q` matches words "
+            "starting with it; when that finds fewer than `limit` results, words within one typo "
+            "are matched too, after the prefix matches."
+        ),
+        parameters=[
+            OpenApiParameter("q", str, description="Partial search text"),
+            OpenApiParameter("limit", int, description="Maximum suggestions (default 10, max 50)"),
+        ],
+        examples=[
+            OpenApiExample(
+                "Suggest Example",
+                value={
+                    "query": "lapt",
+                    "results": [
+                        {"type": "category", "id": 2, "name": "Laptops", "slug": "laptops"},
+                        {"type": "product", "id": 7, "title": "Laptop Lenovo", "slug": "laptop-lenovo"},
+                    ]
+                }
+            )
+        ],
+    )
+    @action(detail=False, methods=["get"], pagination_class=None, filter_backends=[])
+    def suggest(self, request):
+        """
+        Autocomplete suggestions from the per-process prefix index.
+
+        GET /api/products/suggest/?q=lapt
+        """
+        query = request.query_params.get("q", "").strip()
+        try:
+            limit = min(max(int(request.query_params.get("limit", 10)), 1), 50)
+        except ValueError:
+            limit = 10
+
+        results = suggest_index.suggest(query, limit=limit) if query else []
+        return Response({"query": query, "results": results})
+
+    @extend_schema(
+        summary="Products frequently bought together with this one",
+        description=(
+            "Neighbours precomputed from paid orders that contain both products, ranked by "
+            "cosine similarity of their order sets (see build_related_products). One primary "
+            "key lookup plus one query for the neighbours; inactive products are skipped."
+        ),
+        parameters=[
+            OpenApiParameter("limit", int, description="Maximum products (default 10)"),
+        ],
+        examples=[
+            OpenApiExample(
+                "Related Example",
+                value={
+                    "product_id": 7,
+                    "results": [
+                        {"id": 12, "title": "Laptop Sleeve", "slug": "laptop-sleeve", "price": "24.99", "score": 0.41},
+                    ]
+                },
+                response_only=True,
+            )
+        ],
+    )
+    @action(detail=True, methods=["get"], pagination_class=None, filter_backends=[])
+    def related(self, request, pk=None):
+        """
+        GET /api/products/7/related/
+        """
+        field = "pk" if str(pk).isdigit() else "slug"
+        product_id = self.get_queryset().filter(**{field: pk}).values_list("id", flat=True).first()
+        if product_id is None:
+            return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            limit = min(max(int(request.query_params.get("limit", 10)), 1), settings.RELATED_PRODUCTS_TOP_K)
+        except ValueError:
+            limit = 10
+        return Response({"product_id": product_id, "results": related_products(product_id, limit)})
+
+    @extend_schema(
+        summary="Best-selling products",
+        description=(
+            "Top products by units sold, read from Redis sorted sets that verified payments "
+            "update in real time (see rebuild_bestsellers). `window` is all (default), 1d, 7d "
+            "or 30d in UTC days; `category` (id or slug) narrows to a category and its "
+            "subcategories. One ZREVRANGE plus one query for the product rows; inactive "
+            "products are skipped."
+        ),
+        parameters=[
+            OpenApiParameter("window", str, enum=[*WINDOWS], description="Sales window (default all)"),
+            OpenApiParameter("category", str, description="Category id or slug"),
+            OpenApiParameter("limit", int, description=f"Maximum products (default 10, max {BESTSELLERS_MAX_LIMIT})"),
+        ],
+        examples=[
+            OpenApiExample(
+                "Bestsellers Example",
+                value={
+                    "window": "7d",
+                    "category": 3,
+                    "results": [
+                        {"id": 7, "title": "Laptop", "slug": "laptop", "price": "999.99", "units_sold": 42},
+                    ]
+                },
+                response_only=True,
+            )
+        ],
+    )
+    @action(detail=False, methods=["get"], pagination_class=None, filter_backends=[])
+    def bestsellers(self, request):
+        """
+        GET /api/products/bestsellers/?window=7d&category=electronics&limit=10
+        """
+        window = request.query_params.get("window", "all")
+        if window not in WINDOWS:
+            return Response(
+                {"error": f"window must be one of: {', '.join(WINDOWS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        category_id = None
+        category = request.query_params.get("category")
+        if category:
+            field = "pk" if category.isdigit() else "slug"
+            category_id = Category.objects.filter(**{field: category}).values_list("id", flat=True).first()
+            if category_id is None:
+                return Response({"error": "Category not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            limit = min(max(int(request.query_params.get("limit", 10)), 1), BESTSELLERS_MAX_LIMIT)
+        except ValueError:
+            limit = 10
+
+        try:
+            results = top_sellers(window, category_id, limit)
+        except NotSupportedError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_501_NOT_IMPLEMENTED)
+        return Response({"window": window, "category": category_id, "results": results})
+
+    @extend_schema(
+        summary="Catalog cache hit/miss counters (Admin only)",
+        description=(
+            "Hit, stale hit and miss counters with the hit ratio for each catalog cache. "
+            "DELETE resets the counters, e.g. before measuring a change on live traffic."
+        ),
+    )
+    @action(
+        detail=False,
+        methods=["get", "delete"],
+        url_path="cache-stats",
+        permission_classes=[permissions.IsAdminUser],
+        pagination_class=None,
+        filter_backends=[],
+    )
+    def cache_stats(self, request):
+        """
+        GET /api/products/cache-stats/
+        DELETE /api/products/cache-stats/
+        """
+        namespaces = ["products_list", "product_detail", "categories_list"]
+        if request.method == "DELETE":
+            for namespace in namespaces:
+                reset_cache_stats(namespace)
+        return Response({namespace: get_cache_stats(namespace) for namespace in namespaces})
+
+    @extend_schema(
+        summary="Bulk import products from CSV or NDJSON (Admin only)",
+        description=(
+            "Upload a supplier catalog as multipart `file`. Rows are streamed into a staging "
+            "table with PostgreSQL COPY and upserted by slug in one statement; categories are "
+            "given by slug. Required columns: title, price, category. Optional: slug, "
+            "description, stock, is_active. Rows without a slug always create a product with "
+            "a unique slug from the title. Caches are invalidated once at the end."
+        ),
+        request={
+            "multipart/form-data": {
+                "type": "object",
+                "properties": {
+                    "file": {"type": "string", "format": "binary"},
+                    "format": {"type": "string", "enum": [*FORMATS]},
+                },
+            }
+        },
+        examples=[
+            OpenApiExample(
+                "Import Summary Example",
+                value={
+                    "rows": 250000,
+                    "inserted": 240000,
+                    "updated": 9500,
+                    "unchanged": 0,
+                    "invalid": 300,
+                    "unknown_category": 150,
+                    "duplicates": 50,
+                    "seconds": 9.8,
+                    "rows_per_second": 25510,
+                    "errors": [{"line": 17, "error": "Invalid price: 'abc'"}]
+                },
+                response_only=True,
+            )
+        ],
+    )
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="import",
+        permission_classes=[permissions.IsAdminUser],
+        parser_classes=[MultiPartParser],
+        pagination_class=None,
+        filter_backends=[],
+    )
+    def bulk_import(self, request):
+        """
+        POST /api/products/import/
+        Body: multipart/form-data with `file` and optional `format` (csv or ndjson)
+        """
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"error": "file is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        fmt = request.data.get("format") or detect_format(upload.name)
+        stream = io.TextIOWrapper(upload.file, encoding="utf-8", newline="")
+        try:
+            summary = ProductImporter().run(stream, fmt)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        except NotSupportedError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_501_NOT_IMPLEMENTED)
+        finally:
+            stream.detach()
+
+        return Response(summary)
+
+    @extend_schema(
+        summary="Bulk update stock and price (Admin only)",
+        description=(
+            "Apply a batch of `{id, stock, price}` rows (stock and/or price) with one set-based "
+            "UPDATE in a single transaction. Returns a status per row in request order: "
+            "updated, unchanged, not_found or invalid. Only changed products are invalidated "
+            "in the cache."
+        ),
+        request=ProductStockPriceSerializer(many=True),
+        examples=[
+            OpenApiExample(
+                "Bulk Update Request",
+                value=[
+                    {"id": 1, "stock": 42},
+                    {"id": 2, "stock": 0, "price": "19.99"},
+                ],
+                request_only=True,
+            ),
+            OpenApiExample(
+                "Bulk Update Response",
+                value={
+                    "updated": 1,
+                    "unchanged": 0,
+                    "not_found": 1,
+                    "invalid": 0,
+                    "results": [
+                        {"id": 1, "status": "updated"},
+                        {"id": 2, "status": "not_found"},
+                    ]
+                },
+                response_only=True,
+            ),
+        ],
+    )
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="bulk-update",
+        permission_classes=[permissions.IsAdminUser],
+        pagination_class=None,
+        filter_backends=[],
+    )
+    def bulk_update(self, request):
+        """
+        POST /api/products/bulk-update/
+        Body: [{"id": 1, "stock": 42, "price": "19.99"}, ...]
+        """
+        items = request.data
+        if not isinstance(items, list):
+            return Response(
+                {"error": "Expected a list of {id, stock, price} objects"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > settings.PRODUCT_BULK_UPDATE_MAX_ROWS:
+            return Response(
+                {"error": f"At most {settings.PRODUCT_BULK_UPDATE_MAX_ROWS} rows per request"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Invalid rows are reported individually; the valid ones are still applied
+        results = [None] * len(items)
+        valid = {}
+        for position, item in enumerate(items):
+            serializer = ProductStockPriceSerializer(data=item)
+            if not serializer.is_valid():
+                pk = item.get("id") if isinstance(item, dict) else None
+                results[position] = {"id": pk, "status": "invalid", "errors": serializer.errors}
+            elif serializer.validated_data["id"] in valid:
+                pk = serializer.validated_data["id"]
+                results[position] = {"id": pk, "status": "invalid", "errors": {"id": ["Duplicate id in batch."]}}
+            else:
+                valid[serializer.validated_data["id"]] = (position, serializer.validated_data)
+
+        try:
+            outcome = bulk_update_stock_price([data for _, data in valid.values()])
+        except NotSupportedError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+        for pk, (position, _) in valid.items():
+            results[position] = {"id": pk, "status": outcome[pk]}
+
+        totals = Counter(result["status"] for result in results)
+        return Response({
+            "updated": totals["updated"],
+            "unchanged": totals["unchanged"],
+            "not_found": totals["not_found"],
+            "invalid": totals["invalid"],
+            "results": results,
+        })
+
+    @extend_schema(
+        summary="Stream the whole catalog as NDJSON or CSV",
+        description=(
+            "Streams every active product in one response, oldest change first, read with a "
+            "server-side cursor so memory stays flat. Choose the format with ?format=ndjson "
+            "(default) or ?format=csv, or the Accept header. Pass ?updated_since=<ISO 8601> "
+            "for an incremental pull: it returns products changed at or after that time, "
+            "including deactivated ones (is_active=false). Store the X-Export-Started-At "
+            "response header and send it as updated_since next time. "
+            "X-Catalog-Change-Seq is the change feed position the export is current to; "
+            "pass it as ?since= to /api/products/changes/ to keep a mirror in sync."
+        ),
+        parameters=[
+            OpenApiParameter("updated_since", str, description="ISO 8601 date or datetime"),
+        ],
+        responses={(200, "application/x-ndjson"): str, (200, "text/csv"): str},
+    )
+    @action(
+        detail=False,
+        methods=["get"],
+        renderer_classes=[NDJSONRenderer, CSVRenderer],
+        pagination_class=None,
+        filter_backends=[],
+    )
+    def export(self, request):
+        """
+        GET /api/products/export/?format=csv&updated_since=2025-01-01T00:00:00Z
+
+        Columns: id, title, slug, description, price, category_id, category_slug,
+        stock, is_active, rating_avg, rating_count, created_at, updated_at
+        """
+        updated_since = None
+        value = request.query_params.get("updated_since")
+        if value:
+            try:
+                updated_since = parse_datetime(value) or parse_date(value)
+            except ValueError:
+                updated_since = None
+            if updated_since is None:
+                return Response(
+                    {"error": "updated_since must be an ISO 8601 date or datetime"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            if not isinstance(updated_since, datetime):
+                updated_since = datetime.combine(updated_since, time.min)
+            if timezone.is_naive(updated_since):
+                updated_since = timezone.make_aware(updated_since)
+
+        # Taken before the query, so rows changed while the export streams are sent again next pull
+        started_at = timezone.now()
+        try:
+            change_seq = current_position()
+        except NotSupportedError:
+            change_seq = None
+        fmt = request.accepted_renderer.format
+        response = StreamingHttpResponse(
+            STREAMS[fmt](export_queryset(updated_since)),
+            content_type=f"{request.accepted_renderer.media_type}; charset=utf-8",
+        )
+        response["Content-Disposition"] = f'attachment; filename="products.{fmt}"'
+        response["X-Export-Started-At"] = started_at.isoformat()
+        response["X-Export-Fields"] = ",".join(EXPORT_FIELDS)
+        if change_seq is not None:
+            response["X-Catalog-Change-Seq"] = str(change_seq)
+        return response
+
+    @extend_schema(
+        summary="Catalog changes after a sequence number (delta sync)",
+        description=(
+            "Product and category upserts and deletes recorded after change `since`, oldest "
+            "first, in batches of up to `limit` (default 500, max 5000). Each object appears "
+            "once per batch with its current data. Store `next_since` and send it back as "
+            "`since`; repeat while `has_more` is true. Start from the X-Catalog-Change-Seq "
+            "header of /api/products/export/. A 410 means the position was pruned from the "
+            "log: re-export the catalog."
+        ),
+        parameters=[
+            OpenApiParameter("since", int, description="Seq of the last change applied (0 = oldest retained)"),
+            OpenApiParameter("limit", int, description=f"Changes per batch (default {DEFAULT_LIMIT}, max {MAX_LIMIT})"),
+        ],
+        examples=[
+            OpenApiExample(
+                "Changes Example",
+                value={
+                    "changes": [
+                        {
+                            "seq": 1041,
+                            "entity": "product",
+                            "op": "upsert",
+                            "id": 7,
+                            "data": {"id": 7, "title": "Laptop Lenovo", "price": "749.99", "stock": 4},
+                        },
+                        {"seq": 1042, "entity": "product", "op": "delete", "id": 9},
+                    ],
+                    "next_since": 1042,
+                    "has_more": False,
+                },
+                response_only=True,
+            )
+        ],
+    )
+    @action(detail=False, methods=["get"], pagination_class=None, filter_backends=[])
+    def changes(self, request):
+        """
+        GET /api/products/changes/?since=1040&limit=500
+        """
+        try:
+            since = int(request.query_params.get("since", 0))
+            limit = int(request.query_params.get("limit", DEFAULT_LIMIT))
+        except ValueError:
+            return Response({"error": "since and limit must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        if since < 0:
+            return Response({"error": "since cannot be negative"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(max(limit, 1), MAX_LIMIT)
+
+        try:
+            changes, next_since, has_more = changes_after(since, limit)
+        except ChangeLogPruned as exc:
+            return Response({"error": f"{exc}; re-export the catalog"}, status=status.HTTP_410_GONE)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        except NotSupportedError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+        return Response({"changes": changes, "next_since": next_since, "has_more": has_more})
@@ -1,6 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
+from products.ratings import apply_rating_change
 
 
 class Review(models.Model):
@@ -39,5 +40,26 @@ class Review(models.Model):
             models.Index(fields=['rating']),
         ]
 
+    def save(self, *args, **kwargs):
+        """
+        Save the review and adjust the product's rating aggregates in the same transaction.
+        Deletes are handled by the post_delete signal so cascades are covered too.
+        """
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = (
+                    Review.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values_list('product_id', 'rating')
+                    .first()
+                )
+            super().save(*args, **kwargs)
+
+            if previous != (self.product_id, self.rating):
+                if previous:
+                    apply_rating_change(previous[0], removed=previous[1])
+                apply_rating_change(self.product_id, added=self.rating)
+
     def __str__(self):
         return f"{self.user.username}'s review for {self.product.title} - {self.rating} stars"
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from products.ratings import apply_rating_change
+from .models import Review
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_rating(sender, instance, **kwargs):
+    """
+    Take a deleted review out of its product's rating aggregates.
+    Runs inside the delete transaction, including cascades from users and products.
+    """
+    apply_rating_change(instance.product_id, removed=instance.rating)
\ No newline at end of file
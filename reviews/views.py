@@ -1,6 +1,7 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied
+from ecommerce.db_router import ReplicaReadMixin
 from .models import Review
 from .serializers import ReviewSerializer, CreateReviewSerializer
 
@@ -18,12 +19,13 @@ class IsReviewOwnerOrReadOnly(permissions.BasePermission):
         return obj.user == request.user
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """
     ViewSet for creating, retrieving, updating, and deleting product reviews.
     - Anyone can view reviews
     - Only authenticated users can create reviews
     - Only review owner can update/delete their review
+    - Reads come from the replica when configured; authors read their own writes from the primary
     """
     queryset = Review.objects.select_related('user', 'product')
     serializer_class = ReviewSerializer